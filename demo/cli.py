@@ -7,19 +7,20 @@ import mpv.templates
 
 class Mpv(mpv.templates.MpvTemplate):
 
+    def before_initialize(self):
+        for name in ['duration', 'track-list', 'chapter-list']:
+            self.subscribe(name, self.on_info)
+        self.subscribe('pause', self.on_pause_change)
+
     def on_log_message(self, event):
         super().on_log_message(event)
 
-    def on_property_change(self, event):
-        if event.data is None:
-            return
-        elif event.name == 'duration':
-            property_log.info('duration: {}'.format(event.data))
-        elif event.name == 'track-list':
-            property_log.info('track-list: {}'.format(event.data))
-        elif event.name == 'chapter-list':
-            property_log.info('chapter-list: {}'.format(event.data))
-        elif event.name == 'pause':
+    def on_info(self, event):
+        if event.data is not None:
+            property_log.info('{}: {}'.format(event.name, event.data))
+
+    def on_pause_change(self, event):
+        if event.data is not None:
             property_log.info('paused!' if event.data else 'unpaused!')
 
 
@@ -32,16 +33,13 @@ if __name__ == '__main__':
         print('usage: python mpv-sample.py path-to-video')
         sys.exit(0)
 
-    observe = [
-        'duration', 'track-list', 'chapter-list', 'pause'
-    ]
     options = {
         'hwdec': 'auto',
         'input-default-bindings': True,
         'input-vo-keyboard': True
     }
     try:
-        with Mpv(options, observe, mpv.LogLevel.INFO, mpv_log.debug) as vid:
+        with Mpv(options, None, mpv.LogLevel.INFO, mpv_log.debug) as vid:
             vid.play(sys.argv[1])
 
     except mpv.ApiVersionError as e:
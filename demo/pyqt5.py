@@ -96,6 +96,7 @@ class Player(QMainWindow):
         self.mpv.playback_time.connect(self.controller.update_seek_slider_position)
         self.mpv.playback_time.connect(self.controller.update_playback_time)
 
+        self.controller.seek_slider.sliderMoved.connect(self.mpv.seek_preview)
         self.controller.seek_slider.sliderReleased.connect(self.slider_seek)
         self.controller.volume_slider.valueChanged.connect(self.slider_volume)
 
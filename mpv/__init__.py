@@ -3,9 +3,11 @@ __version__ = '0.3.0'
 __libmpv_version__ = (1, 20)
 
 from .api import Mpv
-from .types import LogLevel, Format, EventID, ErrorCode, EndFileReason, SubApi
+from .types import (LogLevel, Format, EventID, ErrorCode, EndFileReason,
+                    SubApi, RenderParamType)
 from .exceptions import MpvError, ApiVersionError, LibraryNotLoadedError
 from .properties import PROPERTIES
+from .decode import frames
 
 # Set default logging handler to avoid "No handler found" warnings.
 import logging
@@ -0,0 +1,75 @@
+"""Command line tools, run ``python -m mpv --help``."""
+import argparse
+import json
+import sys
+
+from .bench import BENCH_PROFILES, bench_decode, format_result
+from .exceptions import MpvError, LibraryNotLoadedError
+
+
+def _option(text):
+    name, sep, value = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(
+            'expected NAME=VALUE, got "{}"'.format(text))
+    return name, value
+
+
+def _bench_decode(args):
+    options = dict(args.option)
+    if args.hwdec is not None:
+        options['hwdec'] = args.hwdec
+    if args.threads is not None:
+        options['vd-lavc-threads'] = args.threads
+    status = 0
+    for path in args.files:
+        try:
+            result = bench_decode(path, args.profile, options, args.end,
+                                  args.timeout)
+        except (MpvError, TimeoutError, ValueError) as e:
+            print('{}: {}'.format(path, e), file=sys.stderr)
+            status = 1
+            continue
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(format_result(result))
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m mpv')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    bench = commands.add_parser(
+        'bench-decode', help='measure how fast files decode',
+        description='Decode files untimed into vo=null and report the '
+                    'decode fps, frame drops and CPU time.')
+    bench.add_argument('files', nargs='+', metavar='FILE')
+    bench.add_argument('--profile', default='decode-bench',
+                       choices=BENCH_PROFILES)
+    bench.add_argument('--hwdec', help='the hwdec option, e.g. auto')
+    bench.add_argument('--threads', type=int,
+                       help='decoder threads, 0 picks a number')
+    bench.add_argument('--end', type=float,
+                       help='stop at this position in seconds')
+    bench.add_argument('--timeout', type=float,
+                       help='seconds allowed for loading and decoding')
+    bench.add_argument('-o', '--option', type=_option, action='append',
+                       default=[], metavar='NAME=VALUE',
+                       help='an mpv option, can be repeated')
+    bench.add_argument('--json', action='store_true',
+                       help='print one JSON object per file')
+    bench.set_defaults(func=_bench_decode)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except LibraryNotLoadedError as e:
+        print('libmpv could not be loaded: {}'.format(e), file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,29 @@
+import concurrent.futures
+import itertools
 import logging
+import time
 from mpv import __libmpv_version__
 
-from .types import SubApi
+from .types import SubApi, EventID, Format
 from .exceptions import MpvError, ApiVersionError, LibraryNotLoadedError
-from .properties import PROPERTIES
+from .properties import PROPERTIES, PropertySchema
 from .libmpv import LibMPV
+from .observe import ObservationManager
+from .profiles import headless_options
+from . import paths, playlist
 
 log = logging.getLogger(__name__)
 
 
+#: reply_userdata values allocated by python-mpv start here, well clear of
+#: the small numbers applications pick themselves.
+FIRST_REPLY_USERDATA = 1 << 48
+
+# events that complete an asynchronous request.
+_REPLY_EVENTS = (EventID.GET_PROPERTY_REPLY, EventID.SET_PROPERTY_REPLY,
+                 EventID.COMMAND_REPLY)
+
+
 class Mpv(object):
     """Create an MPV instance. Any kwargs given will be passed to mpv as
     options. The instance must be initialized with
@@ -28,6 +43,13 @@ class Mpv(object):
 
     Attributes:
         handle: the mpv handle.
+        event_thread (:obj:`threading.Thread`): the thread that passes events
+            to :obj:`route_event() <mpv.Mpv.route_event>`, set by the
+            templates. ``None`` without an event loop.
+        event_source: an object with a ``wait_event(timeout)`` method the
+            templates' event loops read events from, e.g. an
+            :obj:`EventRecorder <mpv.record.EventRecorder>`. ``None`` reads
+            from this player.
 
     """
 
@@ -43,6 +65,15 @@ class Mpv(object):
 
         self.handle = self.libmpv.mpv_create()
         self.opengl = None
+        self.log_pipeline = None
+        self.write_queue = None
+        self.event_thread = None
+        self.event_source = None
+        self._schema = None
+        self._reply_userdata = itertools.count(FIRST_REPLY_USERDATA)
+        self.observations = ObservationManager(self)
+        self._replies = {}
+        self._event_listeners = {}
 
         if options is not None:
             for k, v in options.items():
@@ -57,6 +88,41 @@ class Mpv(object):
             except MpvError as e:
                 log.debug(e)
 
+    @classmethod
+    def headless(cls, profile='decode-bench', options=None, **overrides):
+        """Create and initialize an instance without video or audio output,
+        configured with one of the :obj:`HEADLESS_PROFILES
+        <mpv.profiles.HEADLESS_PROFILES>`.
+
+        Example:
+        ::
+
+            player = mpv.Mpv.headless('decode-bench', hwdec='auto')
+
+        Args:
+            profile (str, optional): ``'decode-bench'``, ``'probe'`` or
+                ``'analysis'``.
+            options (dict, optional): options that override the profile.
+            **overrides (optional): more options, use underscores in place of
+                hyphens.
+
+        Returns:
+            :obj:`mpv.Mpv`: the initialized instance.
+
+        Raises:
+            ValueError: if the profile doesn't exist.
+            mpv.LibraryNotLoadedError: if libmpv can't be loaded.
+            mpv.MpvError: if the instance can't be initialized.
+
+        """
+        player = cls(options=headless_options(profile, options, **overrides))
+        try:
+            player.initialize()
+        except Exception:
+            player.terminate_destroy()
+            raise
+        return player
+
     def initialize(self):
         """Initialize the mpv instance. This function needs to be called to
         make full use of the client API
@@ -90,6 +156,15 @@ class Mpv(object):
         """
         return self.libmpv.client_api_version()
 
+    def get_time_us(self):
+        """
+        Returns:
+            int: mpv's internal time in microseconds. It has an arbitrary
+            offset and never goes backwards.
+
+        """
+        return self.libmpv.mpv_get_time_us(self.handle)
+
     def wait_event(self, timeout=-1):
         """Wait for the next event, or until the timeout expires, or if
         another thread makes a call to mpv_wakeup(). Passing 0 as timeout will
@@ -107,20 +182,50 @@ class Mpv(object):
 
         """
         e = self.libmpv.mpv_wait_event(self.handle, timeout)
+        pipeline = self.log_pipeline
+        if pipeline is not None:
+            # log messages never reach the caller, filtered ones included,
+            # and they don't extend the timeout.
+            deadline = time.monotonic() + timeout if timeout > 0 else None
+            while e.contents.event_id == EventID.LOG_MESSAGE:
+                pipeline.submit(e.contents.log_message())
+                remaining = timeout
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                e = self.libmpv.mpv_wait_event(self.handle, remaining)
         return e.contents.as_object()
 
     def set_wakeup_callback(self, func, data):
         self.libmpv.set_wakeup_callback(self.handle, func, data)
 
+    def get_wakeup_pipe(self):
+        """Return a UNIX file descriptor that becomes readable when new
+        events are queued. Read all data from it before calling
+        :obj:`wait_event() <mpv.Mpv.wait_event>` with a timeout of 0 until
+        it returns a ``NONE`` event.
+
+        Returns:
+            int: the read end of the wakeup pipe.
+
+        Raises:
+            mpv.MpvError: if the pipe can't be created, e.g. on Windows.
+
+        """
+        return self.libmpv.get_wakeup_pipe(self.handle)
+
     def terminate_destroy(self):
         """ """
+        self._stop_write_queue()
         self.handle, handle = None, self.handle
         self.libmpv.mpv_terminate_destroy(handle)
+        self._stop_log_pipeline()
 
     def detach_destroy(self):
         """ """
+        self._stop_write_queue()
         self.handle, handle = None, self.handle
         self.libmpv.mpv_detach_destroy(handle)
+        self._stop_log_pipeline()
 
     def request_log_messages(self, level):
         """Enable or disable receiving of log messages.
@@ -131,13 +236,125 @@ class Mpv(object):
         """
         self.libmpv.mpv_request_log_messages(self.handle, level.encode())
 
+    def set_log_pipeline(self, pipeline):
+        """Route log messages through a
+        :obj:`LogPipeline <mpv.logs.LogPipeline>` instead of returning them
+        from :obj:`wait_event() <mpv.Mpv.wait_event>`. Messages are requested
+        at the most verbose level of the pipeline's filters and the pipeline's
+        forwarding thread is started. Passing ``None`` stops the current
+        pipeline.
+
+        Args:
+            pipeline (:obj:`mpv.logs.LogPipeline`): the pipeline, or ``None``.
+
+        """
+        self._stop_log_pipeline()
+        if pipeline is None:
+            return
+        self.log_pipeline = pipeline
+        pipeline.start()
+        self.request_log_messages(pipeline.request_level())
+
+    def _stop_log_pipeline(self):
+        self.log_pipeline, pipeline = None, self.log_pipeline
+        if pipeline is not None:
+            pipeline.stop()
+
+    def set_write_queue(self, queue):
+        """Defer property attribute writes to a
+        :obj:`WriteQueue <mpv.writes.WriteQueue>`, which coalesces them and
+        sends them asynchronously. Passing ``None`` flushes and removes the
+        current queue, writes are synchronous again.
+
+        Args:
+            queue (:obj:`mpv.writes.WriteQueue`): the queue, or ``None``.
+
+        Raises:
+            ValueError: if there is no :obj:`event_thread <mpv.Mpv>`, the
+                queue relies on routed events to confirm writes.
+
+        """
+        self._stop_write_queue()
+        if queue is None:
+            return
+        queue.start(self)
+        self.write_queue = queue
+
+    def _stop_write_queue(self):
+        self.write_queue, queue = None, self.write_queue
+        if queue is not None:
+            queue.stop()
+
+    @property
+    def schema(self):
+        """:obj:`PropertySchema <mpv.properties.PropertySchema>`: the
+        properties this libmpv provides. Discovered on first use, or loaded
+        from the disk cache. ``None`` while it can't be discovered, e.g.
+        before the instance is initialized.
+
+        """
+        if self._schema is None:
+            try:
+                self._schema = PropertySchema.load(self)
+            except MpvError as e:
+                log.debug(e)
+        return self._schema
+
+    def has_property(self, name):
+        """
+        Args:
+            name (str): the name of the property.
+
+        Returns:
+            bool: whether libmpv provides the property.
+
+        """
+        schema = self.schema
+        if schema is None:
+            return name in PROPERTIES
+        return name in schema
+
+    def property_format(self, name):
+        """
+        Args:
+            name (str): the name of the property.
+
+        Returns:
+            :obj:`mpv.Format`: the cheapest format to read the property in.
+            The formats in :obj:`PROPERTIES <mpv.PROPERTIES>` are kept,
+            other properties use the discovered :obj:`schema
+            <mpv.Mpv.schema>`, so only they can trigger its discovery.
+            Sub-property paths use :obj:`path_format()
+            <mpv.paths.path_format>`.
+
+        Raises:
+            ValueError: if ``name`` is an invalid sub-property path.
+
+        """
+        if '/' in name:
+            try:
+                return paths.path_format(name)
+            except ValueError:
+                # maybe a root only the schema knows.
+                schema = self.schema
+                if schema is None:
+                    raise
+                return paths.path_format(name, schema.names)
+        static = PROPERTIES.get(name)
+        if static is not None:
+            return static[0]
+        schema = self.schema
+        if schema is not None:
+            return schema.formats.get(name, Format.NODE)
+        return Format.NODE
+
     def available_properties(self):
         """
         Returns:
             list: names of properties that can be accessed.
 
         """
-        return list(set(self.property_list).intersection(PROPERTIES.keys()))
+        return list(self._property_names().intersection(PROPERTIES))
 
     def unavailable_properties(self):
         """
@@ -145,15 +362,23 @@ class Mpv(object):
             list: names of properties that cannot be accessed.
 
         """
-        return list(set(self.property_list).difference(PROPERTIES.keys()))
+        return list(self._property_names().difference(PROPERTIES))
+
+    def _property_names(self):
+        schema = self.schema
+        if schema is None:
+            return frozenset(self.property_list)
+        return schema.names
 
     def observe_property(self, name, mpv_format=None, reply_userdata=0):
         """Get a notification whenever the given property changes.
 
         Args:
-            name (str): the name of the property.
+            name (str): the name of the property, or a sub-property path,
+                see :obj:`observe_path() <mpv.Mpv.observe_path>`.
             mpv_format (:obj:`mpv.Format`, optional): The format of the
-                data.
+                data. Defaults to :obj:`property_format()
+                <mpv.Mpv.property_format>`.
             reply_userdata (int, optional): This will be used for the
                 mpv_event.reply_userdata field for the received
                 MPV_EVENT_PROPERTY_CHANGE events.
@@ -163,13 +388,86 @@ class Mpv(object):
             mpv.MpvError
 
         """
-        if name not in PROPERTIES:
+        if '/' in name:
+            self.observe_path(name, mpv_format, reply_userdata)
+            return
+        if name not in PROPERTIES and not self.has_property(name):
             raise AttributeError('Property "{}" not available.'.format(name))
         if mpv_format is None:
-            mpv_format = PROPERTIES[name][0]
+            mpv_format = self.property_format(name)
         self.libmpv.mpv_observe_property(self.handle, reply_userdata,
                                          name.encode(), mpv_format)
 
+    def get_path(self, path, mpv_format=None):
+        """Read a single sub-property instead of decoding the whole property,
+        e.g. ``track-list/3/lang`` or ``metadata/by-key/title``. Paths can be
+        built with the functions in :obj:`mpv.paths`.
+
+        Example:
+        ::
+
+            count = player.get_path('track-list/count')
+            langs = [player.get_path(mpv.paths.track(i, 'lang'))
+                     for i in range(count)]
+
+        Args:
+            path (str): the sub-property path.
+            mpv_format (:obj:`mpv.Format`, optional): the format of the
+                data. Defaults to :obj:`path_format()
+                <mpv.paths.path_format>`.
+
+        Raises:
+            ValueError: if the path is invalid.
+            mpv.MpvError: e.g. if the entry doesn't exist.
+
+        """
+        if mpv_format is None:
+            mpv_format = self.property_format(path)
+        return self.libmpv._get_property(self.handle, path, mpv_format)
+
+    def set_path(self, path, value, mpv_format=None):
+        """Write a single sub-property.
+
+        Args:
+            path (str): the sub-property path.
+            value: the new value.
+            mpv_format (:obj:`mpv.Format`, optional): the format of the
+                data. Defaults to :obj:`path_format()
+                <mpv.paths.path_format>`.
+
+        Raises:
+            ValueError: if the path is invalid.
+            mpv.MpvError
+
+        """
+        if mpv_format is None:
+            mpv_format = self.property_format(path)
+        self.libmpv._set_property(self.handle, path, mpv_format, value)
+
+    def observe_path(self, path, mpv_format=None, reply_userdata=0):
+        """Like :obj:`observe_property() <mpv.Mpv.observe_property>`, for a
+        single sub-property, so only that value is decoded when it changes.
+        :obj:`subscribe() <mpv.Mpv.subscribe>` accepts paths as well.
+
+        Args:
+            path (str): the sub-property path, e.g. ``playlist/0/title``.
+            mpv_format (:obj:`mpv.Format`, optional): the format of the
+                data. Defaults to :obj:`path_format()
+                <mpv.paths.path_format>`.
+            reply_userdata (int, optional): used for the reply_userdata
+                field of the ``PROPERTY_CHANGE`` events.
+
+        Raises:
+            ValueError: if the path is invalid.
+            mpv.MpvError
+
+        """
+        fmt = self.property_format(path)
+        if mpv_format is None:
+            mpv_format = fmt
+        self.libmpv.mpv_observe_property(self.handle, reply_userdata,
+                                         path.encode(), mpv_format)
+
     def unobserve_property(self, reply_userdata):
         """Undo observe_property(). This will remove all observed properties
         for which the given number was passed as reply_userdata to
@@ -182,6 +480,163 @@ class Mpv(object):
         """
         self.libmpv.mpv_unobserve_property(self.handle, reply_userdata)
 
+    def subscribe(self, name, callback, fmt=None, diff=False, ignore=()):
+        """Observe a property and call ``callback`` with every change.
+        Subscribers share one mpv observation per property and format, see
+        :obj:`ObservationManager <mpv.observe.ObservationManager>`. Events
+        are routed to the callbacks by ``reply_userdata`` with a single dict
+        lookup and don't reach :obj:`on_property_change()
+        <mpv.templates.AbstractTemplate.on_property_change>`.
+
+        Routing happens in the templates' event loops. Without a template,
+        pass each event from :obj:`wait_event() <mpv.Mpv.wait_event>` to
+        :obj:`route_event() <mpv.Mpv.route_event>`.
+
+        Example:
+        ::
+
+            player.subscribe('pause', lambda prop: print(prop.data))
+
+        Args:
+            name (str): the name of the property.
+            callback (:obj:`callable`): called with the
+                :obj:`Property <mpv.events.Property>` event data.
+            fmt (:obj:`mpv.Format`, optional): the format of the data.
+            diff (bool, optional): for list properties like ``track-list``,
+                call ``callback`` with a :obj:`ListDelta
+                <mpv.diff.ListDelta>` instead of the list, only when
+                something changed.
+            ignore (iterable, optional): with ``diff``, item fields whose
+                changes are ignored, e.g. ``{'demux-bitrate'}``.
+
+        Returns:
+            int: the subscription id, for
+            :obj:`unsubscribe() <mpv.Mpv.unsubscribe>`.
+
+        Raises:
+            AttributeError: if the property isn't available.
+            mpv.MpvError
+
+        """
+        return self.observations.subscribe(name, callback, fmt, diff,
+                                           ignore)
+
+    def unsubscribe(self, subscription):
+        """Undo :obj:`subscribe() <mpv.Mpv.subscribe>`. The property is
+        unobserved once it has no subscribers left.
+
+        Args:
+            subscription (int): the subscription id.
+
+        """
+        self.observations.unsubscribe(subscription)
+
+    def add_event_listener(self, event_id, callback):
+        """Call ``callback`` with every event of a kind. Listeners only
+        observe events, they are still dispatched as usual. Like
+        :obj:`subscribe() <mpv.Mpv.subscribe>`, this relies on events being
+        passed to :obj:`route_event() <mpv.Mpv.route_event>`.
+
+        Args:
+            event_id (int): the :obj:`mpv.EventID`.
+            callback (:obj:`callable`): called with the
+                :obj:`Event <mpv.events.Event>`.
+
+        Returns:
+            int: the listener id, for :obj:`remove_event_listener()
+            <mpv.Mpv.remove_event_listener>`.
+
+        """
+        listener = next(self._reply_userdata)
+        event_id = getattr(event_id, 'value', event_id)
+        self._event_listeners.setdefault(event_id, {})[listener] = callback
+        return listener
+
+    def remove_event_listener(self, listener):
+        """Undo :obj:`add_event_listener() <mpv.Mpv.add_event_listener>`.
+
+        Args:
+            listener (int): the listener id.
+
+        """
+        for listeners in self._event_listeners.values():
+            if listeners.pop(listener, None) is not None:
+                return
+
+    def route_event(self, event):
+        """Deliver an event to its subscribers, or resolve the future of the
+        asynchronous request it replies to.
+
+        Args:
+            event (:obj:`Event <mpv.events.Event>`): an event returned by
+                :obj:`wait_event() <mpv.Mpv.wait_event>`.
+
+        Returns:
+            bool: ``True`` if the event was delivered.
+
+        """
+        listeners = self._event_listeners.get(event.event_id.value)
+        if listeners:
+            for callback in list(listeners.values()):
+                callback(event)
+        if self.observations.route(event):
+            return True
+        if (event.event_id not in _REPLY_EVENTS or
+                event.reply_userdata not in self._replies):
+            return False
+        future, func, args = self._replies.pop(event.reply_userdata)
+        if event.error.value < 0:
+            future.set_exception(MpvError(
+                func, event.error,
+                self.libmpv.mpv_error_string(event.error.value).decode(),
+                list(args)))
+        elif event.event_id == EventID.GET_PROPERTY_REPLY:
+            future.set_result(event.data.data)
+        else:
+            future.set_result(None)
+        return True
+
+    def _request_async(self, func, args, request):
+        """Start an asynchronous request and return a future resolved by
+        :obj:`route_event() <mpv.Mpv.route_event>`."""
+        reply_userdata = next(self._reply_userdata)
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self._replies[reply_userdata] = (future, func, args)
+        try:
+            request(reply_userdata)
+        except Exception:
+            del self._replies[reply_userdata]
+            raise
+        return future
+
+    def set_property_async(self, name, value, mpv_format=None):
+        """Set a property without waiting for mpv. The result arrives as a
+        ``SET_PROPERTY_REPLY`` event, see :obj:`command_async()
+        <mpv.Mpv.command_async>`.
+
+        Args:
+            name (str): the name of the property, or a sub-property path.
+            value: the new value.
+            mpv_format (:obj:`mpv.Format`, optional): the format of the
+                data. Defaults to :obj:`property_format()
+                <mpv.Mpv.property_format>`.
+
+        Returns:
+            :obj:`concurrent.futures.Future`: resolved with ``None``, or
+            failed with :obj:`mpv.MpvError`.
+
+        Raises:
+            mpv.MpvError: if the request can't be sent.
+
+        """
+        if mpv_format is None:
+            mpv_format = self.property_format(name)
+        return self._request_async(
+            'mpv_set_property_async', (name, value),
+            lambda reply_userdata: self.libmpv.set_property_async(
+                self.handle, reply_userdata, name, mpv_format, value))
+
     def command(self, *args):
         """Send a command to the player. Commands are the same as those used
         in ``input.conf``. see: `Input Commands`_.
@@ -200,6 +655,79 @@ class Mpv(object):
         """
         self.libmpv.command(self.handle, *args)
 
+    def command_async(self, *args):
+        """Like :obj:`command() <mpv.Mpv.command>`, but returns immediately.
+        The result arrives as a ``COMMAND_REPLY`` event that is routed like
+        :obj:`subscribe() <mpv.Mpv.subscribe>` events, so the future is only
+        resolved while events are passed to :obj:`route_event()
+        <mpv.Mpv.route_event>`, which the templates do.
+
+        Args:
+            *args: strings.
+
+        Returns:
+            :obj:`concurrent.futures.Future`: resolved with ``None``, or
+            failed with :obj:`mpv.MpvError`.
+
+        Raises:
+            mpv.MpvError: if the command can't be sent.
+
+        """
+        return self._request_async(
+            'mpv_command_async', args,
+            lambda reply_userdata: self.libmpv.command_async(
+                self.handle, reply_userdata, *args))
+
+    def playlist_extend(self, paths, options=None, progress=None,
+                        cancel=None, chunk_size=1000, max_pending=64,
+                        timeout=10.0):
+        """Append many entries to the playlist, much faster than one
+        ``loadfile`` command each.
+
+        Without ``options`` the entries are written to temporary playlist
+        files of ``chunk_size`` entries, which are loaded with ``loadlist``.
+        Relative paths are made absolute. A chunk that fails is retried one
+        entry at a time.
+
+        With ``options`` every entry needs its own ``loadfile``, these are
+        sent with :obj:`command_async() <mpv.Mpv.command_async>`, keeping up
+        to ``max_pending`` in flight. The replies are delivered by the
+        :obj:`event_thread <mpv.Mpv>`. Without one they are read here with
+        :obj:`wait_event() <mpv.Mpv.wait_event>`, and the other events read
+        meanwhile only reach :obj:`route_event() <mpv.Mpv.route_event>`.
+        Called from the event thread itself, e.g. a Qt slot, the commands
+        are sent synchronously.
+
+        Example:
+        ::
+
+            loaded, failures = player.playlist_extend(
+                paths, progress=lambda done, total: print(done, total))
+
+        Args:
+            paths (iterable): the files or URLs.
+            options (dict, optional): per-file options applied to every
+                entry, e.g. ``{'start': '+10'}``.
+            progress (:obj:`callable`, optional): called with
+                ``(done, total)`` while loading.
+            cancel (:obj:`threading.Event`, optional): stops loading when
+                set. Entries already sent are kept.
+            chunk_size (int, optional): entries per ``loadlist``.
+            max_pending (int, optional): maximum number of ``loadfile``
+                commands in flight.
+            timeout (float, optional): seconds to wait for each reply.
+
+        Returns:
+            tuple: ``(loaded, failures)``, the number of added entries and a
+            list of ``(index, path, error)`` for entries that failed.
+
+        Raises:
+            TimeoutError: if a reply doesn't arrive within ``timeout``.
+
+        """
+        return playlist.extend(self, paths, options, progress, cancel,
+                               chunk_size, max_pending, timeout)
+
     def command_node(self, *args):
         """Send a command to the player. Commands are the same as those used
         in ``input.conf``. see: `Input Commands`_.
@@ -245,13 +773,27 @@ class Mpv(object):
         self.command('quit', code)
 
 
+# returned by WriteQueue.peek() when nothing is queued.
+_UNSET = object()
+
+
 def _bindproperty(cls, name, proptype, access):
 
-    def getter(self):
+    def read(self):
         return self.libmpv._get_property(self.handle, name, proptype)
 
+    def getter(self):
+        if self.write_queue is not None:
+            value = self.write_queue.peek(name, _UNSET)
+            if value is not _UNSET:
+                return value
+        return read(self)
+
     def setter(self, value):
-        self.libmpv._set_property(self.handle, name, proptype, value)
+        if self.write_queue is not None:
+            self.write_queue.set(name, value, proptype)
+        else:
+            self.libmpv._set_property(self.handle, name, proptype, value)
 
     def barf(*args):
         raise NotImplementedError('Access denied')
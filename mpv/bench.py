@@ -0,0 +1,156 @@
+import time
+
+from .api import Mpv
+from .exceptions import MpvError
+from .probe import load
+from .profiles import HEADLESS_PROFILES, headless_options
+from .types import EventID, ErrorCode, Format
+
+
+# reply_userdata of the eof-reached observation.
+_EOF_REACHED = 1
+
+# older mpv versions name the VO drops vo-drop-frame-count and the decoder
+# drops drop-frame-count.
+_DROP_PROPERTIES = ('frame-drop-count', 'vo-drop-frame-count')
+_DECODER_DROP_PROPERTIES = ('decoder-frame-drop-count', 'drop-frame-count')
+
+# seconds allowed for loading when there is no timeout.
+_LOAD_TIMEOUT = 60.0
+
+
+def _usable(options):
+    """Whether options decode video without a render context and keep the
+    file open at its end."""
+    return (options.get('vid') != 'no' and options.get('vo') != 'libmpv' and
+            options.get('keep-open') not in (None, False, 'no'))
+
+
+#: the :obj:`HEADLESS_PROFILES <mpv.profiles.HEADLESS_PROFILES>`
+#: :obj:`bench_decode() <mpv.bench.bench_decode>` can use.
+BENCH_PROFILES = tuple(sorted(name for name, options in
+                              HEADLESS_PROFILES.items() if _usable(options)))
+
+
+def _read(player, names, mpv_format=Format.INT64):
+    for name in names:
+        try:
+            return player.get_path(name, mpv_format)
+        except MpvError:
+            pass
+    return None
+
+
+def bench_decode(path, profile='decode-bench', options=None, end=None,
+                 timeout=None, **overrides):
+    """Decode a video as fast as possible and measure it. The file is
+    loaded paused, then decoded untimed into ``vo=null`` until it ends.
+
+    Example:
+    ::
+
+        result = mpv.bench.bench_decode('video.mkv', hwdec='auto')
+        print(result['fps'])
+
+    Args:
+        path (str): the file or URL.
+        profile (str, optional): one of :obj:`BENCH_PROFILES
+            <mpv.bench.BENCH_PROFILES>`. Other profiles are accepted if the
+            options make them decode video into a VO and keep the file
+            open at its end.
+        options (dict, optional): options that override the profile, e.g.
+            ``hwdec`` or ``vd-lavc-threads``.
+        end (float, optional): stop at this position in seconds.
+        timeout (float, optional): seconds allowed for loading and for
+            decoding. ``None`` allows a minute for loading and waits until
+            the file ends.
+        **overrides (optional): more options, use underscores in place of
+            hyphens.
+
+    Returns:
+        dict: ``frames`` decoded, ``seconds`` of wall time measured with
+        :obj:`get_time_us() <mpv.Mpv.get_time_us>`, ``fps``, ``drops``
+        (``frame-drop-count``, formerly ``vo-drop-frame-count``),
+        ``decoder_drops`` (``decoder-frame-drop-count``, formerly
+        ``drop-frame-count``), the process ``cpu`` seconds, which include mpv's
+        threads, and the ``position`` reached.
+
+    Raises:
+        ValueError: if the profile doesn't exist, or with the options
+            doesn't decode video or doesn't keep the file open.
+        TimeoutError: if loading or decoding takes longer than ``timeout``.
+        mpv.MpvError: if the file can't be played.
+
+    """
+    options = dict(options or {})
+    if end is not None:
+        options['end'] = str(end)
+    if not _usable(headless_options(profile, options, **overrides)):
+        raise ValueError('Profile "{}" can\'t be benchmarked, expected one '
+                         'of {}.'.format(profile, ', '.join(BENCH_PROFILES)))
+    player = Mpv.headless(profile, options, **overrides)
+    try:
+        player.observe_property('eof-reached', Format.FLAG, _EOF_REACHED)
+        load(player, path, _LOAD_TIMEOUT if timeout is None else timeout,
+             decode=True)
+        first = _read(player, ('estimated-frame-number',)) or 0
+        cpu = time.process_time()
+        start = player.get_time_us()
+        player.pause = False
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = -1
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('Timed out decoding "{}".'.format(
+                        path))
+            event = player.wait_event(remaining)
+            if (event.event_id == EventID.PROPERTY_CHANGE and
+                    event.reply_userdata == _EOF_REACHED and
+                    event.data.data):
+                break
+            if event.event_id in (EventID.END_FILE, EventID.SHUTDOWN):
+                error = ErrorCode(ErrorCode.NOTHING_TO_PLAY)
+                if event.event_id == EventID.END_FILE:
+                    error = event.data.error
+                raise MpvError('bench_decode', error,
+                               'playback ended before the end of the file',
+                               [path])
+
+        seconds = (player.get_time_us() - start) / 1e6
+        cpu = time.process_time() - cpu
+        frames = (_read(player, ('estimated-frame-number',)) or 0) - first
+        return {
+            'path': path,
+            'frames': frames,
+            'seconds': seconds,
+            'fps': frames / seconds if seconds > 0 else None,
+            'drops': _read(player, _DROP_PROPERTIES),
+            'decoder_drops': _read(player, _DECODER_DROP_PROPERTIES),
+            'cpu': cpu,
+            'position': _read(player, ('time-pos',), Format.DOUBLE),
+        }
+    finally:
+        player.terminate_destroy()
+
+
+def format_result(result):
+    """
+    Returns:
+        str: a :obj:`bench_decode() <mpv.bench.bench_decode>` result as
+        readable lines.
+
+    """
+    lines = [result['path']]
+    for key, label, fmt in (('frames', 'frames', '{}'),
+                            ('seconds', 'wall time', '{:.3f}s'),
+                            ('fps', 'decode fps', '{:.1f}'),
+                            ('drops', 'dropped', '{}'),
+                            ('decoder_drops', 'decoder dropped', '{}'),
+                            ('cpu', 'cpu time', '{:.3f}s')):
+        value = result.get(key)
+        lines.append('  {:<16}{}'.format(
+            label, 'n/a' if value is None else fmt.format(value)))
+    return '\n'.join(lines)
@@ -0,0 +1,284 @@
+import collections
+import logging
+import threading
+import time
+
+from .exceptions import MpvError
+from .types import Format
+
+
+log = logging.getLogger(__name__)
+
+
+class CacheBudget(object):
+    """A memory budget for demuxer caches, shared by the
+    :obj:`CacheController <mpv.buffering.CacheController>` instances of a
+    pool of players.
+
+    Args:
+        max_bytes (int): the total of ``demuxer-max-bytes`` of all players.
+
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._shares = {}
+        self._lock = threading.Lock()
+
+    @property
+    def used(self):
+        """int: bytes granted to all owners."""
+        with self._lock:
+            return sum(self._shares.values())
+
+    @property
+    def available(self):
+        """int: bytes that can still be granted."""
+        return self.max_bytes - self.used
+
+    def resize(self, owner, nbytes):
+        """Change the share of ``owner``.
+
+        Args:
+            owner: any hashable, e.g. a controller.
+            nbytes (int): the wanted share.
+
+        Returns:
+            int: the granted share, ``nbytes`` or as much of it as is left.
+
+        """
+        with self._lock:
+            current = self._shares.get(owner, 0)
+            free = self.max_bytes - sum(self._shares.values()) + current
+            granted = max(0, min(nbytes, free))
+            self._shares[owner] = granted
+            return granted
+
+    def release(self, owner):
+        """Give back the share of ``owner``."""
+        with self._lock:
+            self._shares.pop(owner, None)
+
+
+class CacheController(object):
+    """Sizes the demuxer cache of a player at runtime. Every time playback
+    pauses for the cache (``paused-for-cache``), the stall rate over the
+    last ``window`` seconds is checked, and above ``target_stalls`` the
+    readahead and the cache size are grown by ``grow``. While the cache is
+    full (``demuxer-cache-idle``) and there was no stall for a ``window``,
+    they shrink by ``shrink``, at most once per ``cooldown``, to free memory
+    for other players of the same budget. mpv reports only changes of
+    ``demuxer-cache-idle``, so shrinking is checked again with every
+    ``demuxer-cache-duration`` update while the cache stays idle.
+
+    Every change is logged and kept in :obj:`decisions
+    <mpv.buffering.CacheController>`. The player's events have to be
+    routed, which the templates do.
+
+    Example:
+    ::
+
+        budget = mpv.buffering.CacheBudget(1 << 30)
+        controllers = [mpv.buffering.CacheController(player, budget)
+                       for player in players]
+
+    Args:
+        player (:obj:`mpv.Mpv`): an initialized player.
+        budget (:obj:`CacheBudget <mpv.buffering.CacheBudget>`, optional):
+            a budget shared with other controllers.
+        min_readahead (float, optional): lower bound of
+            ``demuxer-readahead-secs``.
+        max_readahead (float, optional): upper bound of
+            ``demuxer-readahead-secs``.
+        min_bytes (int, optional): lower bound of ``demuxer-max-bytes``.
+        max_bytes (int, optional): upper bound of ``demuxer-max-bytes``.
+        target_stalls (int, optional): stalls per ``window`` that are
+            tolerated.
+        window (float, optional): seconds the stall rate is measured over.
+        grow (float, optional): factor applied after too many stalls.
+        shrink (float, optional): factor applied while the cache idles.
+        cooldown (float, optional): minimum seconds from a change to the
+            next shrink.
+
+    Attributes:
+        readahead (float): the current ``demuxer-readahead-secs``.
+        max_bytes (int): the current ``demuxer-max-bytes``.
+        stalls (int): times playback paused for the cache.
+        stalled (float): seconds spent paused for the cache.
+        idle (bool): whether the cache is full.
+        decisions (:obj:`collections.deque`): the last changes as
+            ``(time, reason, readahead, max_bytes)`` tuples.
+
+    """
+
+    def __init__(self, player, budget=None, min_readahead=5.0,
+                 max_readahead=120.0, min_bytes=16 << 20,
+                 max_bytes=512 << 20, target_stalls=1, window=600.0,
+                 grow=1.5, shrink=0.8, cooldown=60.0):
+        self.player = player
+        self.budget = budget
+        self.min_readahead = min_readahead
+        self.max_readahead = max_readahead
+        self.min_bytes = min_bytes
+        self.max_bytes_limit = max_bytes
+        self.target_stalls = target_stalls
+        self.window = window
+        self.grow = grow
+        self.shrink = shrink
+        self.cooldown = cooldown
+
+        self.stalls = 0
+        self.stalled = 0.0
+        self.decisions = collections.deque(maxlen=100)
+        self.buffering = None
+        self.cache_duration = None
+        self.idle = False
+        self._stall_times = collections.deque()
+        self._stall_start = None
+        self._changed = time.monotonic()
+        # bytes granted by the budget.
+        self._share = 0
+
+        self.readahead = self._clamp(
+            self._option('demuxer-readahead-secs', min_readahead),
+            min_readahead, max_readahead)
+        self.max_bytes = self._clamp(
+            self._option('demuxer-max-bytes', min_bytes),
+            min_bytes, max_bytes)
+        self._apply('start', self.readahead, self.max_bytes)
+
+        self._subscriptions = [
+            player.subscribe('paused-for-cache', self._on_paused_for_cache,
+                             Format.FLAG),
+            player.subscribe('demuxer-cache-idle', self._on_idle,
+                             Format.FLAG),
+            player.subscribe('demuxer-cache-duration', self._on_duration,
+                             Format.DOUBLE),
+            player.subscribe('cache-buffering-state', self._on_buffering,
+                             Format.INT64),
+        ]
+
+    def close(self):
+        """Stop adjusting the cache and give back the budget share."""
+        for subscription in self._subscriptions:
+            self.player.unsubscribe(subscription)
+        self._subscriptions = []
+        if self.budget is not None:
+            self.budget.release(self)
+            self._share = 0
+
+    @staticmethod
+    def _clamp(value, lower, upper):
+        return min(max(value, lower), upper)
+
+    def _option(self, name, default):
+        try:
+            value = self.player.get_path(name)
+        except MpvError:
+            return default
+        return default if value is None else value
+
+    def _restore_share(self):
+        if self._share:
+            self.budget.resize(self, self._share)
+        else:
+            self.budget.release(self)
+
+    def _apply(self, reason, readahead, max_bytes):
+        max_bytes = int(max_bytes)
+        if self.budget is not None:
+            max_bytes = self.budget.resize(self, max_bytes)
+            if max_bytes < self.min_bytes:
+                log.warning('Cache budget exhausted, {} bytes left, not '
+                            'resizing.'.format(max_bytes))
+                self._restore_share()
+                return
+        try:
+            self.player.set_option('demuxer-readahead-secs',
+                                   float(readahead))
+            self.player.set_option('demuxer-max-bytes', str(max_bytes))
+        except MpvError as e:
+            log.warning('Resizing the demuxer cache failed: {}'.format(e))
+            if self.budget is not None:
+                self._restore_share()
+            return
+        if self.budget is not None:
+            self._share = max_bytes
+        self.readahead, self.max_bytes = readahead, max_bytes
+        self._changed = time.monotonic()
+        self.decisions.append((time.time(), reason, readahead, max_bytes))
+        log.info('Demuxer cache ({}): readahead {:.1f}s, {} bytes.'.format(
+            reason, readahead, max_bytes))
+
+    def stall_rate(self):
+        """
+        Returns:
+            int: stalls within the last ``window`` seconds.
+
+        """
+        horizon = time.monotonic() - self.window
+        while self._stall_times and self._stall_times[0] < horizon:
+            self._stall_times.popleft()
+        return len(self._stall_times)
+
+    def _on_paused_for_cache(self, prop):
+        now = time.monotonic()
+        if prop.data and self._stall_start is None:
+            self._stall_start = now
+            self.stalls += 1
+            self._stall_times.append(now)
+            if self.stall_rate() > self.target_stalls:
+                self._grow()
+        elif not prop.data and self._stall_start is not None:
+            self.stalled += now - self._stall_start
+            self._stall_start = None
+
+    def _grow(self):
+        readahead = self._clamp(self.readahead * self.grow,
+                                self.min_readahead, self.max_readahead)
+        max_bytes = self._clamp(self.max_bytes * self.grow,
+                                self.min_bytes, self.max_bytes_limit)
+        if readahead == self.readahead and max_bytes == self.max_bytes:
+            log.info('Demuxer cache at its limits after {} stalls.'.format(
+                self.stall_rate()))
+            return
+        self._apply('stalls', readahead, max_bytes)
+
+    def _on_idle(self, prop):
+        self.idle = bool(prop.data)
+        self._shrink()
+
+    def _shrink(self):
+        now = time.monotonic()
+        if (not self.idle or self._stall_start is not None or
+                self.stall_rate() or now - self._changed < self.cooldown):
+            return
+        readahead = self._clamp(self.readahead * self.shrink,
+                                self.min_readahead, self.max_readahead)
+        max_bytes = self._clamp(self.max_bytes * self.shrink,
+                                self.min_bytes, self.max_bytes_limit)
+        if readahead != self.readahead or max_bytes != self.max_bytes:
+            self._apply('idle', readahead, max_bytes)
+
+    def _on_duration(self, prop):
+        self.cache_duration = prop.data
+        self._shrink()
+
+    def _on_buffering(self, prop):
+        self.buffering = prop.data
+
+    def stats(self):
+        """
+        Returns:
+            dict: the current settings, the stall counters and the cache
+            state.
+
+        """
+        return {'readahead': self.readahead,
+                'max_bytes': self.max_bytes,
+                'stalls': self.stalls,
+                'stalled': self.stalled,
+                'stall_rate': self.stall_rate(),
+                'cache_duration': self.cache_duration,
+                'buffering': self.buffering,
+                'idle': self.idle}
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .properties import cache_dir
+
+
+log = logging.getLogger(__name__)
+
+
+#: version of the database layout, databases with another one are rebuilt.
+SCHEMA_VERSION = 1
+
+# bytes hashed at the start and at the end of a file.
+_HASH_BLOCK = 1 << 16
+
+
+def content_hash(path, size):
+    """
+    Returns:
+        str: a hash of the size, the first and the last 64 KiB of a file.
+        Cheap enough for large libraries, and it catches files that were
+        replaced while keeping their mtime.
+
+    """
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(_HASH_BLOCK))
+        if size > _HASH_BLOCK:
+            f.seek(max(_HASH_BLOCK, size - _HASH_BLOCK))
+            h.update(f.read(_HASH_BLOCK))
+    return h.hexdigest()
+
+
+class ProbeCache(object):
+    """A persistent sqlite cache of property snapshots, e.g. the results of
+    :obj:`probe_many() <mpv.probe.probe_many>`. Entries are keyed by the
+    absolute path, size and mtime of a file, and optionally a
+    :obj:`content_hash() <mpv.cache.content_hash>`. Only local files are
+    cached.
+
+    Results depend on the mpv build, so every entry belongs to an
+    ``mpv-version``. Setting :obj:`version <mpv.cache.ProbeCache.version>`
+    to another version drops the entries of the old one. The least recently
+    used entries are evicted when the cache exceeds ``max_entries`` or
+    ``max_bytes``.
+
+    Example:
+    ::
+
+        cache = mpv.cache.ProbeCache()
+        for result in mpv.probe.probe_many(paths, cache=cache):
+            ...
+
+    Args:
+        path (str, optional): the database file. Defaults to
+            ``probe.sqlite`` in :obj:`cache_dir()
+            <mpv.properties.cache_dir>`.
+        version (str, optional): the ``mpv-version`` of the results. The
+            probe APIs set it from their player.
+        max_entries (int, optional): maximum number of entries.
+        max_bytes (int, optional): maximum size of the stored snapshots.
+        hash_content (bool, optional): include a content hash in the key.
+
+    """
+
+    def __init__(self, path=None, version=None, max_entries=100000,
+                 max_bytes=256 << 20, hash_content=False):
+        if path is None:
+            os.makedirs(cache_dir(), exist_ok=True)
+            path = os.path.join(cache_dir(), 'probe.sqlite')
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._setup()
+        self._version = self._meta('mpv-version')
+        if version is not None:
+            self.version = version
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def _setup(self):
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta '
+                             '(key TEXT PRIMARY KEY, value TEXT)')
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'schema'").fetchone()
+            if row is None or int(row[0]) != SCHEMA_VERSION:
+                self._db.execute('DROP TABLE IF EXISTS entries')
+                self._db.execute('DELETE FROM meta')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, '
+                'hash TEXT, properties TEXT, nbytes INTEGER, '
+                'accessed REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed '
+                             'ON entries (accessed)')
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('schema', ?)",
+                (str(SCHEMA_VERSION),))
+            self._count, self._bytes = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(nbytes), 0) '
+                'FROM entries').fetchone()
+
+    def _meta(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                                   (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def version(self):
+        """str: the ``mpv-version`` of the cached results, ``None`` while it
+        is unknown."""
+        return self._version
+
+    @version.setter
+    def version(self, version):
+        if version == self._version:
+            return
+        with self._lock, self._db:
+            if self._version is not None:
+                log.debug('Dropping probe results of {}.'.format(
+                    self._version))
+            self._db.execute('DELETE FROM entries')
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('mpv-version', ?)",
+                (version,))
+            self._count = self._bytes = 0
+            self._version = version
+
+    def __len__(self):
+        return self._count
+
+    def _identity(self, path):
+        """
+        Returns:
+            tuple: ``(path, size, mtime, hash)``, or ``None`` if the file
+            can't be cached.
+
+        """
+        if '://' in path:
+            return None
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+            digest = (content_hash(path, st.st_size) if self.hash_content
+                      else None)
+        except OSError:
+            return None
+        return path, st.st_size, st.st_mtime_ns, digest
+
+    def get(self, path, properties):
+        """
+        Args:
+            path (str): the file.
+            properties (iterable): the properties that are needed.
+
+        Returns:
+            dict: the cached snapshot restricted to ``properties``, or
+            ``None`` if the file changed or some properties are missing.
+
+        """
+        identity = self._identity(path)
+        if identity is None or self._version is None:
+            return None
+        snapshot = None
+        with self._lock:
+            row = self._db.execute(
+                'SELECT size, mtime, hash, properties FROM entries '
+                'WHERE path = ?', identity[:1]).fetchone()
+            if row is not None and tuple(row[:3]) == identity[1:]:
+                snapshot = json.loads(row[3])
+                with self._db:
+                    self._db.execute(
+                        'UPDATE entries SET accessed = ? WHERE path = ?',
+                        (time.time(), identity[0]))
+        if snapshot is not None and all(name in snapshot
+                                        for name in properties):
+            self.hits += 1
+            return {name: snapshot[name] for name in properties}
+        self.misses += 1
+        return None
+
+    def put(self, path, properties):
+        """Store a snapshot. Snapshots that can't be stored as JSON, and
+        files that can't be cached, are skipped.
+
+        Args:
+            path (str): the file.
+            properties (dict): property name to value.
+
+        """
+        identity = self._identity(path)
+        if identity is None or self._version is None:
+            return
+        try:
+            data = json.dumps(properties)
+        except (TypeError, ValueError):
+            return
+        nbytes = len(data.encode('utf-8'))
+        with self._lock, self._db:
+            old = self._db.execute(
+                'SELECT nbytes FROM entries WHERE path = ?',
+                identity[:1]).fetchone()
+            if old is None:
+                self._count += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += nbytes
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                identity + (data, nbytes, time.time()))
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # evict down to 90% so this doesn't run on every put.
+        target_count = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            'SELECT path, nbytes FROM entries ORDER BY accessed')
+        evicted = []
+        for path, nbytes in rows:
+            if (self._count <= target_count and
+                    self._bytes <= target_bytes):
+                break
+            evicted.append((path,))
+            self._count -= 1
+            self._bytes -= nbytes
+        self._db.executemany('DELETE FROM entries WHERE path = ?', evicted)
+        log.debug('Evicted {} probe results.'.format(len(evicted)))
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM entries')
+            self._count = self._bytes = 0
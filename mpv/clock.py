@@ -0,0 +1,183 @@
+import math
+import time
+
+from .types import EventID, Format
+
+
+class PlaybackClock(object):
+    """The playback position for widgets that redraw at display rate,
+    without a call into libmpv per read. ``time-pos``, ``speed``, ``pause``
+    and ``seeking`` are observed, and between two ``time-pos`` changes the
+    position is extrapolated from the last one.
+
+    Small differences between the extrapolated position and a new sample
+    are slewed away at ``slew_rate`` instead of jumping. Larger ones, seeks,
+    ``PLAYBACK_RESTART`` and changes of pause or speed resync immediately.
+    Extrapolation stops ``max_extrapolation`` seconds after the last sample,
+    so a stalled player is never off by more than that times the speed.
+
+    The clock runs on mpv's time base: the offset of :func:`time.monotonic`
+    to :obj:`get_time_us() <mpv.Mpv.get_time_us>` is measured when the clock
+    is created and at every ``PLAYBACK_RESTART``. The player's events have
+    to be routed, which the templates do.
+
+    Example:
+    ::
+
+        clock = mpv.clock.PlaybackClock(player)
+        timer.timeout.connect(lambda: slider.setValue(clock.position * 1000))
+
+    Args:
+        player (:obj:`mpv.Mpv`): an initialized player.
+        max_extrapolation (float, optional): seconds after the last sample
+            the position stops advancing.
+        slew_rate (float, optional): seconds of error corrected per second.
+        max_error (float, optional): errors above this many seconds are
+            corrected immediately.
+
+    Attributes:
+        drift (float): the error of the extrapolated position at the last
+            sample, in seconds, positive if the clock was behind.
+        samples (int): ``time-pos`` samples received.
+
+    """
+
+    def __init__(self, player, max_extrapolation=0.5, slew_rate=0.1,
+                 max_error=0.25):
+        self.player = player
+        self.max_extrapolation = max_extrapolation
+        self.slew_rate = slew_rate
+        self.max_error = max_error
+        self.drift = 0.0
+        self.samples = 0
+        self._offset = 0.0
+        self._speed = 1.0
+        self._paused = False
+        self._seeking = False
+        self._resync = True
+        # (position, mpv time, rate, correction), replaced as a whole so
+        # reads from other threads need no lock.
+        self._state = (None, 0.0, 0.0, 0.0)
+        self.calibrate()
+        self._listener = player.add_event_listener(
+            EventID.PLAYBACK_RESTART, self._on_restart)
+        self._subscriptions = [
+            player.subscribe('speed', self._on_speed, Format.DOUBLE),
+            player.subscribe('pause', self._on_pause, Format.FLAG),
+            player.subscribe('seeking', self._on_seeking, Format.FLAG),
+            player.subscribe('time-pos', self._on_time_pos, Format.DOUBLE),
+        ]
+
+    def close(self):
+        """Stop following the player."""
+        for subscription in self._subscriptions:
+            self.player.unsubscribe(subscription)
+        self._subscriptions = []
+        self.player.remove_event_listener(self._listener)
+
+    def calibrate(self):
+        """Measure the offset of :func:`time.monotonic` to mpv's clock."""
+        before = time.monotonic()
+        now = self.player.get_time_us() / 1e6
+        after = time.monotonic()
+        self._offset = now - (before + after) / 2
+
+    def now(self):
+        """
+        Returns:
+            float: mpv's current time in seconds, from
+            :func:`time.monotonic`.
+
+        """
+        return time.monotonic() + self._offset
+
+    @property
+    def position(self):
+        """float: the extrapolated playback position in seconds, ``None``
+        while nothing is playing."""
+        return self._read(self.now())
+
+    def position_at(self, time_us):
+        """
+        Args:
+            time_us (int): a time from :obj:`get_time_us()
+                <mpv.Mpv.get_time_us>`, e.g. when a frame will be shown.
+
+        Returns:
+            float: the extrapolated playback position at that time.
+
+        """
+        return self._read(time_us / 1e6)
+
+    @property
+    def age(self):
+        """float: seconds since the last sample."""
+        return self.now() - self._state[1]
+
+    @property
+    def running(self):
+        """bool: whether the position advances."""
+        return self._rate() != 0.0
+
+    def _rate(self):
+        if self._paused or self._seeking:
+            return 0.0
+        return self._speed
+
+    def _read(self, now):
+        position, then, rate, correction = self._state
+        if position is None:
+            return None
+        elapsed = now - then
+        if correction:
+            decay = self.slew_rate * max(elapsed, 0.0)
+            if abs(correction) <= decay:
+                correction = 0.0
+            else:
+                correction -= math.copysign(decay, correction)
+        elapsed = min(max(elapsed, 0.0), self.max_extrapolation)
+        return position + elapsed * rate + correction
+
+    def _rebase(self):
+        """Restart extrapolation from the current position at the current
+        rate."""
+        now = self.now()
+        self._state = (self._read(now), now, self._rate(), 0.0)
+
+    def _on_time_pos(self, prop):
+        if prop.data is None:
+            self._state = (None, self.now(), 0.0, 0.0)
+            self._resync = True
+            return
+        self.samples += 1
+        now = self.now()
+        rate = self._rate()
+        correction = 0.0
+        predicted = self._read(now)
+        if predicted is not None:
+            self.drift = prop.data - predicted
+            if (not self._resync and rate and
+                    abs(self.drift) <= self.max_error):
+                correction = -self.drift
+        self._resync = False
+        self._state = (prop.data, now, rate, correction)
+
+    def _on_speed(self, prop):
+        self._speed = prop.data if prop.data is not None else 1.0
+        self._rebase()
+
+    def _on_pause(self, prop):
+        self._paused = bool(prop.data)
+        self._rebase()
+        self._resync = True
+
+    def _on_seeking(self, prop):
+        self._seeking = bool(prop.data)
+        self._rebase()
+        self._resync = True
+
+    def _on_restart(self, event):
+        self.calibrate()
+        self._seeking = False
+        self._rebase()
+        self._resync = True
@@ -0,0 +1,158 @@
+import logging
+import queue
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .api import Mpv
+from .exceptions import MpvError
+from .profiles import headless_options
+from .render import SoftwareRenderContext, RENDER_UPDATE_FRAME, SW_FORMATS
+from .types import EventID, EndFileReason
+
+
+log = logging.getLogger(__name__)
+
+
+#: options for decoding as fast as possible without audio or a window, the
+#: ``analysis`` profile of :obj:`HEADLESS_PROFILES
+#: <mpv.profiles.HEADLESS_PROFILES>`.
+DECODE_OPTIONS = headless_options('analysis')
+
+_END = object()
+
+
+def _decode(path, options, size, fmt, frames_queue, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                frames_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    player = ctx = None
+    wake = threading.Event()
+    try:
+        player = Mpv(options=options)
+        player.set_wakeup_callback(lambda _: wake.set(), None)
+        player.initialize()
+        ctx = SoftwareRenderContext(player, size=size, fmt=fmt)
+        ctx.set_update_callback(wake.set)
+
+        player.play(path)
+        finished = False
+        while not stop.is_set():
+            wake.wait(0.1)
+            wake.clear()
+            event = player.wait_event(0)
+            while event.event_id != EventID.NONE:
+                if event.event_id == EventID.VIDEO_RECONFIG and size is None:
+                    ctx.size = (player.dwidth, player.dheight)
+                elif event.event_id == EventID.END_FILE:
+                    if event.data.reason == EndFileReason.ERROR:
+                        raise MpvError(
+                            'loadfile', event.data.error,
+                            player.libmpv.mpv_error_string(
+                                event.data.error.value).decode(), [path])
+                    finished = True
+                elif event.event_id == EventID.SHUTDOWN:
+                    finished = True
+                event = player.wait_event(0)
+            # a frame can still be pending when the file ends, render it
+            # before stopping.
+            if ctx.size is not None and ctx.update() & RENDER_UPDATE_FRAME:
+                width, height = ctx.size
+                frame = numpy.empty((height, width, SW_FORMATS[fmt]),
+                                    numpy.uint8)
+                try:
+                    pts = player.time_pos
+                except MpvError:
+                    pts = None
+                ctx.render(frame)
+                put((pts, frame))
+            if finished:
+                break
+    except Exception as e:
+        put(e)
+    finally:
+        if ctx is not None:
+            ctx.free()
+        if player is not None and player.handle:
+            player.terminate_destroy()
+        put(_END)
+
+
+def frames(path, fps=None, size=None, start=None, end=None, fmt='rgb0',
+           prefetch=8, options=None):
+    """Decode the video of a file as fast as possible and yield its frames.
+    A background thread renders frames with the
+    :obj:`software renderer <mpv.render.SoftwareRenderContext>` into a
+    bounded queue. Leaving the loop stops decoding.
+
+    Example:
+    ::
+
+        for pts, frame in mpv.frames('video.mkv', fps=5, size=(320, 180)):
+            analyse(frame)
+
+    Args:
+        path (str): the file or URL.
+        fps (float, optional): resample to this frame rate.
+        size (tuple, optional): ``(width, height)`` of the frames. Defaults
+            to the display size of the video.
+        start (float, optional): start position in seconds.
+        end (float, optional): end position in seconds.
+        fmt (str, optional): pixel format, one of
+            :obj:`SW_FORMATS <mpv.render.SW_FORMATS>`. The padding byte of
+            the 4 byte formats is kept.
+        prefetch (int, optional): maximum number of decoded frames waiting
+            to be consumed.
+        options (dict, optional): additional mpv options, these override
+            :obj:`DECODE_OPTIONS <mpv.decode.DECODE_OPTIONS>`.
+
+    Yields:
+        tuple: ``(pts, frame)``, where ``frame`` is a NumPy array of shape
+        ``(height, width, bytes per pixel)``. ``pts`` is ``time-pos`` read
+        just before rendering; the render API doesn't report the timestamp
+        of a frame, and with untimed decoding the position can run ahead by
+        a frame, so treat it as approximate.
+
+    Raises:
+        ImportError: if NumPy isn't installed.
+        mpv.MpvError: if the file can't be played.
+
+    """
+    if numpy is None:
+        raise ImportError('mpv.frames() requires NumPy.')
+    all_options = dict(DECODE_OPTIONS)
+    if fps is not None:
+        all_options['vf'] = 'fps=fps={}'.format(fps)
+    if size is not None:
+        all_options['keepaspect'] = False
+    if start is not None:
+        all_options['start'] = str(start)
+    if end is not None:
+        all_options['end'] = str(end)
+    all_options.update(options or {})
+
+    frames_queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    thread = threading.Thread(target=_decode, name='MPVDecodeThread',
+                              args=(path, all_options, size, fmt,
+                                    frames_queue, stop), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = frames_queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,116 @@
+#: the field list items are keyed by, ``None`` keys them by their index and
+#: a tuple of fields by a tuple of their values. Track ids are only unique
+#: per track type. Lists that aren't listed here are keyed by index.
+DIFF_KEYS = {
+    'track-list': ('type', 'id'),
+    'edition-list': 'id',
+    'chapter-list': None,
+}
+
+
+class ListDelta(object):
+    """The difference between two values of a list property, e.g.
+    ``track-list``. It is delivered in place of the list by diffing
+    observations. A delta is false if nothing changed.
+
+    Attributes:
+        added (dict): key to the new item.
+        removed (dict): key to the removed item.
+        modified (dict): key to a dict of the changed fields and their new
+            values. Fields that were removed have the value ``None``.
+
+    """
+    __slots__ = ('added', 'removed', 'modified')
+
+    def __init__(self, added=None, removed=None, modified=None):
+        self.added = added or {}
+        self.removed = removed or {}
+        self.modified = modified or {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def __eq__(self, other):
+        return (isinstance(other, ListDelta) and
+                self.added == other.added and
+                self.removed == other.removed and
+                self.modified == other.modified)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '<ListDelta: +{} -{} ~{}>'.format(
+            sorted(self.added), sorted(self.removed), sorted(self.modified))
+
+
+class ListDiffer(object):
+    """Keeps the last value of a list property and turns new values into
+    :obj:`ListDelta <mpv.diff.ListDelta>` objects.
+
+    Args:
+        name (str): the name of the property, selects the key from
+            :obj:`DIFF_KEYS <mpv.diff.DIFF_KEYS>`.
+        ignore (iterable, optional): fields whose changes don't matter, e.g.
+            ``{'demux-bitrate'}``. Items that only differ in these fields
+            aren't modified.
+
+    """
+    __slots__ = ('key', 'ignore', '_items')
+
+    def __init__(self, name, ignore=()):
+        self.key = DIFF_KEYS.get(name)
+        self.ignore = frozenset(ignore)
+        self._items = {}
+
+    def _index(self, value):
+        if not value:
+            return {}
+        if self.key is None:
+            return dict(enumerate(value))
+        return {self._key(item, i): item for i, item in enumerate(value)}
+
+    def _key(self, item, index):
+        if not isinstance(item, dict):
+            return index
+        if isinstance(self.key, tuple):
+            return tuple(item.get(field) for field in self.key)
+        return item.get(self.key, index)
+
+    def _changes(self, old, new):
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            return new
+        return {field: new.get(field) for field in old.keys() | new.keys()
+                if field not in self.ignore and
+                old.get(field) != new.get(field)}
+
+    def _delta(self, old, new):
+        delta = ListDelta(
+            {key: item for key, item in new.items() if key not in old},
+            {key: item for key, item in old.items() if key not in new})
+        for key, item in new.items():
+            if key in old and old[key] != item:
+                changes = self._changes(old[key], item)
+                if changes:
+                    delta.modified[key] = changes
+        return delta
+
+    def diff(self, value):
+        """
+        Args:
+            value (list): the new value of the property.
+
+        Returns:
+            :obj:`ListDelta <mpv.diff.ListDelta>`: the difference to the
+            last value given to :obj:`update() <mpv.diff.ListDiffer.update>`.
+
+        """
+        return self._delta(self._items, self._index(value))
+
+    def update(self, value):
+        """Like :obj:`diff() <mpv.diff.ListDiffer.diff>`, but the value
+        becomes the last value."""
+        items = self._index(value)
+        delta = self._delta(self._items, items)
+        self._items = items
+        return delta
@@ -0,0 +1,242 @@
+import collections
+import numbers
+import time
+
+from .diff import ListDiffer
+from .events import Event, Property
+from .types import EventID
+
+
+_UNSET = object()
+
+
+def _is_number(value):
+    return (isinstance(value, numbers.Real) and
+            not isinstance(value, bool))
+
+
+class PropertyPolicy(object):
+    """Decides when a ``PROPERTY_CHANGE`` event for one property reaches the
+    handler.
+
+    Args:
+        rate (float, optional): maximum number of dispatches per second.
+        coalesce (bool, optional): if ``True``, changes arriving faster than
+            ``rate`` are held back and the latest one is dispatched once the
+            interval has passed. If ``False`` they are dropped.
+        delta (float, optional): minimum absolute difference between a
+            numeric value and the last dispatched one. Smaller changes are
+            dropped.
+        diff (bool, optional): for list properties like ``track-list``,
+            dispatch a :obj:`ListDelta <mpv.diff.ListDelta>` against the last
+            dispatched value instead of the list. Changes that leave the
+            delta empty are dropped.
+        ignore (iterable, optional): with ``diff``, item fields whose
+            changes are dropped, see :obj:`ListDiffer <mpv.diff.ListDiffer>`.
+
+    """
+    __slots__ = ('interval', 'coalesce', 'delta', 'diff', 'ignore',
+                 '_last_time', '_last_value', '_pending', '_differ')
+
+    def __init__(self, rate=None, coalesce=True, delta=None, diff=False,
+                 ignore=()):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.coalesce = coalesce
+        self.delta = delta
+        self.diff = diff
+        self.ignore = ignore
+        self._differ = None
+        self._last_time = None
+        self._last_value = _UNSET
+        self._pending = None
+
+    def offer(self, event, now):
+        """
+        Args:
+            event (:obj:`mpv.events.Event`): a ``PROPERTY_CHANGE`` event.
+            now (float): the current time in seconds.
+
+        Returns:
+            :obj:`mpv.events.Event`: the event if it should be dispatched
+            now, otherwise ``None``.
+
+        """
+        value = event.data.data
+        if (self.delta is not None and _is_number(value) and
+                _is_number(self._last_value) and
+                abs(value - self._last_value) < self.delta):
+            # the latest value is close to the dispatched one, so anything
+            # held back is stale as well.
+            self._pending = None
+            return None
+        if self.diff and not self._list_differ(event).diff(value):
+            # back to the dispatched list, anything held back is stale.
+            self._pending = None
+            return None
+        if (self._last_time is not None and
+                now - self._last_time < self.interval):
+            if self.coalesce:
+                self._pending = event
+            return None
+        return self._accept(event, now)
+
+    def due(self, now):
+        """
+        Args:
+            now (float): the current time in seconds.
+
+        Returns:
+            :obj:`mpv.events.Event`: the held back event if its interval has
+            passed, otherwise ``None``.
+
+        """
+        if (self._pending is not None and
+                now - self._last_time >= self.interval):
+            return self._accept(self._pending, now)
+        return None
+
+    def next_due(self):
+        """
+        Returns:
+            float: the time at which the held back event is due, or ``None``.
+
+        """
+        if self._pending is None:
+            return None
+        return self._last_time + self.interval
+
+    def _list_differ(self, event):
+        if self._differ is None:
+            self._differ = ListDiffer(event.data.name, self.ignore)
+        return self._differ
+
+    def _accept(self, event, now):
+        self._pending = None
+        self._last_time = now
+        self._last_value = event.data.data
+        if self.diff:
+            delta = self._list_differ(event).update(event.data.data)
+            event = Event(event.event_id, event.error, event.reply_userdata,
+                          Property(event.data.name, delta))
+        return event
+
+
+class PropertyDispatcher(object):
+    """Applies a :obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>` per
+    property name. Properties without a policy pass through unchanged.
+
+    Args:
+        policies (:obj:`dict`, optional): property name to
+            :obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>`.
+        clock (:obj:`callable`, optional): returns the current time in
+            seconds.
+
+    """
+
+    def __init__(self, policies=None, clock=time.monotonic):
+        self._policies = {}
+        self._clock = clock
+        for name, policy in (policies or {}).items():
+            self.set_policy(name, policy)
+
+    def set_policy(self, name, policy):
+        """
+        Args:
+            name (str): the property name.
+            policy (:obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>` or
+                :obj:`dict`): the policy, or its keyword arguments. ``None``
+                removes the policy.
+
+        """
+        if policy is None:
+            self._policies.pop(name, None)
+            return
+        if isinstance(policy, dict):
+            policy = PropertyPolicy(**policy)
+        self._policies[name] = policy
+
+    def filter(self, event):
+        """
+        Args:
+            event (:obj:`mpv.events.Event`): a ``PROPERTY_CHANGE`` event.
+
+        Returns:
+            :obj:`mpv.events.Event`: the event if it should be dispatched
+            now, otherwise ``None``.
+
+        """
+        policy = self._policies.get(event.data.name)
+        if policy is None:
+            return event
+        return policy.offer(event, self._clock())
+
+    def flush(self):
+        """
+        Returns:
+            list: held back events that are due now.
+
+        """
+        now = self._clock()
+        events = []
+        for policy in self._policies.values():
+            event = policy.due(now)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def timeout(self):
+        """
+        Returns:
+            float: seconds until the next held back event is due, or ``-1``
+            if nothing is held back.
+
+        """
+        due = [t for t in (p.next_due() for p in self._policies.values())
+               if t is not None]
+        if not due:
+            return -1
+        return max(0.0, min(due) - self._clock())
+
+
+class EventBatch(object):
+    """Collects events so they can be delivered together. A
+    ``PROPERTY_CHANGE`` event replaces an earlier one for the same property
+    and ``reply_userdata``, so only the latest value is delivered. It takes
+    the place of the newest event, never overtaking events that came before
+    it, e.g. an ``END_FILE``.
+
+    """
+    __slots__ = ('_events', '_serial')
+
+    def __init__(self):
+        # key -> event, properties are keyed by (reply_userdata, name) and
+        # other events by a serial number.
+        self._events = collections.OrderedDict()
+        self._serial = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event):
+        """
+        Args:
+            event (:obj:`mpv.events.Event`): the event to add.
+
+        """
+        if event.event_id == EventID.PROPERTY_CHANGE:
+            key = (event.reply_userdata, event.data.name)
+            self._events.pop(key, None)
+        else:
+            self._serial += 1
+            key = self._serial
+        self._events[key] = event
+
+    def take(self):
+        """
+        Returns:
+            list: the collected events. The batch is empty afterwards.
+
+        """
+        events = list(self._events.values())
+        self._events.clear()
+        return events
@@ -89,7 +89,7 @@ class ClientMessage(SlotsEquality):
             What these arguments mean is up to the sender and receiver.
 
     """
-    __slots__ = ('args')
+    __slots__ = ('args',)
 
     def __init__(self, args):
         self.args = args
@@ -0,0 +1,528 @@
+import contextlib
+import logging
+import math
+import os
+import random
+import struct
+import tempfile
+import time
+from multiprocessing import shared_memory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .render import SW_FORMATS
+
+
+log = logging.getLogger(__name__)
+
+
+MAGIC = b'MPVRING1'
+
+# magic, number of slots, number of consumer entries, slot size, published
+# sequence number.
+_HEADER = struct.Struct('<8sIIQQ')
+_HEADER_SIZE = 64
+_PUBLISHED = 24
+
+# token (0 = free), next sequence number the consumer wants.
+_CONSUMER = struct.Struct('<QQ')
+
+# sequence number (0 = being written), pts, size, width, height, stride,
+# pixel format. A missing pts is stored as NaN.
+_SLOT = struct.Struct('<QdQIII8s')
+_SLOT_SIZE = 64
+_FORMAT_SIZE = 8
+
+_U64 = struct.Struct('<Q')
+
+#: overwrite the oldest frame when a consumer hasn't released it yet.
+DROP_OLDEST = 'drop-oldest'
+#: wait for every consumer to release a frame before overwriting it.
+BLOCK = 'block'
+
+
+def _align(n, alignment=64):
+    return (n + alignment - 1) // alignment * alignment
+
+
+def _encode_format(fmt):
+    encoded = fmt.encode()
+    if len(encoded) > _FORMAT_SIZE:
+        raise ValueError('Pixel format "{}" is longer than {} bytes.'.format(
+            fmt, _FORMAT_SIZE))
+    return encoded
+
+
+def _lock_path(name):
+    return os.path.join(tempfile.gettempdir(),
+                        'mpvring-{}.lock'.format(name.lstrip('/')))
+
+
+@contextlib.contextmanager
+def _registration_lock(name):
+    """Serializes consumer registration across processes with a lock on a
+    sidecar file, the shared memory itself has no compare-and-swap."""
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class Frame(object):
+    """A frame in a :obj:`FrameRing <mpv.framering.FrameRing>`.
+
+    Attributes:
+        seq (int): the sequence number, starting at 1.
+        pts (float): the presentation timestamp given by the producer,
+            ``None`` if it had none.
+        width (int):
+        height (int):
+        stride (int): bytes per row.
+        format (str): the pixel format, e.g. ``'bgr0'``.
+        data: a zero-copy view of the frame. A NumPy array of shape
+            ``(height, width, bytes per pixel)`` if NumPy is installed and
+            the format is known, otherwise a :obj:`memoryview`.
+
+    """
+    __slots__ = ('seq', 'pts', 'width', 'height', 'stride', 'format', 'data',
+                 '_ring', '_offset')
+
+    def __init__(self, ring, seq, pts, width, height, stride, fmt, data,
+                 offset):
+        self._ring = ring
+        self._offset = offset
+        self.seq = seq
+        self.pts = pts
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.format = fmt
+        self.data = data
+
+    def valid(self):
+        """
+        Returns:
+            bool: ``False`` if the producer has started overwriting the slot.
+            Only possible with the ``drop-oldest`` policy.
+
+        """
+        return self._ring._slot_seq(self._offset) == self.seq
+
+
+class FrameRing(object):
+    """A ring of fixed-size frame slots in :mod:`multiprocessing.shared_memory`
+    for handing frames from one producer to consumers in other processes
+    without pickling or copying.
+
+    Slot metadata and consumer positions live in a header that is updated
+    without locks: a slot's sequence number is cleared while it is written
+    and set once data and metadata are complete. Only registering a
+    consumer takes a lock, on a file next to the memory.
+
+    The producer creates the ring with :obj:`create()
+    <mpv.framering.FrameRing.create>`, consumers attach with
+    :obj:`attach() <mpv.framering.FrameRing.attach>` and read through a
+    :obj:`FrameConsumer <mpv.framering.FrameConsumer>`.
+
+    Example:
+    ::
+
+        ring = FrameRing.create(slots=8, slot_size=1920 * 1080 * 4)
+        ctx = mpv.render.SoftwareRenderContext(player, size=(1920, 1080))
+        ring.render(ctx, pts=player.time_pos)
+
+        # in a worker process
+        ring = FrameRing.attach(name)
+        with ring.consumer(partition=(worker_index, workers)) as frames:
+            for frame in frames:
+                analyse(frame.data)
+
+    Args:
+        shm (:obj:`multiprocessing.shared_memory.SharedMemory`): the memory.
+        owner (bool): whether :obj:`close()
+            <mpv.framering.FrameRing.close>` unlinks the memory.
+        policy (str): :obj:`DROP_OLDEST <mpv.framering.DROP_OLDEST>` or
+            :obj:`BLOCK <mpv.framering.BLOCK>`.
+        timeout (float): seconds a blocked write waits before the frame is
+            dropped.
+
+    Attributes:
+        name (str): the name consumers attach with.
+        slots (int): the number of slots.
+        slot_size (int): the size of each slot in bytes.
+        dropped (int): frames the producer dropped because consumers were
+            too slow (``block`` policy only).
+
+    """
+
+    def __init__(self, shm, owner=False, policy=DROP_OLDEST, timeout=1.0):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError('Unknown policy "{}".'.format(policy))
+        magic, slots, consumers, slot_size, _ = _HEADER.unpack_from(shm.buf)
+        if magic != MAGIC:
+            raise ValueError('Not a frame ring: {}'.format(shm.name))
+        self.shm = shm
+        self.name = shm.name
+        self.slots = slots
+        self.max_consumers = consumers
+        self.slot_size = slot_size
+        self.policy = policy
+        self.timeout = timeout
+        self.dropped = 0
+        self._owner = owner
+        self._consumers_offset = _HEADER_SIZE
+        self._slots_offset = self._consumers_offset + consumers * \
+            _CONSUMER.size
+        self._data_offset = _align(self._slots_offset + slots * _SLOT_SIZE)
+
+    @classmethod
+    def create(cls, slots, slot_size, consumers=16, name=None, **kwargs):
+        """Create a new ring. Keyword arguments are passed to the
+        constructor.
+
+        Args:
+            slots (int): the number of slots.
+            slot_size (int): bytes per slot, at least the largest frame.
+            consumers (int, optional): the maximum number of consumers.
+            name (str, optional): the shared memory name.
+
+        Returns:
+            :obj:`FrameRing <mpv.framering.FrameRing>`
+
+        """
+        slot_size = _align(slot_size)
+        data_offset = _align(_HEADER_SIZE + consumers * _CONSUMER.size +
+                             slots * _SLOT_SIZE)
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=data_offset + slots * slot_size)
+        shm.buf[:data_offset] = bytes(data_offset)
+        _HEADER.pack_into(shm.buf, 0, MAGIC, slots, consumers, slot_size, 0)
+        return cls(shm, owner=True, **kwargs)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to an existing ring.
+
+        Args:
+            name (str): the ring's :obj:`name <mpv.framering.FrameRing>`.
+
+        Returns:
+            :obj:`FrameRing <mpv.framering.FrameRing>`
+
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            # only the creator may unlink the memory.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return cls(shm)
+
+    def close(self):
+        """Release the memory, and unlink it if this ring created it. Frame
+        data views have to be released first."""
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+            try:
+                os.remove(_lock_path(self.name))
+            except OSError:
+                pass
+
+    @property
+    def published(self):
+        """int: the sequence number of the newest complete frame."""
+        return _U64.unpack_from(self.shm.buf, _PUBLISHED)[0]
+
+    def _slot_offset(self, seq):
+        return self._slots_offset + (seq - 1) % self.slots * _SLOT_SIZE
+
+    def _slot_seq(self, offset):
+        return _U64.unpack_from(self.shm.buf, offset)[0]
+
+    def _data(self, seq):
+        offset = self._data_offset + (seq - 1) % self.slots * self.slot_size
+        return offset, offset + self.slot_size
+
+    def _consumer_offset(self, index):
+        return self._consumers_offset + index * _CONSUMER.size
+
+    def _cursors(self):
+        for index in range(self.max_consumers):
+            token, cursor = _CONSUMER.unpack_from(
+                self.shm.buf, self._consumer_offset(index))
+            if token:
+                yield cursor
+
+    # producer
+
+    def _reserve(self):
+        seq = self.published + 1
+        if self.policy == BLOCK and seq > self.slots:
+            deadline = time.monotonic() + self.timeout
+            while any(cursor <= seq - self.slots
+                      for cursor in self._cursors()):
+                if time.monotonic() > deadline:
+                    self.dropped += 1
+                    return None
+                time.sleep(0.0005)
+        _U64.pack_into(self.shm.buf, self._slot_offset(seq), 0)
+        return seq
+
+    def _commit(self, seq, pts, size, width, height, stride, fmt):
+        offset = self._slot_offset(seq)
+        _SLOT.pack_into(self.shm.buf, offset, 0,
+                        math.nan if pts is None else pts, size, width,
+                        height, stride, fmt)
+        _U64.pack_into(self.shm.buf, offset, seq)
+        _U64.pack_into(self.shm.buf, _PUBLISHED, seq)
+        return seq
+
+    def write(self, data, pts=0.0, width=0, height=0, stride=0, fmt=''):
+        """Copy a frame into the next slot.
+
+        Args:
+            data: a bytes-like object.
+            pts (float, optional): the presentation timestamp, or ``None``
+                if there is none.
+            width (int, optional):
+            height (int, optional):
+            stride (int, optional): bytes per row.
+            fmt (str, optional): the pixel format, at most 8 bytes.
+
+        Returns:
+            int: the sequence number, or ``None`` if the frame was dropped.
+
+        Raises:
+            ValueError: if the frame is larger than a slot or the format is
+                too long.
+
+        """
+        data = memoryview(data).cast('B')
+        if data.nbytes > self.slot_size:
+            raise ValueError('Frame of {} bytes exceeds the slot size.'.format(
+                data.nbytes))
+        fmt = _encode_format(fmt)
+        seq = self._reserve()
+        if seq is None:
+            return None
+        start, _ = self._data(seq)
+        self.shm.buf[start:start + data.nbytes] = data
+        return self._commit(seq, pts, data.nbytes, width, height, stride, fmt)
+
+    def render(self, render_context, pts=0.0, size=None, fmt=None,
+               stride=None):
+        """Render the current frame of a
+        :obj:`SoftwareRenderContext <mpv.render.SoftwareRenderContext>`
+        directly into the next slot.
+
+        Returns:
+            int: the sequence number, or ``None`` if the frame was dropped.
+
+        """
+        size, fmt, stride = render_context._geometry(size, fmt, stride)
+        if stride * size[1] > self.slot_size:
+            raise ValueError('Frame of {} bytes exceeds the slot size.'.format(
+                stride * size[1]))
+        encoded = _encode_format(fmt)
+        seq = self._reserve()
+        if seq is None:
+            return None
+        start, end = self._data(seq)
+        target = self.shm.buf[start:end]
+        try:
+            render_context.render(target, size, fmt, stride)
+        finally:
+            target.release()
+        return self._commit(seq, pts, stride * size[1], size[0], size[1],
+                            stride, encoded)
+
+    def grab(self, player, pts=None):
+        """Copy the current video frame of a player into the next slot using
+        the ``screenshot-raw`` command.
+
+        Args:
+            player (:obj:`mpv.Mpv`): the player.
+            pts (float, optional): defaults to the player's ``time-pos``,
+                which is ``None`` while nothing is playing.
+
+        Returns:
+            int: the sequence number, or ``None`` if the frame was dropped.
+
+        """
+        shot = player.command_node('screenshot-raw', 'video')
+        if pts is None:
+            pts = player.time_pos
+        return self.write(shot['data'], pts, shot['w'], shot['h'],
+                          shot['stride'], shot['format'])
+
+    # consumer
+
+    def consumer(self, partition=None):
+        """Register a consumer.
+
+        Args:
+            partition (tuple, optional): ``(index, count)`` to receive only
+                frames whose sequence number modulo ``count`` is ``index``,
+                to split frames across ``count`` workers.
+
+        Returns:
+            :obj:`FrameConsumer <mpv.framering.FrameConsumer>`
+
+        """
+        return FrameConsumer(self, partition)
+
+    def _frame(self, seq):
+        offset = self._slot_offset(seq)
+        slot_seq, pts, size, width, height, stride, fmt = \
+            _SLOT.unpack_from(self.shm.buf, offset)
+        if slot_seq != seq:
+            return None
+        fmt = fmt.rstrip(b'\0').decode()
+        if math.isnan(pts):
+            pts = None
+        start, _ = self._data(seq)
+        bpp = SW_FORMATS.get(fmt)
+        if numpy is not None and bpp and height and stride:
+            data = numpy.frombuffer(self.shm.buf, numpy.uint8,
+                                    stride * height, start)
+            data = data.reshape(height, stride)[:, :width * bpp]
+            data = data.reshape(height, width, bpp)
+        else:
+            data = self.shm.buf[start:start + size]
+        return Frame(self, seq, pts, width, height, stride, fmt, data,
+                     offset)
+
+
+class FrameConsumer(object):
+    """Reads frames from a :obj:`FrameRing <mpv.framering.FrameRing>` in
+    order, starting with the next frame published after it was created.
+    Created by :obj:`FrameRing.consumer() <mpv.framering.FrameRing.consumer>`.
+    Iterating yields frames until the consumer is closed.
+
+    The slot of a returned frame is held until the next frame is requested
+    or :obj:`release() <mpv.framering.FrameConsumer.release>` is called.
+
+    Attributes:
+        skipped (int): frames that were overwritten before they were read.
+
+    Raises:
+        RuntimeError: if the ring has no free consumer entry.
+
+    """
+
+    def __init__(self, ring, partition=None):
+        self.ring = ring
+        self.partition = partition
+        self.skipped = 0
+        self._step = 1 if partition is None else partition[1]
+        self._next = self._first(ring.published + 1)
+        self._index = None
+        token = random.getrandbits(63) | 1
+        with _registration_lock(ring.name):
+            for index in range(ring.max_consumers):
+                offset = ring._consumer_offset(index)
+                if not _CONSUMER.unpack_from(ring.shm.buf, offset)[0]:
+                    _CONSUMER.pack_into(ring.shm.buf, offset, token,
+                                        self._next)
+                    self._index = index
+                    break
+        if self._index is None:
+            raise RuntimeError('Too many consumers.')
+        log.debug('Frame consumer {} registered (pid {}).'.format(
+            self._index, os.getpid()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        while self._index is not None:
+            frame = self.next()
+            if frame is not None:
+                yield frame
+
+    def _first(self, seq):
+        """The first sequence number >= seq in this consumer's partition."""
+        if self.partition is None:
+            return seq
+        index, count = self.partition
+        return seq + (index - seq) % count
+
+    def _store(self, cursor):
+        _U64.pack_into(self.ring.shm.buf,
+                       self.ring._consumer_offset(self._index) + 8, cursor)
+
+    def release(self):
+        """Release the slot of the last returned frame."""
+        self._store(self._next)
+
+    def next(self, timeout=1.0):
+        """Return the next frame, waiting for it if necessary. This releases
+        the previous frame.
+
+        Args:
+            timeout (float, optional): seconds to wait.
+
+        Returns:
+            :obj:`Frame <mpv.framering.Frame>`, or ``None`` on timeout.
+
+        """
+        ring = self.ring
+        self.release()
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self._next
+            published = ring.published
+            if published < seq:
+                if time.monotonic() > deadline:
+                    return None
+                time.sleep(0.0005)
+                continue
+            if published - seq >= ring.slots:
+                # overwritten already, skip to the oldest frame left.
+                oldest = self._first(published - ring.slots + 1)
+                self.skipped += (oldest - seq) // self._step
+                self._next = oldest
+                self.release()
+                continue
+            frame = ring._frame(seq)
+            self._next = seq + self._step
+            if frame is None:
+                self.skipped += 1
+                self.release()
+                continue
+            # the stored cursor stays at seq, which holds the slot.
+            return frame
+
+    def close(self):
+        """Unregister the consumer."""
+        if self._index is None:
+            return
+        _CONSUMER.pack_into(self.ring.shm.buf,
+                            self.ring._consumer_offset(self._index), 0, 0)
+        self._index = None
@@ -0,0 +1,237 @@
+import collections
+import functools
+import logging
+import time
+
+from .exceptions import MpvError
+from .types import EventID, EndFileReason
+
+
+log = logging.getLogger(__name__)
+
+# the events a GaplessController listens to on every player.
+_EVENTS = (EventID.START_FILE, EventID.FILE_LOADED, EventID.END_FILE,
+           EventID.PLAYBACK_RESTART, EventID.IDLE)
+
+
+class GaplessController(object):
+    """Keeps the transition from one item to the next short, and measures
+    it.
+
+    For playlists, ``prefetch-playlist`` and ``gapless-audio`` are enabled,
+    so mpv opens the next entry while the current one is still playing.
+    :obj:`enqueue() <mpv.gapless.GaplessController.enqueue>` and
+    :obj:`play_next() <mpv.gapless.GaplessController.play_next>` keep the
+    upcoming items in the playlist where prefetching can see them.
+
+    Without a playlist, :obj:`preload()
+    <mpv.gapless.GaplessController.preload>` loads the next item into a warm
+    standby player made by ``factory``, paused on its first frame. At the
+    end of the current file the standby is unpaused and the players swap
+    roles, ``on_swap`` is called to e.g. raise the standby's video widget.
+
+    Every transition is measured from the ``END_FILE`` of an item that
+    reached its end to the ``PLAYBACK_RESTART`` of the next one, or after a
+    swap to the first ``time-pos`` change of the standby, i.e. its first new
+    frame. A player that goes idle after the end ends no transition. The
+    events of all players have to be routed, which the templates do.
+
+    Example:
+    ::
+
+        gapless = mpv.gapless.GaplessController(
+            player, factory=make_player, on_swap=show_player)
+        gapless.preload('next.mkv')
+
+    Args:
+        player (:obj:`mpv.Mpv`): the active player.
+        factory (:obj:`callable`, optional): returns a new initialized
+            player for :obj:`preload()
+            <mpv.gapless.GaplessController.preload>`.
+        on_swap (:obj:`callable`, optional): called with ``(active,
+            previous)`` after a swap.
+        readahead (float, optional): ``demuxer-readahead-secs`` for the
+            players, so the next item has data buffered when it starts.
+        history (int, optional): number of transitions kept.
+
+    Attributes:
+        player (:obj:`mpv.Mpv`): the active player.
+        standby (:obj:`mpv.Mpv`): the standby player, or ``None``.
+        transitions (:obj:`collections.deque`): the last transitions as
+            ``(kind, gap)`` tuples, ``kind`` is ``'playlist'`` or
+            ``'swap'`` and ``gap`` is in seconds.
+
+    """
+
+    def __init__(self, player, factory=None, on_swap=None, readahead=None,
+                 history=100):
+        self.player = player
+        self.factory = factory
+        self.on_swap = on_swap
+        self.readahead = readahead
+        self.standby = None
+        self.preloaded = None
+        self.transitions = collections.deque(maxlen=history)
+        self._ended = None
+        self._started = False
+        self._state = None
+        self._listeners = {}
+        self._position = None
+        self._configure(player, {'prefetch-playlist': True,
+                                 'gapless-audio': 'weak'})
+        self._listen(player)
+
+    def close(self):
+        """Stop listening to the players. The standby player is left to the
+        caller."""
+        self._unwatch()
+        for player, listeners in self._listeners.items():
+            for listener in listeners:
+                player.remove_event_listener(listener)
+        self._listeners = {}
+
+    def _configure(self, player, options):
+        if self.readahead is not None:
+            options['demuxer-readahead-secs'] = self.readahead
+        for name, value in options.items():
+            try:
+                player.set_option(name, value)
+            except MpvError as e:
+                log.debug(e)
+
+    def _listen(self, player):
+        callback = functools.partial(self._on_event, player)
+        self._listeners[player] = [player.add_event_listener(event_id,
+                                                             callback)
+                                   for event_id in _EVENTS]
+
+    def enqueue(self, *paths):
+        """Append items to the playlist of the active player, playback
+        starts if it was idle."""
+        for path in paths:
+            self.player.command('loadfile', path, 'append-play')
+
+    def play_next(self, path):
+        """Insert an item right after the current playlist entry."""
+        self.player.command('loadfile', path, 'append-play')
+        position = self.player.playlist_pos
+        count = self.player.playlist_count
+        if position is not None and 0 <= position < count - 2:
+            self.player.command('playlist-move', count - 1, position + 1)
+
+    def preload(self, path):
+        """Load ``path`` into the standby player, paused, to be swapped in
+        at the end of the current file. A previous preload is replaced.
+
+        Raises:
+            ValueError: if there is no ``factory``.
+
+        """
+        if self.factory is None:
+            raise ValueError('preload() needs a factory.')
+        if self.standby is None:
+            self.standby = self.factory()
+            self._configure(self.standby, {})
+            self._listen(self.standby)
+        self.standby.pause = True
+        self.preloaded = path
+        self._state = 'loading'
+        self.standby.command('loadfile', path, 'replace')
+
+    @property
+    def ready(self):
+        """bool: whether the standby player shows the first frame of the
+        preloaded item."""
+        return self._state == 'ready'
+
+    def _on_event(self, player, event):
+        event_id = event.event_id
+        if player is self.player:
+            if event_id == EventID.END_FILE:
+                if event.data.reason == EndFileReason.EOF:
+                    self._ended = time.monotonic()
+                    self._started = False
+                    if self.ready:
+                        self._swap()
+            elif event_id == EventID.START_FILE:
+                self._started = self._ended is not None
+            elif (event_id == EventID.PLAYBACK_RESTART and
+                  self._ended is not None and self._position is None):
+                if self._started:
+                    self._record('playlist')
+                else:
+                    # a seek in a file kept open at its end.
+                    self._ended = None
+            elif event_id == EventID.IDLE and self._position is None:
+                # the end of the playlist, nothing follows.
+                self._ended = None
+        elif player is self.standby and self._state is not None:
+            if event_id == EventID.START_FILE:
+                self._state = 'started'
+            elif (event_id == EventID.FILE_LOADED and
+                  self._state == 'started'):
+                self._state = 'loaded'
+            elif (event_id == EventID.PLAYBACK_RESTART and
+                  self._state == 'loaded'):
+                self._state = 'ready'
+            elif (event_id == EventID.END_FILE and
+                  event.data.reason == EndFileReason.ERROR and
+                  self._state != 'loading'):
+                log.warning('Preloading "{}" failed.'.format(
+                    self.preloaded))
+                self._state = self.preloaded = None
+
+    def _swap(self):
+        active, previous = self.standby, self.player
+        try:
+            paused_at = active.time_pos
+        except MpvError:
+            paused_at = None
+        active.pause = False
+        self.player, self.standby = active, previous
+        self._state = self.preloaded = None
+        if self.on_swap is not None:
+            self.on_swap(active, previous)
+        # the gap lasts until the standby shows its next frame.
+        self._unwatch()
+        self._position = (active, None)
+        token = active.subscribe('time-pos', functools.partial(
+            self._on_position, paused_at))
+        self._position = (active, token)
+
+    def _on_position(self, paused_at, prop):
+        # without a token this is subscribe() delivering its cached value,
+        # which may still be from before the swap.
+        if (self._position is None or self._position[1] is None or
+                prop.data in (None, paused_at)):
+            return
+        self._record('swap')
+        self._unwatch()
+
+    def _unwatch(self):
+        position, self._position = self._position, None
+        if position is not None and position[1] is not None:
+            position[0].unsubscribe(position[1])
+
+    def _record(self, kind):
+        gap = time.monotonic() - self._ended
+        self._ended = None
+        self.transitions.append((kind, gap))
+        log.debug('{} transition took {:.1f}ms.'.format(kind, gap * 1000))
+
+    def stats(self):
+        """
+        Returns:
+            dict: ``count``, ``mean``, ``p50``, ``p95`` and ``max`` of the
+            kept transition gaps in seconds.
+
+        """
+        gaps = sorted(gap for _, gap in self.transitions)
+        stats = {'count': len(gaps)}
+        if gaps:
+            stats.update(
+                mean=sum(gaps) / len(gaps),
+                p50=gaps[len(gaps) // 2],
+                p95=gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))],
+                max=gaps[-1])
+        return stats
@@ -1,14 +1,15 @@
 import logging
 import platform
 import locale
-from ctypes import (CDLL, POINTER, RTLD_GLOBAL, addressof, cast, c_int,
-                    c_ulong, c_void_p, c_char_p, c_ulonglong, c_double,
+from ctypes import (CDLL, POINTER, RTLD_GLOBAL, addressof, byref, cast,
+                    c_int, c_ulong, c_void_p, c_char_p, c_ulonglong, c_double,
                     py_object, pointer)
 from ctypes.util import find_library
 from .types import (MpvHandle, ErrorCode, Format, MpvEvent, EventID,
                     MpvNode, WakeupCallback, NodeBuilder, SubApi,
                     MpvOpenGLCbContext, OpenGlCbUpdateFn,
-                    OpenGlCbGetProcAddrFn)
+                    OpenGlCbGetProcAddrFn, MpvRenderContext, MpvRenderParam,
+                    RenderParamType, RenderUpdateFn)
 from .exceptions import MpvError, LibraryNotLoadedError
 log = logging.getLogger(__name__)
 
@@ -164,6 +165,27 @@ class LibMPV(object):
         _handle_func_cb('mpv_opengl_cb_report_flip', [c_ulonglong], ErrorCode)
         _handle_func_cb('mpv_opengl_cb_uninit_gl', [], ErrorCode)
 
+        # the render API only exists in libmpv >= 1.26 (mpv 0.28), the
+        # software renderer it can create needs 1.107 (mpv 0.33).
+        self.has_render_api = hasattr(self.backend,
+                                      'mpv_render_context_create')
+
+        def _handle_func_render(name, args=[], res=None):
+            return _handle_func(name, args, res, [MpvRenderContext])
+
+        if self.has_render_api:
+            _handle_func('mpv_render_context_create',
+                         [POINTER(MpvRenderContext), MpvHandle,
+                          POINTER(MpvRenderParam)], ErrorCode, [])
+            _handle_func_render('mpv_render_context_set_update_callback',
+                                [RenderUpdateFn, c_void_p])
+            _handle_func_render('mpv_render_context_update', [],
+                                c_ulonglong)
+            _handle_func_render('mpv_render_context_render',
+                                [POINTER(MpvRenderParam)], ErrorCode)
+            _handle_func_render('mpv_render_context_report_swap')
+            _handle_func_render('mpv_render_context_free')
+
     def get_sub_api(self, ctx, sub_api):
         if sub_api == SubApi.MPV_SUB_API_OPENGL_CB:
             return cast(self.mpv_get_sub_api(ctx, sub_api),
@@ -185,21 +207,71 @@ class LibMPV(object):
         self.mpv_opengl_cb_init_gl(
             ctx, exts, proc_address_fn, proc_address_ctx)
 
+    def _render_params(self, params):
+        """Build a terminated ``mpv_render_param`` array from
+        (type, pointer) pairs."""
+        array = (MpvRenderParam * (len(params) + 1))()
+        for i, (param_type, data) in enumerate(params):
+            array[i].type = RenderParamType(param_type)
+            array[i].data = cast(data, c_void_p)
+        return array
+
+    def render_context_create(self, ctx, params):
+        if not self.has_render_api:
+            raise MpvError('mpv_render_context_create',
+                           ErrorCode(ErrorCode.NOT_IMPLEMENTED),
+                           'render API not available', [])
+        render_ctx = MpvRenderContext()
+        self.mpv_render_context_create(byref(render_ctx), ctx,
+                                       self._render_params(params))
+        return render_ctx
+
+    def render_context_render(self, render_ctx, params):
+        self.mpv_render_context_render(render_ctx,
+                                       self._render_params(params))
+
+    def render_context_set_update_callback(self, render_ctx, callback):
+        """Returns the ctypes callback, which has to be kept alive until it
+        is replaced or the context is freed."""
+        if callback is None:
+            update_cb = cast(None, RenderUpdateFn)
+        else:
+            update_cb = RenderUpdateFn(lambda ctx: callback())
+        self.mpv_render_context_set_update_callback(render_ctx, update_cb,
+                                                    None)
+        return update_cb
+
     def set_wakeup_callback(self, ctx, func, d):
         if self._wakeup_callback_function is not None:
             return
         self._wakeup_callback_function = func
         self._wakeup_callback_data = d
-        wakeup = WakeupCallback(_wakeup)
-        wakeup_data = cast(pointer(py_object(self)), c_void_p)
+        # keep the ctypes objects alive for as long as mpv may call them.
+        self._wakeup_callback = WakeupCallback(_wakeup)
+        self._wakeup_callback_self = pointer(py_object(self))
+        wakeup_data = cast(self._wakeup_callback_self, c_void_p)
 
-        self.mpv_set_wakeup_callback(ctx, wakeup, wakeup_data)
+        self.mpv_set_wakeup_callback(ctx, self._wakeup_callback, wakeup_data)
+
+    def get_wakeup_pipe(self, ctx):
+        fd = self.mpv_get_wakeup_pipe(ctx)
+        if fd < 0:
+            raise MpvError('mpv_get_wakeup_pipe',
+                           ErrorCode(ErrorCode.UNSUPPORTED),
+                           'wakeup pipe not available', [])
+        return fd
 
     def command(self, ctx, *args):
         """ Execute a raw command """
         args = [str(arg).encode() for arg in args if arg is not None] + [None]
         self.mpv_command(ctx, (c_char_p * len(args))(*args))
 
+    def command_async(self, ctx, reply_userdata, *args):
+        """ Execute a raw command without waiting for it """
+        args = [str(arg).encode() for arg in args if arg is not None] + [None]
+        self.mpv_command_async(ctx, reply_userdata,
+                               (c_char_p * len(args))(*args))
+
     def command_node(self, ctx, *args):
         """Send a command with an MpvNode instead of strings."""
         nb = NodeBuilder(args)
@@ -235,3 +307,12 @@ class LibMPV(object):
             raise TypeError
         val = Format(mpv_format).encode(value)
         self.mpv_set_property(ctx, prop.encode(), mpv_format, addressof(val))
+
+    def set_property_async(self, ctx, reply_userdata, prop, mpv_format,
+                           value):
+        """ Set a property without waiting, mpv copies the value """
+        if mpv_format == Format.NONE:
+            raise TypeError
+        val = Format(mpv_format).encode(value)
+        self.mpv_set_property_async(ctx, reply_userdata, prop.encode(),
+                                    mpv_format, addressof(val))
@@ -0,0 +1,236 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from .types import LogLevel
+
+
+log = logging.getLogger(__name__)
+
+
+#: verbosity rank of each mpv log level, keyed by the raw bytes mpv sends.
+LEVEL_RANKS = {
+    b'no': 0,
+    b'fatal': 10,
+    b'error': 20,
+    b'warn': 30,
+    b'info': 40,
+    b'status': 45,
+    b'v': 50,
+    b'debug': 60,
+    b'trace': 70,
+}
+
+#: the :mod:`logging` level each mpv log level is forwarded with.
+LOGGING_LEVELS = {
+    b'fatal': logging.CRITICAL,
+    b'error': logging.ERROR,
+    b'warn': logging.WARNING,
+    b'info': logging.INFO,
+    b'status': logging.INFO,
+    b'v': logging.DEBUG,
+    b'debug': logging.DEBUG,
+    b'trace': 5,
+}
+
+
+def _rank(level):
+    if not isinstance(level, bytes):
+        level = level.encode()
+    return LEVEL_RANKS[level]
+
+
+class LogPipeline(object):
+    """Filter, buffer and forward mpv log messages off the event thread.
+
+    Messages are filtered on their raw ``prefix``/``level`` bytes before
+    anything is decoded. Accepted messages are copied into a bounded ring
+    buffer, and a background thread decodes them and forwards them to
+    :mod:`logging` in batches. When the buffer is full the oldest record is
+    dropped and counted.
+
+    Example:
+    ::
+
+        pipeline = mpv.logs.LogPipeline(levels={'ffmpeg': mpv.LogLevel.TRACE})
+        player.set_log_pipeline(pipeline)
+
+    Args:
+        logger (:obj:`logging.Logger`, optional): parent logger. Each message
+            is logged to a child logger named after the message prefix.
+        level (:obj:`mpv.LogLevel`, optional): default level for prefixes
+            without an entry in ``levels``.
+        levels (:obj:`dict`, optional): per-prefix levels, e.g.
+            ``{'ffmpeg': mpv.LogLevel.TRACE, 'cplayer': mpv.LogLevel.WARN}``.
+        capacity (int, optional): maximum number of buffered records.
+        batch_size (int, optional): maximum number of records forwarded per
+            batch.
+        interval (float, optional): seconds the forwarding thread waits for
+            more records before flushing a partial batch.
+
+    Attributes:
+        received (int): messages offered to the pipeline.
+        filtered (int): messages rejected by the level filters.
+        dropped (int): records evicted because the buffer was full.
+        forwarded (int): records handed to :mod:`logging`.
+
+    """
+
+    def __init__(self, logger=None, level=LogLevel.INFO, levels=None,
+                 capacity=10000, batch_size=256, interval=0.1):
+        self.logger = logger or logging.getLogger('libmpv')
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._default_rank = _rank(level)
+        self._ranks = {}
+        for prefix, prefix_level in (levels or {}).items():
+            self.set_level(prefix, prefix_level)
+
+        self._records = deque(maxlen=capacity)
+        self._loggers = {}
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        self.received = 0
+        self.filtered = 0
+        self.dropped = 0
+        self.forwarded = 0
+
+    def set_level(self, prefix, level):
+        """Set the level for one prefix.
+
+        Args:
+            prefix (str): the module prefix, e.g. ``'ffmpeg'``.
+            level (:obj:`mpv.LogLevel`): the most verbose level accepted.
+
+        """
+        self._ranks[prefix.encode()] = _rank(level)
+
+    def request_level(self):
+        """
+        Returns:
+            str: the most verbose level any filter accepts. This is the level
+            that has to be passed to
+            :obj:`request_log_messages() <mpv.Mpv.request_log_messages>`.
+
+        """
+        rank = max([self._default_rank] + list(self._ranks.values()))
+        for level, level_rank in LEVEL_RANKS.items():
+            if level_rank == rank:
+                return level.decode()
+
+    def submit(self, message):
+        """Offer a raw log message to the pipeline. This is called from the
+        event thread and only copies the raw bytes.
+
+        Args:
+            message (:obj:`mpv.types.MpvEventLogMessage`): the raw message.
+
+        Returns:
+            bool: ``True`` if the message was buffered.
+
+        """
+        prefix = message.prefix
+        level = message.level
+        self.received += 1
+        if (LEVEL_RANKS.get(level, 0) >
+                self._ranks.get(prefix, self._default_rank)):
+            self.filtered += 1
+            return False
+        record = (time.time(), prefix, level, message.text)
+        with self._condition:
+            if len(self._records) == self.capacity:
+                self.dropped += 1
+            self._records.append(record)
+            if len(self._records) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def stats(self):
+        """
+        Returns:
+            dict: the pipeline counters and the current buffer size.
+
+        """
+        with self._lock:
+            return {'received': self.received,
+                    'filtered': self.filtered,
+                    'dropped': self.dropped,
+                    'forwarded': self.forwarded,
+                    'buffered': len(self._records)}
+
+    def start(self):
+        """Start the forwarding thread."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run,
+                                        name='MPVLogPipelineThread',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=True):
+        """Stop the forwarding thread.
+
+        Args:
+            flush (bool, optional): forward the records still buffered before
+                returning.
+
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Forward every buffered record on the calling thread."""
+        while self._forward_batch():
+            pass
+
+    def _take_batch(self):
+        with self._lock:
+            count = min(self.batch_size, len(self._records))
+            return [self._records.popleft() for _ in range(count)]
+
+    def _forward_batch(self):
+        batch = self._take_batch()
+        for created, prefix, level, text in batch:
+            logger = self._loggers.get(prefix)
+            if logger is None:
+                logger = self.logger.getChild(prefix.decode())
+                self._loggers[prefix] = logger
+            levelno = LOGGING_LEVELS.get(level, logging.DEBUG)
+            if not logger.isEnabledFor(levelno):
+                continue
+            record = logger.makeRecord(logger.name, levelno, '(libmpv)', 0,
+                                       text.decode(errors='replace')
+                                       .rstrip('\n'),
+                                       None, None)
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+            logger.handle(record)
+        with self._lock:
+            self.forwarded += len(batch)
+        return len(batch)
+
+    def _run(self):
+        log.debug('Log pipeline: starting.')
+        while True:
+            with self._condition:
+                if self._running and len(self._records) < self.batch_size:
+                    self._condition.wait(self.interval)
+                if not self._running:
+                    break
+            self._forward_batch()
+        log.debug('Log pipeline: returning.')
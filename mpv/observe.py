@@ -0,0 +1,175 @@
+import threading
+
+from .diff import ListDiffer
+from .events import Property
+from .types import EventID, Format
+
+
+def _flag_to_string(value):
+    return 'yes' if value else 'no'
+
+
+def _double_to_string(value):
+    return '{:f}'.format(value)
+
+
+#: conversions from an observed format to a requested one that can be done
+#: locally, producing what mpv would have sent.
+CONVERTERS = {
+    (Format.FLAG, Format.INT64): int,
+    (Format.FLAG, Format.STRING): _flag_to_string,
+    (Format.INT64, Format.DOUBLE): float,
+    (Format.INT64, Format.FLAG): bool,
+    (Format.INT64, Format.STRING): str,
+    (Format.DOUBLE, Format.INT64): int,
+    (Format.DOUBLE, Format.STRING): _double_to_string,
+}
+
+
+def _diffing(callback, differ):
+    def diffing_callback(prop):
+        delta = differ.update(prop.data)
+        if delta:
+            callback(Property(prop.name, delta))
+    return diffing_callback
+
+
+class _Observation(object):
+    __slots__ = ('name', 'format', 'reply_userdata', 'subscribers', 'last')
+
+    def __init__(self, name, mpv_format, reply_userdata):
+        self.name = name
+        self.format = mpv_format
+        self.reply_userdata = reply_userdata
+        self.subscribers = {}
+        self.last = None
+
+
+class ObservationManager(object):
+    """Shares mpv property observations between subscribers. There is one
+    mpv observation per (property, format); its changes are fanned out to
+    every subscriber, converted locally when a subscriber asked for a
+    format that can be derived from the observed one (see
+    :obj:`CONVERTERS <mpv.observe.CONVERTERS>`). The mpv observation is
+    removed when its last subscriber leaves.
+
+    Every :obj:`mpv.Mpv` has one as its ``observations`` attribute, used by
+    :obj:`subscribe() <mpv.Mpv.subscribe>`.
+
+    Args:
+        player (:obj:`mpv.Mpv`): the player.
+
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self._observations = {}
+        self._by_reply_userdata = {}
+        self._by_token = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        """The number of mpv-level observations."""
+        return len(self._observations)
+
+    def subscribe(self, name, callback, fmt=None, diff=False, ignore=()):
+        """Subscribe to a property. If the property is already observed and
+        has a value, ``callback`` is called with it before this returns.
+
+        Args:
+            name (str): the name of the property.
+            callback (:obj:`callable`): called with the
+                :obj:`Property <mpv.events.Property>` event data.
+            fmt (:obj:`mpv.Format`, optional): the format of the data.
+                Defaults to the property's native format.
+            diff (bool, optional): for list properties, call ``callback``
+                with a :obj:`ListDelta <mpv.diff.ListDelta>` against the
+                previous value instead of the list, and not at all if the
+                delta is empty.
+            ignore (iterable, optional): with ``diff``, item fields whose
+                changes are ignored.
+
+        Returns:
+            int: a token for :obj:`unsubscribe()
+            <mpv.observe.ObservationManager.unsubscribe>`.
+
+        Raises:
+            AttributeError: if the property isn't available.
+            mpv.MpvError
+
+        """
+        native = self.player.property_format(name)
+        if fmt is None or fmt == native:
+            observed, convert = native, None
+        elif (native, fmt) in CONVERTERS:
+            observed, convert = native, CONVERTERS[(native, fmt)]
+        else:
+            observed, convert = fmt, None
+        if diff:
+            callback = _diffing(callback, ListDiffer(name, ignore))
+
+        with self._lock:
+            token = next(self.player._reply_userdata)
+            observation = self._observations.get((name, observed))
+            if observation is None:
+                observation = _Observation(name, observed, token)
+                observation.subscribers[token] = (callback, convert)
+                self._by_reply_userdata[token] = observation
+                try:
+                    self.player.observe_property(name, observed, token)
+                except Exception:
+                    del self._by_reply_userdata[token]
+                    raise
+                self._observations[(name, observed)] = observation
+                self._by_token[token] = observation
+                return token
+            observation.subscribers[token] = (callback, convert)
+            self._by_token[token] = observation
+            last = observation.last
+        if last is not None:
+            self._deliver(last, callback, convert)
+        return token
+
+    def unsubscribe(self, token):
+        """Remove a subscriber, and the mpv observation if it was the last.
+
+        Args:
+            token (int): the token returned by :obj:`subscribe()
+                <mpv.observe.ObservationManager.subscribe>`.
+
+        """
+        with self._lock:
+            observation = self._by_token.pop(token, None)
+            if observation is None:
+                return
+            del observation.subscribers[token]
+            if observation.subscribers:
+                return
+            del self._observations[(observation.name, observation.format)]
+            del self._by_reply_userdata[observation.reply_userdata]
+        self.player.unobserve_property(observation.reply_userdata)
+
+    def route(self, event):
+        """Deliver a ``PROPERTY_CHANGE`` event to the subscribers of its
+        observation.
+
+        Args:
+            event (:obj:`Event <mpv.events.Event>`): the event.
+
+        Returns:
+            bool: ``True`` if the event belonged to an observation.
+
+        """
+        observation = self._by_reply_userdata.get(event.reply_userdata)
+        if observation is None or event.event_id != EventID.PROPERTY_CHANGE:
+            return False
+        observation.last = event.data
+        for callback, convert in list(observation.subscribers.values()):
+            self._deliver(event.data, callback, convert)
+        return True
+
+    def _deliver(self, prop, callback, convert):
+        if convert is None or prop.data is None:
+            callback(prop)
+        else:
+            callback(Property(prop.name, convert(prop.data)))
@@ -0,0 +1,276 @@
+from .properties import PROPERTIES
+from .types import Format
+
+
+#: segment matching a list index.
+INDEX = 'N'
+#: segment matching any name.
+ANY = '*'
+
+_TRACK = {
+    'id':                          Format.INT64,
+    'type':                        Format.STRING,
+    'src-id':                      Format.INT64,
+    'title':                       Format.STRING,
+    'lang':                        Format.STRING,
+    'albumart':                    Format.FLAG,
+    'default':                     Format.FLAG,
+    'forced':                      Format.FLAG,
+    'external':                    Format.FLAG,
+    'external-filename':           Format.STRING,
+    'codec':                       Format.STRING,
+    'selected':                    Format.FLAG,
+    'ff-index':                    Format.INT64,
+    'decoder-desc':                Format.STRING,
+    'demux-w':                     Format.INT64,
+    'demux-h':                     Format.INT64,
+    'demux-channel-count':         Format.INT64,
+    'demux-channels':              Format.STRING,
+    'demux-samplerate':            Format.INT64,
+    'demux-fps':                   Format.DOUBLE,
+    'demux-bitrate':               Format.INT64,
+    'demux-rotation':              Format.INT64,
+    'demux-par':                   Format.DOUBLE,
+    'audio-channels':              Format.INT64,
+    'replaygain-track-peak':       Format.DOUBLE,
+    'replaygain-track-gain':       Format.DOUBLE,
+    'replaygain-album-peak':       Format.DOUBLE,
+    'replaygain-album-gain':       Format.DOUBLE,
+}
+
+_METADATA = {
+    'count':                       Format.INT64,
+    'list': {
+        'count':                   Format.INT64,
+        INDEX: {
+            'key':                 Format.STRING,
+            'value':               Format.STRING,
+        },
+    },
+    'by-key': {
+        ANY:                       Format.STRING,
+    },
+}
+
+_VIDEO_PARAMS = {
+    'pixelformat':                 Format.STRING,
+    'hw-pixelformat':              Format.STRING,
+    'average-bpp':                 Format.INT64,
+    'w':                           Format.INT64,
+    'h':                           Format.INT64,
+    'dw':                          Format.INT64,
+    'dh':                          Format.INT64,
+    'aspect':                      Format.DOUBLE,
+    'par':                         Format.DOUBLE,
+    'colormatrix':                 Format.STRING,
+    'colorlevels':                 Format.STRING,
+    'primaries':                   Format.STRING,
+    'gamma':                       Format.STRING,
+    'sig-peak':                    Format.DOUBLE,
+    'light':                       Format.STRING,
+    'chroma-location':             Format.STRING,
+    'rotate':                      Format.INT64,
+    'stereo-in':                   Format.STRING,
+}
+
+_AUDIO_PARAMS = {
+    'samplerate':                  Format.INT64,
+    'channels':                    Format.STRING,
+    'hr-channels':                 Format.STRING,
+    'channel-count':               Format.INT64,
+    'format':                      Format.STRING,
+}
+
+#: formats of the sub-properties of properties, by path segment. Nested
+#: dicts are nodes, :obj:`INDEX <mpv.paths.INDEX>` matches list indexes and
+#: :obj:`ANY <mpv.paths.ANY>` any name.
+SUBPROPERTIES = {
+    'track-list': {
+        'count':                   Format.INT64,
+        INDEX:                     _TRACK,
+    },
+    'playlist': {
+        'count':                   Format.INT64,
+        INDEX: {
+            'filename':            Format.STRING,
+            'playing':             Format.FLAG,
+            'current':             Format.FLAG,
+            'title':               Format.STRING,
+            'id':                  Format.INT64,
+        },
+    },
+    'chapter-list': {
+        'count':                   Format.INT64,
+        INDEX: {
+            'title':               Format.STRING,
+            'time':                Format.DOUBLE,
+        },
+    },
+    'edition-list': {
+        'count':                   Format.INT64,
+        INDEX: {
+            'id':                  Format.INT64,
+            'title':               Format.STRING,
+            'default':             Format.FLAG,
+        },
+    },
+    'metadata':                    _METADATA,
+    'filtered-metadata':           _METADATA,
+    'chapter-metadata':            _METADATA,
+    'vf-metadata':                 {ANY: _METADATA},
+    'af-metadata':                 {ANY: _METADATA},
+    'video-params':                _VIDEO_PARAMS,
+    'video-out-params':            _VIDEO_PARAMS,
+    'audio-params':                _AUDIO_PARAMS,
+    'audio-out-params':            _AUDIO_PARAMS,
+}
+
+
+# properties whose children are named after options or chosen by scripts,
+# they have no table and aren't listed in PROPERTIES.
+_UNTABLED = frozenset(['options', 'file-local-options', 'option-info',
+                       'user-data', 'current-tracks'])
+
+
+def _match(table, segment):
+    if segment in table:
+        return table[segment]
+    if INDEX in table and segment.isdigit():
+        return table[INDEX]
+    if ANY in table and segment:
+        return table[ANY]
+    return None
+
+
+def path_format(path, names=None):
+    """
+    Args:
+        path (str): a sub-property path, e.g. ``track-list/3/lang``.
+        names (iterable, optional): more property names accepted as roots,
+            e.g. the :obj:`schema <mpv.Mpv.schema>` names.
+
+    Returns:
+        :obj:`mpv.Format`: the format of the leaf, ``NODE`` for paths that
+        end on a node and for properties without a table in
+        :obj:`SUBPROPERTIES <mpv.paths.SUBPROPERTIES>`. Fields missing
+        from a table, e.g. added by a newer mpv, are ``NODE`` as well.
+
+    Raises:
+        ValueError: if the path doesn't fit its property's table, e.g. a
+            list index that isn't a number, or its root is no known
+            property.
+
+    """
+    root, _, rest = path.partition('/')
+    node = SUBPROPERTIES.get(root)
+    if node is None:
+        if (root not in PROPERTIES and root not in _UNTABLED and
+                (names is None or root not in names)):
+            raise ValueError('Unknown property "{}" in path "{}".'.format(
+                root, path))
+        return Format.NODE
+    for segment in rest.split('/') if rest else ():
+        if not isinstance(node, dict):
+            node = None
+        else:
+            match = _match(node, segment)
+            if match is None and INDEX not in node and segment:
+                # a field the table doesn't know yet.
+                return Format.NODE
+            node = match
+        if node is None:
+            raise ValueError('Invalid sub-property path "{}".'.format(path))
+    return Format.NODE if isinstance(node, dict) else node
+
+
+def _item(name, index, field):
+    if isinstance(index, bool) or not isinstance(index, int) or index < 0:
+        raise ValueError('Invalid index {!r}.'.format(index))
+    path = '{}/{}'.format(name, index)
+    if field is not None:
+        path += '/' + field
+    path_format(path)
+    return path
+
+
+def track(index, field=None):
+    """
+    Returns:
+        str: the path of a ``track-list`` entry, or one of its fields.
+
+    Raises:
+        ValueError: if the index or the field is invalid.
+
+    """
+    return _item('track-list', index, field)
+
+
+def playlist_entry(index, field=None):
+    """
+    Returns:
+        str: the path of a ``playlist`` entry, or one of its fields.
+
+    Raises:
+        ValueError: if the index or the field is invalid.
+
+    """
+    return _item('playlist', index, field)
+
+
+def chapter(index, field=None):
+    """
+    Returns:
+        str: the path of a ``chapter-list`` entry, or one of its fields.
+
+    Raises:
+        ValueError: if the index or the field is invalid.
+
+    """
+    return _item('chapter-list', index, field)
+
+
+def edition(index, field=None):
+    """
+    Returns:
+        str: the path of an ``edition-list`` entry, or one of its fields.
+
+    Raises:
+        ValueError: if the index or the field is invalid.
+
+    """
+    return _item('edition-list', index, field)
+
+
+def count(name):
+    """
+    Returns:
+        str: the path of the number of entries of a list property.
+
+    Raises:
+        ValueError: if the property has no count.
+
+    """
+    path = '{}/count'.format(name)
+    if path_format(path) != Format.INT64:
+        raise ValueError('"{}" has no count.'.format(name))
+    return path
+
+
+def metadata_key(key, name='metadata'):
+    """
+    Args:
+        key (str): the metadata key, e.g. ``title``.
+        name (str, optional): the metadata property.
+
+    Returns:
+        str: the path of one metadata value.
+
+    Raises:
+        ValueError: if the key is invalid.
+
+    """
+    if not key or '/' in key:
+        raise ValueError('Invalid metadata key "{}".'.format(key))
+    path = '{}/by-key/{}'.format(name, key)
+    path_format(path)
+    return path
@@ -0,0 +1,307 @@
+import collections
+import concurrent.futures
+import os
+import re
+import tempfile
+import threading
+import time
+
+from . import paths
+from .exceptions import MpvError
+from .types import Format
+
+
+# entries with a protocol (``http://``, ``ytdl://``, ...) are kept as they
+# are, single letters are Windows drive letters.
+_PROTOCOL = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]+:')
+
+
+def _list_entry(path):
+    """
+    Returns:
+        str: ``path`` as a line of a playlist file, or ``None`` if it can't
+        be one.
+
+    """
+    if not path or '\n' in path or '\r' in path or path.startswith('#'):
+        return None
+    if _PROTOCOL.match(path):
+        return path
+    # entries of a list are relative to the list, not the working directory.
+    return os.path.abspath(path)
+
+
+def _format_options(options):
+    """Format per-file options for ``loadfile``, quoting values mpv's option
+    list parser would split."""
+    items = []
+    for key, value in options.items():
+        if isinstance(value, bool):
+            value = 'yes' if value else 'no'
+        value = str(value)
+        if ',' in value or '=' in value or '%' in value:
+            value = '%{}%{}'.format(len(value.encode()), value)
+        items.append('{}={}'.format(key, value))
+    return ','.join(items)
+
+
+def _load_list(player, entries):
+    with tempfile.NamedTemporaryFile('w', suffix='.m3u', delete=False,
+                                     encoding='utf-8') as f:
+        f.write('#EXTM3U\n')
+        for entry in entries:
+            f.write(entry + '\n')
+    try:
+        player.command('loadlist', f.name, 'append')
+    finally:
+        os.unlink(f.name)
+
+
+def _load_each(player, chunk, failures, option_string=None):
+    loaded = 0
+    for index, path in chunk:
+        try:
+            player.command('loadfile', path, 'append', option_string)
+            loaded += 1
+        except MpvError as e:
+            failures.append((index, path, e))
+    return loaded
+
+
+def _wait(player, future, timeout):
+    """Wait for the reply to an asynchronous command, reading the events
+    here if nothing else routes them."""
+    thread = player.event_thread
+    if thread is not None and thread.is_alive():
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise TimeoutError('Timed out waiting for loadfile.')
+    deadline = time.monotonic() + timeout
+    while not future.done():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('Timed out waiting for loadfile.')
+        player.route_event(player.wait_event(remaining))
+    return future.result()
+
+
+def extend(player, paths, options=None, progress=None, cancel=None,
+           chunk_size=1000, max_pending=64, timeout=10.0):
+    """Append many entries to the playlist. See :obj:`Mpv.playlist_extend()
+    <mpv.Mpv.playlist_extend>`."""
+    paths = list(paths)
+    total = len(paths)
+    failures = []
+    loaded = done = 0
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    if options is None:
+        for start in range(0, total, chunk_size):
+            if cancelled():
+                break
+            chunk = list(enumerate(paths[start:start + chunk_size], start))
+            entries = [_list_entry(path) for _, path in chunk]
+            listed = [entry for entry in entries if entry is not None]
+            try:
+                if len(listed) == len(chunk):
+                    _load_list(player, listed)
+                    loaded += len(chunk)
+                else:
+                    # keep the order when some entries can't be listed.
+                    loaded += _load_each(player, chunk, failures)
+            except MpvError:
+                loaded += _load_each(player, chunk, failures)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+        return loaded, failures
+
+    option_string = _format_options(options) or None
+    if player.event_thread is threading.current_thread():
+        # the replies would wait for this thread, send synchronously.
+        for index, path in enumerate(paths):
+            if cancelled():
+                break
+            loaded += _load_each(player, [(index, path)], failures,
+                                 option_string)
+            done += 1
+            if progress is not None:
+                progress(done, total)
+        return loaded, failures
+
+    pending = collections.deque()
+
+    def finish():
+        nonlocal loaded, done
+        index, path, future = pending.popleft()
+        try:
+            _wait(player, future, timeout)
+            loaded += 1
+        except MpvError as e:
+            failures.append((index, path, e))
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    for index, path in enumerate(paths):
+        if cancelled():
+            break
+        while len(pending) >= max_pending:
+            finish()
+        try:
+            future = player.command_async('loadfile', path, 'append',
+                                          option_string)
+        except MpvError as e:
+            failures.append((index, path, e))
+            done += 1
+            continue
+        pending.append((index, path, future))
+    while pending:
+        finish()
+    return loaded, failures
+
+
+class PlaylistView(object):
+    """A client-side mirror of the playlist that reads entries one at a time
+    through ``playlist/N/filename`` instead of decoding the whole
+    ``playlist`` property. ``playlist`` is observed without data to be told
+    about every change, including moves and shuffles. A change only marks
+    the cached entries as stale, without calls into libmpv on the event
+    thread; stale entries are read again when they are asked for, so only
+    the rows that are looked at are fetched.
+    ``playlist-count`` and ``playlist-pos`` are kept current with
+    :obj:`subscribe() <mpv.Mpv.subscribe>`, so the player's events have to
+    be routed, which the templates do.
+
+    Example:
+    ::
+
+        view = mpv.playlist.PlaylistView(player)
+        rows = view.page(3, size=50)
+        rows = view[100:150]
+
+    Args:
+        player (:obj:`mpv.Mpv`): the player.
+        callback (:obj:`callable`, optional): called without arguments when
+            the count or the current position changed.
+        max_cached (int, optional): maximum number of cached entries.
+
+    """
+
+    def __init__(self, player, callback=None, max_cached=10000):
+        self.player = player
+        self.callback = callback
+        self.max_cached = max_cached
+        self._count = None
+        self._pos = None
+        self._entries = collections.OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._subscriptions = [
+            player.subscribe('playlist-count', self._on_count),
+            player.subscribe('playlist-pos', self._on_pos),
+            player.subscribe('playlist', self._on_playlist, Format.NONE),
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop mirroring the playlist."""
+        for subscription in self._subscriptions:
+            self.player.unsubscribe(subscription)
+        self._subscriptions = []
+
+    def _on_count(self, prop):
+        self._count = prop.data
+        if self.callback is not None:
+            self.callback()
+
+    def _on_playlist(self, prop):
+        self.invalidate()
+
+    def _on_pos(self, prop):
+        self._pos = prop.data
+        if self.callback is not None:
+            self.callback()
+
+    def invalidate(self):
+        """Mark the cached entries as stale."""
+        with self._lock:
+            # entries and reads of older generations are stale.
+            self._generation += 1
+
+    def __len__(self):
+        count = self._count
+        if count is None:
+            count = self._count = self.player.playlist_count
+        return count
+
+    @property
+    def current(self):
+        """int: the index of the current entry, or ``-1``."""
+        pos = self._pos
+        if pos is None:
+            pos = self._pos = self.player.playlist_pos
+        return pos
+
+    def _entry(self, index):
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(index)
+            if entry is not None and entry[1] == generation:
+                self._entries.move_to_end(index)
+                return entry[0]
+        try:
+            filename = self.player.get_path(
+                paths.playlist_entry(index, 'filename'))
+        except MpvError:
+            raise IndexError('playlist index out of range')
+        with self._lock:
+            if generation != self._generation:
+                # the playlist changed while reading, don't cache.
+                return filename
+            self._entries[index] = (filename, generation)
+            self._entries.move_to_end(index)
+            while len(self._entries) > self.max_cached:
+                self._entries.popitem(last=False)
+        return filename
+
+    def __getitem__(self, index):
+        """
+        Args:
+            index (int or slice): entry index or slice of indexes.
+
+        Returns:
+            str or list: the filename, or a list of filenames.
+
+        Raises:
+            IndexError: if the index is out of range.
+
+        """
+        count = len(self)
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(count))]
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('playlist index out of range')
+        return self._entry(index)
+
+    def page(self, number, size=50):
+        """
+        Args:
+            number (int): the page, starting at 0.
+            size (int, optional): entries per page.
+
+        Returns:
+            list: the filenames on the page, empty past the end.
+
+        """
+        return self[number * size:(number + 1) * size]
@@ -0,0 +1,219 @@
+import collections
+import logging
+import threading
+
+from .exceptions import MpvError
+from .thumbnails import Thumbnailer
+
+
+log = logging.getLogger(__name__)
+
+
+class PreviewCache(object):
+    """Thumbnails for a seek bar. A secondary headless player follows the
+    file of ``player`` and grabs keyframe thumbnails in a background thread,
+    around the position that was asked for last. Thumbnails are kept in an
+    LRU cache keyed by the position quantized to ``quantum`` seconds and
+    bounded by the size of their pixel data.
+
+    A new :obj:`request() <mpv.preview.PreviewCache.request>` drops the
+    thumbnails that weren't grabbed yet, so moving the cursor never waits for
+    stale ones. If the file can't be loaded, no thumbnails are grabbed until
+    the main player opens another one. The main player's events have to be
+    routed, which the templates do.
+
+    Example:
+    ::
+
+        previews = mpv.preview.PreviewCache(player, size=(160, 90))
+
+        def on_hover(seconds):
+            shot = previews.request(seconds, callback=show_later)
+            if shot is not None:
+                show(shot)
+
+    Args:
+        player (:obj:`mpv.Mpv`): the player to follow.
+        size (tuple, optional): ``(width, height)`` of a thumbnail,
+            ``height`` can be ``None`` to keep the aspect ratio.
+        quantum (float, optional): positions within this many seconds share
+            a thumbnail.
+        max_bytes (int, optional): maximum size of the cached pixel data.
+        prefetch (int, optional): number of thumbnails grabbed ahead of time
+            on each side of a requested position.
+        timeout (float, optional): seconds allowed for loading the file and
+            for each seek.
+        options (dict, optional): additional mpv options for the secondary
+            player.
+
+    Attributes:
+        hits (int): requests answered from the cache.
+        misses (int): requests that had to wait for a grab.
+
+    """
+
+    def __init__(self, player, size=(160, None), quantum=1.0,
+                 max_bytes=64 << 20, prefetch=5, timeout=5.0, options=None):
+        self.player = player
+        self.quantum = quantum
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+        self.hits = self.misses = 0
+        self._thumbnailer = Thumbnailer(size, timeout, options)
+        self._shots = collections.OrderedDict()
+        self._bytes = 0
+        self._pending = collections.deque()
+        self._wanted = None
+        self._callback = None
+        self._path = None
+        self._loaded = None
+        self._failed = None
+        self._running = True
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run,
+                                        name='MPVPreviewThread', daemon=True)
+        self._thread.start()
+        self._subscription = player.subscribe('path', self._on_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop the background thread and destroy the secondary player."""
+        if self._subscription is not None:
+            self.player.unsubscribe(self._subscription)
+            self._subscription = None
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._thumbnailer.close()
+
+    def _on_path(self, prop):
+        with self._condition:
+            if prop.data == self._path:
+                return
+            self._path = prop.data
+            self._shots.clear()
+            self._bytes = 0
+            self._pending.clear()
+            self._wanted = None
+            self._condition.notify()
+
+    def key(self, seconds):
+        """
+        Returns:
+            int: the cache key of a position.
+
+        """
+        return int(round(seconds / self.quantum))
+
+    def get(self, seconds):
+        """
+        Args:
+            seconds (float): the position.
+
+        Returns:
+            dict: the cached ``screenshot-raw`` result for the position, or
+            ``None``.
+
+        """
+        key = self.key(seconds)
+        with self._condition:
+            shot = self._shots.get(key)
+            if shot is not None:
+                self._shots.move_to_end(key)
+            return shot
+
+    def request(self, seconds, callback=None):
+        """Ask for the thumbnail of a position and prefetch its
+        neighbours. Thumbnails that were still pending for earlier requests
+        are dropped.
+
+        Args:
+            seconds (float): the position.
+            callback (:obj:`callable`, optional): called with ``(seconds,
+                shot)`` from the background thread once the thumbnail is
+                grabbed, unless another request came first.
+
+        Returns:
+            dict: the cached thumbnail, or ``None`` if it is being grabbed.
+
+        """
+        key = self.key(seconds)
+        with self._condition:
+            shot = self._shots.get(key)
+            if shot is not None:
+                self._shots.move_to_end(key)
+                self.hits += 1
+                self._wanted = None
+            else:
+                self.misses += 1
+                self._wanted = key
+                self._callback = callback
+            keys = [key] if shot is None else []
+            for distance in range(1, self.prefetch + 1):
+                keys += [key + distance, key - distance]
+            self._pending = collections.deque(
+                k for k in keys if k >= 0 and k not in self._shots)
+            self._condition.notify()
+        return shot
+
+    def _store(self, key, shot):
+        size = len(shot['data'])
+        old = self._shots.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old['data'])
+        self._shots[key] = shot
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._shots) > 1:
+            _, evicted = self._shots.popitem(last=False)
+            self._bytes -= len(evicted['data'])
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not (
+                        self._pending and self._path and
+                        self._path != self._failed):
+                    self._condition.wait()
+                if not self._running:
+                    return
+                key = self._pending.popleft()
+                path = self._path
+                if key in self._shots:
+                    continue
+            if self._loaded != path or self._thumbnailer.player is None:
+                self._loaded = None
+                try:
+                    self._thumbnailer.load(path)
+                except (MpvError, TimeoutError) as e:
+                    log.debug('No previews of "{}": {}'.format(path, e))
+                    # fails every pending key, until the path changes.
+                    with self._condition:
+                        self._failed = path
+                        if path == self._path:
+                            self._pending.clear()
+                    continue
+                self._loaded = path
+            try:
+                duration = self._thumbnailer.player.duration
+                if duration is not None and key * self.quantum > duration:
+                    continue
+                shot = self._thumbnailer.capture(key * self.quantum)
+            except (MpvError, TimeoutError) as e:
+                log.debug('No preview at {}s: {}'.format(
+                    key * self.quantum, e))
+                continue
+            with self._condition:
+                if path != self._path:
+                    continue
+                self._store(key, shot)
+                callback = None
+                if key == self._wanted:
+                    callback, self._wanted = self._callback, None
+            if callback is not None:
+                callback(key * self.quantum, shot)
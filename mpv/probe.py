@@ -0,0 +1,385 @@
+import collections
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from .api import Mpv
+from .exceptions import MpvError
+from .profiles import headless_options
+from .types import EventID, EndFileReason, ErrorCode
+
+
+log = logging.getLogger(__name__)
+
+
+#: properties :obj:`probe_many() <mpv.probe.probe_many>` reads by default.
+PROBE_PROPERTIES = ('duration', 'file-format', 'track-list', 'metadata',
+                    'video-params', 'audio-params')
+
+#: options for opening files without output or decoding, the ``probe``
+#: profile of :obj:`HEADLESS_PROFILES <mpv.profiles.HEADLESS_PROFILES>`.
+PROBE_OPTIONS = headless_options('probe')
+
+# properties that are only known once the first frame is decoded.
+_DECODED_PROPERTIES = ('video-params', 'audio-params', 'video-out-params',
+                       'audio-out-params')
+
+_END = object()
+
+# the mpv-version of this process' libmpv, read once for the probe cache.
+_version = None
+_version_lock = threading.Lock()
+
+
+def load(player, path, timeout, decode=False):
+    """Load a file and wait until it is loaded. Events of a file that was
+    loaded before are skipped. A redirect, e.g. a playlist file, is
+    followed to the file it points to.
+
+    Args:
+        player (:obj:`mpv.Mpv`): an initialized player that doesn't run an
+            event loop.
+        path (str): the file or URL.
+        timeout (float): seconds to wait.
+        decode (bool, optional): also wait for the first
+            ``PLAYBACK_RESTART``, when the decoders are set up.
+
+    Raises:
+        TimeoutError: if loading takes longer than ``timeout``.
+        mpv.MpvError: if the file can't be loaded.
+
+    """
+    deadline = time.monotonic() + timeout
+    player.command('loadfile', path, 'replace')
+    # events of the previous file arrive before START_FILE.
+    started = loaded = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('Timed out loading "{}".'.format(path))
+        event = player.wait_event(remaining)
+        if event.event_id == EventID.START_FILE:
+            started = True
+        elif not started:
+            continue
+        elif event.event_id == EventID.END_FILE:
+            if event.data.reason == EndFileReason.REDIRECT:
+                # mpv starts the file the redirect points to next.
+                started = loaded = False
+                continue
+            error = event.data.error
+            if event.data.reason != EndFileReason.ERROR:
+                error = ErrorCode(ErrorCode.LOADING_FAILED)
+            raise MpvError(
+                'loadfile', error,
+                player.libmpv.mpv_error_string(error.value).decode(),
+                [path])
+        elif event.event_id == EventID.FILE_LOADED:
+            if not decode:
+                return
+            loaded = True
+        elif event.event_id == EventID.PLAYBACK_RESTART and loaded:
+            return
+
+
+class ProbeResult(object):
+    """The properties of one probed file.
+
+    Attributes:
+        index (int): the position of the file in the input.
+        path (str): the file.
+        properties (dict): property name to value, ``None`` if mpv doesn't
+            provide the property for the file. ``None`` if probing failed.
+        error (str): why probing failed, or ``None``.
+        elapsed (float): seconds it took.
+
+    """
+    __slots__ = ('index', 'path', 'properties', 'error', 'elapsed')
+
+    def __init__(self, index, path, properties, error, elapsed):
+        self.index = index
+        self.path = path
+        self.properties = properties
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        """bool: whether the file could be probed."""
+        return self.error is None
+
+    def __repr__(self):
+        return '<ProbeResult: ({}, {})>'.format(
+            self.path, 'ok' if self.ok else self.error)
+
+
+class Prober(object):
+    """Probes files one after another with a single reused headless
+    player.
+
+    Args:
+        properties (iterable, optional): the properties to read, defaults
+            to :obj:`PROBE_PROPERTIES <mpv.probe.PROBE_PROPERTIES>`.
+            Requesting ``video-params`` or ``audio-params`` enables decoding
+            of the first frames; the ``demux-*`` fields of ``track-list``
+            are known without.
+        timeout (float, optional): seconds allowed per file.
+        options (dict, optional): additional mpv options, these override
+            :obj:`PROBE_OPTIONS <mpv.probe.PROBE_OPTIONS>`.
+        cache (:obj:`ProbeCache <mpv.cache.ProbeCache>`, optional): looked
+            up before loading a file, and updated with new results.
+
+    """
+
+    def __init__(self, properties=PROBE_PROPERTIES, timeout=10.0,
+                 options=None, cache=None):
+        self.properties = tuple(properties)
+        self.timeout = timeout
+        self.decode = any(name.split('/')[0] in _DECODED_PROPERTIES
+                          for name in self.properties)
+        self.options = dict(PROBE_OPTIONS)
+        if self.decode:
+            self.options.update(vid='auto', aid='auto')
+        self.options.update(options or {})
+        self.cache = cache
+        self.player = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self):
+        player = Mpv(options=self.options)
+        try:
+            player.initialize()
+        except Exception:
+            player.terminate_destroy()
+            raise
+        self.player = player
+        if self.cache is not None:
+            self.cache.version = player.mpv_version
+
+    def close(self):
+        """Destroy the player."""
+        if self.player is not None:
+            self.player, player = None, self.player
+            player.terminate_destroy()
+
+    def probe(self, path, index=0):
+        """
+        Args:
+            path (str): the file or URL.
+            index (int, optional): stored in the result.
+
+        Returns:
+            :obj:`ProbeResult <mpv.probe.ProbeResult>`
+
+        """
+        start = time.monotonic()
+        if self.cache is not None:
+            if self.player is None:
+                self.cache.version = mpv_version()
+            properties = self.cache.get(path, self.properties)
+            if properties is not None:
+                return ProbeResult(index, path, properties, None,
+                                   time.monotonic() - start)
+        if self.player is None:
+            self._open()
+        try:
+            load(self.player, path, self.timeout - (time.monotonic() - start),
+                 self.decode)
+            properties = {}
+            for name in self.properties:
+                try:
+                    properties[name] = self.player.get_path(name)
+                except MpvError:
+                    properties[name] = None
+            error = None
+            if self.cache is not None:
+                self.cache.put(path, properties)
+        except TimeoutError as e:
+            # the player may be stuck on the file, start over with a new one.
+            log.debug('Replacing the player after "%s" timed out.', path)
+            self.close()
+            properties, error = None, str(e)
+        except MpvError as e:
+            properties, error = None, str(e)
+        return ProbeResult(index, path, properties, error,
+                           time.monotonic() - start)
+
+
+# the prober of a probe_many() worker process.
+_process_prober = None
+
+
+def _init_process(properties, timeout, options):
+    global _process_prober
+    _process_prober = Prober(properties, timeout, options)
+
+
+def _probe_in_process(item):
+    index, path = item
+    return _process_prober.probe(path, index)
+
+
+def _probe_processes(items, workers, properties, timeout, options):
+    with multiprocessing.Pool(workers, _init_process,
+                              (properties, timeout, options)) as pool:
+        for result in pool.imap_unordered(_probe_in_process, items,
+                                          chunksize=8):
+            yield result
+
+
+def _probe_threads(items, workers, properties, timeout, options):
+    jobs = queue.Queue(maxsize=workers * 4)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                jobs.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def feed():
+        for item in items:
+            if stop.is_set():
+                return
+            put(item)
+        for _ in range(workers):
+            put(_END)
+
+    def work():
+        try:
+            with Prober(properties, timeout, options) as prober:
+                while not stop.is_set():
+                    try:
+                        item = jobs.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is _END:
+                        break
+                    results.put(prober.probe(item[1], item[0]))
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(_END)
+
+    threads = [threading.Thread(target=feed, name='MPVProbeFeedThread',
+                                daemon=True)]
+    threads += [threading.Thread(target=work, name='MPVProbeThread',
+                                 daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = workers
+        while running:
+            item = results.get()
+            if item is _END:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def mpv_version():
+    """
+    Returns:
+        str: the ``mpv-version`` of the loaded libmpv. Read once per process
+        from a player without output.
+
+    Raises:
+        mpv.LibraryNotLoadedError: if libmpv can't be loaded.
+        mpv.MpvError: if the player can't be created.
+
+    """
+    global _version
+    with _version_lock:
+        if _version is None:
+            player = Mpv(options=PROBE_OPTIONS)
+            try:
+                player.initialize()
+                _version = player.mpv_version
+            finally:
+                player.terminate_destroy()
+        return _version
+
+
+def _probe_cached(items, cache, probe, workers, properties, timeout,
+                  options):
+    cache.version = mpv_version()
+    hits = collections.deque()
+
+    def misses():
+        # files are looked up as the workers ask for more, not upfront.
+        for index, path in items:
+            snapshot = cache.get(path, properties)
+            if snapshot is None:
+                yield index, path
+            else:
+                hits.append(ProbeResult(index, path, snapshot, None, 0.0))
+
+    for result in probe(misses(), workers, properties, timeout, options):
+        while hits:
+            yield hits.popleft()
+        if result.ok:
+            cache.put(result.path, result.properties)
+        yield result
+    while hits:
+        yield hits.popleft()
+
+
+def probe_many(paths, workers=None, properties=PROBE_PROPERTIES,
+               timeout=10.0, processes=False, options=None, cache=None):
+    """Probe many files in parallel. Every worker reuses one headless
+    :obj:`Prober <mpv.probe.Prober>`. Results are yielded as files finish,
+    not in input order; use :obj:`ProbeResult.index
+    <mpv.probe.ProbeResult>` to match them up. Leaving the loop stops
+    probing.
+
+    Example:
+    ::
+
+        for result in mpv.probe.probe_many(paths, workers=8):
+            if result.ok:
+                print(result.path, result.properties['duration'])
+
+    Args:
+        paths (iterable): the files or URLs.
+        workers (int, optional): number of workers, defaults to the number
+            of CPUs.
+        properties (iterable, optional): the properties to read.
+        timeout (float, optional): seconds allowed per file.
+        processes (bool, optional): run the workers in processes instead of
+            threads.
+        options (dict, optional): additional mpv options.
+        cache (:obj:`ProbeCache <mpv.cache.ProbeCache>`, optional): files
+            with a cached snapshot are not loaded, new results are cached.
+
+    Yields:
+        :obj:`ProbeResult <mpv.probe.ProbeResult>`
+
+    Raises:
+        mpv.LibraryNotLoadedError: if libmpv can't be loaded.
+        mpv.MpvError: if a player can't be created.
+
+    """
+    workers = workers or os.cpu_count() or 1
+    probe = _probe_processes if processes else _probe_threads
+    items = enumerate(paths)
+    if cache is not None:
+        return _probe_cached(items, cache, probe, workers,
+                             tuple(properties), timeout, options)
+    return probe(items, workers, tuple(properties), timeout, options)
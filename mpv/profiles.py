@@ -0,0 +1,68 @@
+# options every headless profile shares: no window, no user configuration
+# and nothing that reads or writes state outside the process.
+_COMMON = {
+    'ao': 'null',
+    'sid': 'no',
+    'idle': True,
+    'config': False,
+    'load-scripts': False,
+    'ytdl': False,
+    'resume-playback': False,
+    'osd-level': 0,
+    'input-default-bindings': False,
+}
+
+#: option sets for players without output, see :obj:`Mpv.headless()
+#: <mpv.Mpv.headless>`. ``decode-bench`` decodes video as fast as possible
+#: into ``vo=null`` and stops on the last frame, ``probe`` opens files
+#: without decoding, ``analysis`` decodes untimed into the :obj:`software
+#: renderer <mpv.render.SoftwareRenderContext>`.
+HEADLESS_PROFILES = {
+    'decode-bench': dict(_COMMON, **{
+        'vo': 'null',
+        'aid': 'no',
+        'untimed': True,
+        'framedrop': 'no',
+        'pause': True,
+        'keep-open': True,
+        'hwdec': 'no',
+        'vd-lavc-threads': 0,
+    }),
+    'probe': dict(_COMMON, **{
+        'vo': 'null',
+        'vid': 'no',
+        'aid': 'no',
+        'pause': True,
+    }),
+    'analysis': dict(_COMMON, **{
+        'vo': 'libmpv',
+        'aid': 'no',
+        'untimed': True,
+        'framedrop': 'no',
+    }),
+}
+
+
+def headless_options(profile, options=None, **overrides):
+    """
+    Args:
+        profile (str): a key of :obj:`HEADLESS_PROFILES
+            <mpv.profiles.HEADLESS_PROFILES>`.
+        options (dict, optional): options that override the profile.
+        **overrides: more options, use underscores in place of hyphens.
+
+    Returns:
+        dict: the options of the profile with the overrides applied.
+
+    Raises:
+        ValueError: if the profile doesn't exist.
+
+    """
+    try:
+        merged = dict(HEADLESS_PROFILES[profile])
+    except KeyError:
+        raise ValueError('Unknown profile "{}", expected one of {}.'.format(
+            profile, ', '.join(sorted(HEADLESS_PROFILES))))
+    merged.update(options or {})
+    merged.update((k.replace('_', '-'), v) for k, v in overrides.items())
+    return merged
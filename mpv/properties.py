@@ -1,6 +1,15 @@
+import hashlib
+import json
+import logging
+import os
+
+from .exceptions import MpvError
 from .types import Format
 
 
+log = logging.getLogger(__name__)
+
+
 PROPERTIES = {
     'ab-loop-a':                   (Format.STRING, 'rw'),
     'ab-loop-b':                   (Format.STRING, 'rw'),
@@ -193,4 +202,182 @@ PROPERTIES = {
     'working-directory':           (Format.STRING, 'r'),
 }
 """dict: properties.
-"""
\ No newline at end of file
+"""
+
+#: the :obj:`mpv.Format` each ``option-info/<name>/type`` maps to.
+OPTION_TYPES = {
+    'Flag': Format.FLAG,
+    'Integer': Format.INT64,
+    'Int64': Format.INT64,
+    'ByteSize': Format.INT64,
+    'Double': Format.DOUBLE,
+    'Float': Format.DOUBLE,
+    'Time': Format.DOUBLE,
+    'Aspect': Format.DOUBLE,
+    'String': Format.STRING,
+    'Choice': Format.STRING,
+    'Color': Format.STRING,
+}
+
+_VALUE_TYPES = {
+    bool: Format.FLAG,
+    int: Format.INT64,
+    float: Format.DOUBLE,
+    str: Format.STRING,
+}
+
+
+def cache_dir():
+    """
+    Returns:
+        str: the directory python-mpv caches discovered schemas and probe
+        results in.
+
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'python-mpv')
+
+
+class PropertySchema(object):
+    """The properties a running libmpv provides and their native formats,
+    discovered from ``property-list`` and ``option-info/<name>/type``. For
+    properties that are not options the format is taken from
+    :obj:`PROPERTIES <mpv.PROPERTIES>` or inferred from the current value.
+    Properties without a value, e.g. on an idle player, stay unknown.
+
+    Schemas are cached on disk per ``mpv-version``, so discovery runs once
+    per libmpv build. Unknown properties are probed again on every load
+    until their format is found.
+
+    Attributes:
+        version (str): the ``mpv-version`` the schema belongs to.
+        formats (dict): property name to :obj:`mpv.Format` value.
+        unknown (frozenset): property names whose format couldn't be
+            inferred.
+        names (frozenset): the available property names.
+
+    """
+
+    def __init__(self, version, formats, unknown=()):
+        self.version = version
+        self.formats = formats
+        self.unknown = frozenset(unknown)
+        self.names = frozenset(formats).union(self.unknown)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @classmethod
+    def load(cls, player, path=None):
+        """Load the schema for the player's libmpv from the disk cache, or
+        discover and cache it.
+
+        Args:
+            player (:obj:`mpv.Mpv`): an initialized player.
+            path (str, optional): the cache directory. Defaults to
+                :obj:`cache_dir() <mpv.properties.cache_dir>`.
+
+        Returns:
+            :obj:`PropertySchema <mpv.properties.PropertySchema>`
+
+        Raises:
+            mpv.MpvError: if the player can't be queried, e.g. before it is
+                initialized.
+
+        """
+        version = player.libmpv._get_property(player.handle, 'mpv-version',
+                                              Format.STRING)
+        path = path or cache_dir()
+        filename = os.path.join(path, 'schema-{}.json'.format(
+            hashlib.sha1(version.encode()).hexdigest()))
+        schema = None
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+            if data['mpv-version'] == version:
+                schema = cls(version, data['properties'],
+                             data.get('unknown', ()))
+        except (OSError, ValueError, KeyError) as e:
+            log.debug('No cached property schema: {}'.format(e))
+
+        if schema is None:
+            schema = cls.discover(player, version)
+        elif schema.unknown:
+            formats = dict(schema.formats)
+            unknown = cls._infer(player, schema.unknown, formats)
+            if unknown == schema.unknown:
+                return schema
+            schema = cls(version, formats, unknown)
+        else:
+            return schema
+        try:
+            os.makedirs(path, exist_ok=True)
+            tmp = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump({'mpv-version': version,
+                           'properties': schema.formats,
+                           'unknown': sorted(schema.unknown)}, f)
+            os.replace(tmp, filename)
+        except OSError as e:
+            log.debug('Could not cache property schema: {}'.format(e))
+        return schema
+
+    @staticmethod
+    def _infer(player, names, formats):
+        """Infer formats from the current values into ``formats``.
+
+        Returns:
+            frozenset: the names without a value.
+
+        """
+        unknown = set()
+        for name in names:
+            try:
+                value = player.libmpv._get_property(player.handle, name,
+                                                    Format.NODE)
+            except MpvError:
+                value = None
+            if value is None:
+                unknown.add(name)
+            else:
+                formats[name] = _VALUE_TYPES.get(type(value), Format.NODE)
+        return frozenset(unknown)
+
+    @classmethod
+    def discover(cls, player, version=None):
+        """Query the player for its properties and their formats.
+
+        Args:
+            player (:obj:`mpv.Mpv`): an initialized player.
+            version (str, optional): the ``mpv-version``, if already known.
+
+        Returns:
+            :obj:`PropertySchema <mpv.properties.PropertySchema>`
+
+        """
+        def get(name, mpv_format):
+            return player.libmpv._get_property(player.handle, name,
+                                               mpv_format)
+
+        if version is None:
+            version = get('mpv-version', Format.STRING)
+        formats = {}
+        values = []
+        for name in get('property-list', Format.NODE):
+            try:
+                option_type = get('option-info/{}/type'.format(name),
+                                  Format.STRING)
+            except MpvError:
+                option_type = None
+            mpv_format = OPTION_TYPES.get(option_type)
+            if mpv_format is None and name in PROPERTIES:
+                mpv_format = PROPERTIES[name][0]
+            if mpv_format is None:
+                values.append(name)
+            else:
+                formats[name] = mpv_format
+        unknown = cls._infer(player, values, formats)
+        log.debug('Discovered {} properties of mpv {}, {} unknown.'.format(
+            len(formats), version, len(unknown)))
+        return cls(version, formats, unknown)
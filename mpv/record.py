@@ -0,0 +1,257 @@
+import gzip
+import json
+import threading
+import time
+
+from .events import Event, Property, LogMessage, ClientMessage, EndFile
+from .types import EventID, ErrorCode, EndFileReason
+
+
+#: the first line of a recording, with the version of the format.
+MAGIC = b'MPVEVT 2\n'
+
+
+def _encode_data(data):
+    if data is None:
+        return None
+    if isinstance(data, Property):
+        return ('p', data.name, data.data)
+    if isinstance(data, LogMessage):
+        return ('l', data.prefix, data.level, data.text)
+    if isinstance(data, EndFile):
+        return ('e', data.reason.value, data.error.value)
+    if isinstance(data, ClientMessage):
+        return ('c', list(data.args))
+    raise TypeError('Unknown event data {!r}.'.format(data))
+
+
+def _decode_data(data):
+    if data is None:
+        return None
+    tag = data[0]
+    if tag == 'p':
+        return Property(data[1], data[2])
+    if tag == 'l':
+        return LogMessage(data[1], data[2], data[3])
+    if tag == 'e':
+        return EndFile(EndFileReason(data[1]), ErrorCode(data[2]))
+    if tag == 'c':
+        return ClientMessage(data[1])
+    raise ValueError('Unknown event data tag "{}".'.format(tag))
+
+
+def encode_event(timestamp, event):
+    """
+    Args:
+        timestamp (float): seconds since the recording started.
+        event (:obj:`Event <mpv.events.Event>`): the event.
+
+    Returns:
+        bytes: the record, a line of JSON.
+
+    Raises:
+        TypeError: if the event data can't be stored as JSON.
+
+    """
+    return json.dumps([timestamp, event.event_id.value, event.error.value,
+                       event.reply_userdata or 0,
+                       _encode_data(event.data)]).encode() + b'\n'
+
+
+def decode_event(line):
+    """
+    Args:
+        line (bytes): a record.
+
+    Returns:
+        tuple: ``(timestamp, event)``.
+
+    Raises:
+        ValueError: if the record is malformed.
+
+    """
+    try:
+        timestamp, event_id, error, reply_userdata, data = json.loads(
+            line.decode())
+    except (TypeError, ValueError) as e:
+        raise ValueError('Malformed event record: {}'.format(e))
+    return timestamp, Event(EventID(event_id), ErrorCode(error),
+                            reply_userdata, _decode_data(data))
+
+
+class EventRecorder(object):
+    """Records the events returned by a player's :obj:`wait_event()
+    <mpv.Mpv.wait_event>` to a file, with the time they arrived. ``NONE``
+    events are not recorded. While recording, the recorder is the player's
+    :obj:`event_source <mpv.Mpv>`, so the templates' event loops read
+    through it; without a template call :obj:`wait_event()
+    <mpv.record.EventRecorder.wait_event>` in place of the player's.
+
+    The file holds one JSON line per event after a versioned header line,
+    gzip compressed if ``compress`` is ``True``, so it can be read by any
+    Python version. Read it with :obj:`EventReplayer
+    <mpv.record.EventReplayer>`.
+
+    Example:
+    ::
+
+        with mpv.record.EventRecorder(player, 'session.mpvevt'):
+            player.play('video.mkv')
+            ...
+
+    Args:
+        player (:obj:`mpv.Mpv`): the player, e.g. a template.
+        path (str): the file to write.
+        compress (bool, optional): gzip the file.
+
+    Attributes:
+        count (int): the number of recorded events.
+        skipped (int): events whose data couldn't be stored.
+
+    """
+
+    def __init__(self, player, path, compress=False):
+        self.player = player
+        self.path = path
+        self.compress = compress
+        self.count = self.skipped = 0
+        self._file = None
+        self._start = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Open the file and start recording."""
+        if self._file is not None:
+            return
+        opener = gzip.open if self.compress else open
+        self._file = opener(self.path, 'wb')
+        self._file.write(MAGIC)
+        self._start = time.monotonic()
+        self.player.event_source = self
+
+    def wait_event(self, timeout=-1):
+        """Wait for the player's next event and record it.
+
+        Returns:
+            :obj:`Event <mpv.events.Event>`: the event.
+
+        """
+        event = self.player.wait_event(timeout)
+        if event.event_id != EventID.NONE:
+            self.record(event)
+        return event
+
+    def record(self, event):
+        """Write an event. Called for every event while recording, but can
+        also be called directly.
+
+        Args:
+            event (:obj:`Event <mpv.events.Event>`): the event.
+
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                record = encode_event(time.monotonic() - self._start, event)
+            except (TypeError, ValueError):
+                self.skipped += 1
+                return
+            self._file.write(record)
+            self.count += 1
+
+    def stop(self):
+        """Stop recording and close the file."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file, f = None, self._file
+        if self.player.event_source is self:
+            self.player.event_source = None
+        f.close()
+
+
+class EventReplayer(object):
+    """Reads a recording made by :obj:`EventRecorder
+    <mpv.record.EventRecorder>` and feeds it into a template. libmpv is not
+    needed, so handler code can be benchmarked against recorded traffic on
+    any machine.
+
+    Example:
+    ::
+
+        class Handler(mpv.templates.AbstractTemplate):
+            def on_property_change(self, event):
+                ...
+
+        count, elapsed = mpv.record.EventReplayer('session.mpvevt').replay(
+            Handler(), speed=None)
+
+    Args:
+        path (str): the recording.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            compressed = f.read(2) == b'\x1f\x8b'
+        f = gzip.open(self.path, 'rb') if compressed else \
+            open(self.path, 'rb')
+        if f.readline() != MAGIC:
+            f.close()
+            raise ValueError('"{}" is not an event recording.'.format(
+                self.path))
+        return f
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: ``(timestamp, event)`` in recorded order.
+
+        """
+        with self._open() as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # the recording was cut off while writing.
+                    return
+                yield decode_event(line)
+
+    def replay(self, target, speed=1.0):
+        """Feed the recorded events into ``target`` the way the templates'
+        event loops do.
+
+        Args:
+            target (:obj:`AbstractTemplate
+                <mpv.templates.AbstractTemplate>`): the template.
+            speed (float, optional): playback speed of the recording, ``2``
+                replays twice as fast. ``None`` or ``0`` replays as fast as
+                possible.
+
+        Returns:
+            tuple: ``(count, elapsed)``, the number of events and the
+            seconds the replay took.
+
+        """
+        flush = getattr(target, '_flush_properties', None)
+        count = 0
+        start = time.monotonic()
+        for timestamp, event in self:
+            if speed:
+                delay = timestamp / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            target._handle_event(event)
+            if flush is not None:
+                flush()
+            count += 1
+        return count, time.monotonic() - start
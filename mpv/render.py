@@ -0,0 +1,188 @@
+import logging
+from ctypes import c_char, c_char_p, c_int, c_size_t, pointer
+
+from .exceptions import MpvError
+from .types import ErrorCode, RenderParamType
+
+
+log = logging.getLogger(__name__)
+
+
+#: ``mpv_render_context_update()`` flag: a new frame should be rendered.
+RENDER_UPDATE_FRAME = 1
+
+#: the first client API version with the software renderer (mpv 0.33).
+SW_API_VERSION = (1, 107)
+
+#: bytes per pixel of the formats the software renderer supports.
+SW_FORMATS = {
+    'rgb0': 4,
+    'bgr0': 4,
+    '0bgr': 4,
+    '0rgb': 4,
+    'rgb24': 3,
+}
+
+
+def _writable_buffer(buffer, nbytes):
+    """Wrap a writable, C-contiguous buffer (:obj:`bytearray`, :obj:`mmap`,
+    NumPy array, ...) in a ctypes array without copying it."""
+    view = memoryview(buffer)
+    if view.readonly:
+        raise TypeError('The buffer must be writable.')
+    if not view.c_contiguous:
+        raise ValueError('The buffer must be C-contiguous.')
+    if view.nbytes < nbytes:
+        raise ValueError('The buffer holds {} bytes, {} are needed.'.format(
+            view.nbytes, nbytes))
+    return (c_char * view.nbytes).from_buffer(view.cast('B'))
+
+
+class SoftwareRenderContext(object):
+    """A render context using mpv's software renderer
+    (``MPV_RENDER_API_TYPE_SW``). Frames are rendered by the CPU straight
+    into a buffer owned by the caller, so neither a GL context nor a window
+    is needed.
+
+    The player has to be created with ``vo='libmpv'`` and libmpv has to
+    provide the software renderer (client API 1.107 or newer, mpv 0.33).
+
+    Example:
+    ::
+
+        player = mpv.Mpv(vo='libmpv')
+        player.initialize()
+        ctx = mpv.render.SoftwareRenderContext(player, size=(640, 360))
+        frame = bytearray(ctx.buffer_size())
+        player.play('video.mkv')
+        ...
+        if ctx.update() & mpv.render.RENDER_UPDATE_FRAME:
+            ctx.render(frame)
+
+    Args:
+        player (:obj:`mpv.Mpv`): an initialized player.
+        size (tuple, optional): default ``(width, height)`` to render at.
+        fmt (str, optional): default pixel format, one of
+            :obj:`SW_FORMATS <mpv.render.SW_FORMATS>`.
+        stride (int, optional): default bytes per row. Defaults to the
+            packed row size.
+
+    Raises:
+        mpv.MpvError: if the render context can't be created, e.g. because
+            libmpv is older than :obj:`SW_API_VERSION
+            <mpv.render.SW_API_VERSION>`.
+
+    """
+
+    def __init__(self, player, size=None, fmt='rgb0', stride=None):
+        self.player = player
+        self.size = size
+        self.format = fmt
+        self.stride = stride
+        self._update_callback = None
+        version = player.libmpv.client_api_version()
+        if version < SW_API_VERSION:
+            raise MpvError('mpv_render_context_create',
+                           ErrorCode(ErrorCode.NOT_IMPLEMENTED),
+                           'software rendering needs client API {}.{}, '
+                           'libmpv provides {}.{}'.format(
+                               *(SW_API_VERSION + version)), [])
+        self.handle = player.libmpv.render_context_create(
+            player.handle, [(RenderParamType.API_TYPE, c_char_p(b'sw'))])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.free()
+
+    def _geometry(self, size, fmt, stride):
+        size = size or self.size
+        fmt = fmt or self.format
+        if size is None:
+            raise ValueError('No render size given.')
+        if fmt not in SW_FORMATS:
+            raise ValueError('Unsupported format "{}".'.format(fmt))
+        stride = stride or self.stride or size[0] * SW_FORMATS[fmt]
+        if stride < size[0] * SW_FORMATS[fmt]:
+            raise ValueError('Stride {} is too small for width {}.'.format(
+                stride, size[0]))
+        return size, fmt, stride
+
+    def buffer_size(self, size=None, fmt=None, stride=None):
+        """
+        Returns:
+            int: the number of bytes a frame with the given geometry needs.
+            Arguments default to the ones given to the context.
+
+        """
+        size, fmt, stride = self._geometry(size, fmt, stride)
+        return stride * size[1]
+
+    def set_update_callback(self, callback):
+        """Set a function that is called whenever a new frame should be
+        rendered. It is called from an mpv thread and must not call into mpv;
+        signal another thread that calls :obj:`update()
+        <mpv.render.SoftwareRenderContext.update>` and :obj:`render()
+        <mpv.render.SoftwareRenderContext.render>` instead.
+
+        Args:
+            callback (:obj:`callable`): called without arguments, or
+                ``None`` to remove it.
+
+        """
+        self._update_callback = \
+            self.player.libmpv.render_context_set_update_callback(
+                self.handle, callback)
+
+    def update(self):
+        """
+        Returns:
+            int: update flags, test against :obj:`RENDER_UPDATE_FRAME
+            <mpv.render.RENDER_UPDATE_FRAME>`.
+
+        """
+        return self.player.libmpv.mpv_render_context_update(self.handle)
+
+    def render(self, buffer, size=None, fmt=None, stride=None):
+        """Render the current frame into ``buffer``. Arguments default to the
+        ones given to the context.
+
+        Args:
+            buffer: a writable, C-contiguous buffer of at least
+                :obj:`buffer_size()
+                <mpv.render.SoftwareRenderContext.buffer_size>` bytes, e.g. a
+                :obj:`bytearray`, an :obj:`mmap.mmap` or a NumPy array.
+            size (tuple, optional): ``(width, height)`` to render at. mpv
+                scales the video to fit.
+            fmt (str, optional): the pixel format.
+            stride (int, optional): bytes per row in ``buffer``.
+
+        Raises:
+            TypeError: if the buffer is read-only.
+            ValueError: if the buffer or the geometry is invalid.
+            mpv.MpvError
+
+        """
+        size, fmt, stride = self._geometry(size, fmt, stride)
+        target = _writable_buffer(buffer, stride * size[1])
+        self.player.libmpv.render_context_render(self.handle, [
+            (RenderParamType.SW_SIZE, (c_int * 2)(*size)),
+            (RenderParamType.SW_FORMAT, c_char_p(fmt.encode())),
+            (RenderParamType.SW_STRIDE, pointer(c_size_t(stride))),
+            (RenderParamType.SW_POINTER, target),
+        ])
+
+    def report_swap(self):
+        """Tell mpv a rendered frame was displayed. Optional, improves
+        frame timing."""
+        self.player.libmpv.mpv_render_context_report_swap(self.handle)
+
+    def free(self):
+        """Destroy the render context. This has to happen before the player
+        is destroyed."""
+        if self.handle is None:
+            return
+        self.handle, handle = None, self.handle
+        self.player.libmpv.mpv_render_context_free(handle)
+        self._update_callback = None
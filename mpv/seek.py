@@ -0,0 +1,149 @@
+import collections
+import threading
+import time
+
+from .types import EventID
+
+
+class SeekScheduler(object):
+    """Keeps at most one seek in flight. Seeks are sent with
+    :obj:`command_async() <mpv.Mpv.command_async>` and complete at the next
+    ``PLAYBACK_RESTART``. A seek requested meanwhile waits, and replaces any
+    other waiting seek, so a player fed by a dragged slider is never more
+    than one seek behind the cursor.
+
+    Use keyframe seeks while dragging and an exact seek on release:
+    ::
+
+        slider.sliderMoved.connect(
+            lambda ms: scheduler.seek(ms / 1000.0))
+        slider.sliderReleased.connect(
+            lambda: scheduler.seek(slider.value() / 1000.0, exact=True))
+
+    Only a ``PLAYBACK_RESTART`` after the reply to a seek sent here
+    completes it, restarts of loadfile or of other seeks are ignored. A seek
+    that never restarts, e.g. because the file ended, is given up after
+    ``timeout``, and the waiting seek is sent then.
+
+    Args:
+        player (:obj:`mpv.Mpv`): the player, its events have to be routed,
+            which the templates do.
+        timeout (float, optional): seconds after which a seek without a
+            ``PLAYBACK_RESTART`` is considered lost.
+        history (int, optional): number of latencies kept for
+            :obj:`stats() <mpv.seek.SeekScheduler.stats>`.
+
+    Attributes:
+        latencies (:obj:`collections.deque`): seconds from sending a seek to
+            its ``PLAYBACK_RESTART``, most recent last.
+        superseded (int): requests replaced before they were sent.
+
+    """
+
+    def __init__(self, player, timeout=2.0, history=100):
+        self.player = player
+        self.timeout = timeout
+        self.latencies = collections.deque(maxlen=history)
+        self.superseded = 0
+        self._inflight = None
+        self._acked = None
+        self._pending = None
+        self._timer = None
+        # a seek can be answered while it is being sent.
+        self._lock = threading.RLock()
+        self._listener = player.add_event_listener(
+            EventID.PLAYBACK_RESTART, self._on_restart)
+
+    def close(self):
+        """Stop listening to the player. Waiting seeks are dropped."""
+        self.player.remove_event_listener(self._listener)
+        with self._lock:
+            self._pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def seek(self, seconds, exact=False):
+        """Seek to an absolute position.
+
+        Args:
+            seconds (float): the position.
+            exact (bool, optional): seek to the exact position instead of
+                the nearest keyframe.
+
+        """
+        method = 'absolute+exact' if exact else 'absolute+keyframes'
+        with self._lock:
+            if (self._inflight is not None and
+                    time.monotonic() - self._inflight < self.timeout):
+                if self._pending is not None:
+                    self.superseded += 1
+                self._pending = (seconds, method)
+                return
+            self._pending = None
+            self._send(seconds, method)
+
+    def _send(self, seconds, method):
+        self._inflight = sent = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.timeout, self._expire, (sent,))
+        self._timer.daemon = True
+        self._timer.start()
+        future = self.player.command_async('seek', seconds, method)
+        future.add_done_callback(lambda f: self._on_reply(f, sent))
+
+    def _on_reply(self, future, sent):
+        with self._lock:
+            if self._inflight != sent:
+                return
+            if future.exception() is None:
+                # the restart of this seek comes after its reply.
+                self._acked = sent
+            else:
+                # no PLAYBACK_RESTART follows a failed seek.
+                self._next()
+
+    def _expire(self, sent):
+        with self._lock:
+            if self._inflight == sent:
+                self._next()
+
+    def _on_restart(self, event):
+        with self._lock:
+            if self._inflight is None or self._acked != self._inflight:
+                return
+            self.latencies.append(time.monotonic() - self._inflight)
+            self._next()
+
+    def _next(self):
+        self._inflight = self._acked = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._send(*pending)
+
+    @property
+    def busy(self):
+        """bool: whether a seek is in flight."""
+        return self._inflight is not None
+
+    def stats(self):
+        """
+        Returns:
+            dict: ``count``, ``mean``, ``p50``, ``p95`` and ``max`` of the
+            kept latencies in seconds, and the ``superseded`` count.
+
+        """
+        latencies = sorted(self.latencies)
+        stats = {'count': len(latencies), 'superseded': self.superseded}
+        if latencies:
+            stats.update(
+                mean=sum(latencies) / len(latencies),
+                p50=latencies[len(latencies) // 2],
+                p95=latencies[min(len(latencies) - 1,
+                                  int(len(latencies) * 0.95))],
+                max=latencies[-1])
+        return stats
@@ -3,6 +3,6 @@ from .template import MpvTemplate
 from .base import AbstractTemplate
 
 try:
-    from .templateqt import MpvTemplatePyQt
+    from .templateqt import MpvTemplatePyQt, MpvTemplatePyQtNotifier
 except (ImportError, NameError) as e:
     pass
@@ -1,3 +1,7 @@
+from ..dispatch import PropertyDispatcher
+from ..types import EventID
+
+
 class AbstractTemplate(object):
     _handlers = ['on_none', 'on_shutdown', 'on_log_message',
                  'on_get_property_reply', 'on_set_property_reply',
@@ -9,7 +13,55 @@ class AbstractTemplate(object):
                  'on_metadata_update', 'on_seek', 'on_playback_restart',
                  'on_property_change', 'on_chapter_change', 'on_queue_overflow']
 
+    _property_dispatcher = None
+    log_handler = None
+
+    def _observe(self, observe):
+        """Observe the properties given to a template's ``observe``
+        argument: either a list of names, or a dict of names to a
+        :obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>`, its keyword
+        arguments or ``None``.
+
+        """
+        if observe is None:
+            return
+        if isinstance(observe, dict):
+            items = observe.items()
+        else:
+            items = ((name, None) for name in observe)
+        for name, policy in items:
+            self.observe_property(name)
+            if policy is None:
+                continue
+            if self._property_dispatcher is None:
+                self._property_dispatcher = PropertyDispatcher()
+            self._property_dispatcher.set_policy(name, policy)
+
+    def _flush_properties(self):
+        """Dispatch held back property changes that are due.
+
+        Returns:
+            float: seconds until the next one is due, or ``-1``.
+
+        """
+        if self._property_dispatcher is None:
+            return -1
+        for event in self._property_dispatcher.flush():
+            self._dispatch_event(event)
+        return self._property_dispatcher.timeout()
+
     def _handle_event(self, event):
+        route_event = getattr(self, 'route_event', None)
+        if route_event is not None and route_event(event):
+            return
+        if (self._property_dispatcher is not None and
+                event.event_id == EventID.PROPERTY_CHANGE):
+            event = self._property_dispatcher.filter(event)
+            if event is None:
+                return
+        self._dispatch_event(event)
+
+    def _dispatch_event(self, event):
         handler = getattr(
             self, self._handlers[event.event_id.value], None)
         if not handler:
@@ -18,11 +18,21 @@ class MpvTemplate(AbstractTemplate, mpv.Mpv):
     Args:
         options (:obj:`dict`, optional): dictionary of options to set with
             mpv_set_option().
-        observe (:obj:`list` of :obj:`str`): a list of properties to be
-            observed.
+        observe (:obj:`list` of :obj:`str` or :obj:`dict`): a list of
+            properties to be observed, or a dict mapping each property to a
+            :obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>` (or its
+            keyword arguments, or ``None``) that limits how often
+            :obj:`on_property_change()
+            <mpv.templates.AbstractTemplate.on_property_change>` is called
+            for it, e.g. ``{'time-pos': {'rate': 10, 'delta': 0.05}}``.
         log_level (:obj:`mpv.LogLevel`): the log level for mpv to use.
         log_handler (:obj:`callable`): a function that will be called with
             the log message as its only argument.
+        log_pipeline (:obj:`mpv.logs.LogPipeline`, optional): forward log
+            messages through this pipeline instead of
+            :obj:`on_log_message()
+            <mpv.templates.AbstractTemplate.on_log_message>`. ``log_level``
+            and ``log_handler`` are ignored when it is given.
         **kwargs (optional): options to set with mpv_set_option().
 
     Raises:
@@ -32,14 +42,14 @@ class MpvTemplate(AbstractTemplate, mpv.Mpv):
     """
 
     def __init__(self, options=None, observe=None, log_level=mpv.LogLevel.INFO,
-                 log_handler=None, **kwargs):
+                 log_handler=None, log_pipeline=None, **kwargs):
         super().__init__(options=options, **kwargs)
 
-        if observe is not None:
-            for prop in observe:
-                self.observe_property(prop)
+        self._observe(observe)
 
-        if log_handler is not None:
+        if log_pipeline is not None:
+            self.set_log_pipeline(log_pipeline)
+        elif log_handler is not None:
             self.request_log_messages(log_level)
             self.log_handler = log_handler
 
@@ -50,6 +60,7 @@ class MpvTemplate(AbstractTemplate, mpv.Mpv):
         self._event_condition = threading.Condition(self._lock)
         self._event_loop = threading.Thread(target=self._event_loop,
                                             name='MPVEventHandlerThread')
+        self.event_thread = self._event_loop
         self._event_loop.start()
 
     def __enter__(self):
@@ -66,7 +77,10 @@ class MpvTemplate(AbstractTemplate, mpv.Mpv):
     def _event_loop(self):
         log.debug('Event loop: starting.')
         while self.handle:
-            event = self.wait_event(-1)
+            timeout = self._flush_properties()
+            event = (self.event_source or self).wait_event(timeout)
+            if timeout >= 0 and event.event_id == mpv.EventID.NONE:
+                continue  # held back property changes are due.
             if event.event_id in [mpv.EventID.NONE, mpv.EventID.SHUTDOWN]:
                 log.debug('Event loop: {}'.format(event.event_id.name))
                 self.detach_destroy()
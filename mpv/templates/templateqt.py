@@ -1,29 +1,58 @@
 import logging
+import math
+import os
+import threading
+import time
 
 import mpv
+import mpv.dispatch
+import mpv.seek
 from .base import AbstractTemplate
 
-from PyQt5.QtCore import QThread, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import (QThread, QObject, QTimer, QSocketNotifier,
+                          pyqtSignal, pyqtSlot)
 
 
 log = logging.getLogger(__name__)
 
 
 class EventWorker(QObject):
-    mpv_event = pyqtSignal(mpv.events.Event)
+    mpv_events = pyqtSignal(list)
     finished = pyqtSignal()
 
+    #: deliver a batch early once it holds this many events.
+    max_batch = 256
+
     def wait_event(self, mpv_instance):
         log.debug('Event loop: starting.')
+        interval = mpv_instance.event_interval / 1000.0
+        batch = mpv.dispatch.EventBatch()
+        delivered = 0.0
         while mpv_instance.handle:
-            event = mpv_instance.wait_event(-1)
+            timeout = -1
+            if batch:
+                timeout = max(0.0, delivered + interval - time.monotonic())
+            source = mpv_instance.event_source or mpv_instance
+            event = source.wait_event(timeout)
+            if timeout >= 0 and event.event_id == mpv.EventID.NONE:
+                # the queue is drained and the interval has passed.
+                self.mpv_events.emit(batch.take())
+                delivered = time.monotonic()
+                continue
             if event.event_id == mpv.EventID.NONE:
                 log.debug('Event loop: None event.')
-            elif event.event_id == mpv.EventID.SHUTDOWN:
+            batch.add(event)
+            if event.event_id == mpv.EventID.SHUTDOWN:
                 log.debug('Event loop: Shutdown event.')
-                self.mpv_event.emit(event)
                 break
-            self.mpv_event.emit(event)
+            now = time.monotonic()
+            # a steady flood never drains the queue, deliver on time anyway.
+            if (len(batch) >= self.max_batch or
+                    (interval and now >= delivered + interval)):
+                self.mpv_events.emit(batch.take())
+                delivered = now
+        if batch:
+            self.mpv_events.emit(batch.take())
         log.debug('Event loop: returning.')
         self.finished.emit()
 
@@ -34,18 +63,34 @@ class MpvTemplatePyQt(QObject, AbstractTemplate, mpv.Mpv):
     :obj:`Mpv <mpv.Mpv>`.
 
     A Template that can be subclassed for a PyQt5 application.
-    It uses a :obj:`PyQt5.QtCore.QThread` for the event loop.
+    It uses a :obj:`PyQt5.QtCore.QThread` for the event loop. Events are
+    collected on that thread and handed to the GUI thread in batches, at
+    most once per ``event_interval``, with property changes coalesced by
+    name.
     see ``demo/pyqt5.py`` for an example.
 
     Args:
         options (:obj:`dict`, optional): dictionary of options to set with
             mpv_set_option().
-        observe (:obj:`list` of :obj:`str`): a list of properties to be
-            observed.
+        observe (:obj:`list` of :obj:`str` or :obj:`dict`): a list of
+            properties to be observed, or a dict mapping each property to a
+            :obj:`PropertyPolicy <mpv.dispatch.PropertyPolicy>` (or its
+            keyword arguments, or ``None``) that limits how often
+            :obj:`on_property_change()
+            <mpv.templates.AbstractTemplate.on_property_change>` is called
+            for it, e.g. ``{'time-pos': {'rate': 10, 'delta': 0.05}}``.
         log_level (:obj:`mpv.LogLevel`): the log level for mpv to use.
         log_handler (:obj:`callable`): a function that will be called with
             the log message as its only argument.
         parent (:obj:`QObject <PyQt5.QtCore.QObject>`): the Qt parent.
+        log_pipeline (:obj:`mpv.logs.LogPipeline`, optional): forward log
+            messages through this pipeline instead of
+            :obj:`on_log_message()
+            <mpv.templates.AbstractTemplate.on_log_message>`. ``log_level``
+            and ``log_handler`` are ignored when it is given.
+        event_interval (int, optional): minimum time in milliseconds between
+            two batches of events delivered to the GUI thread. ``0`` delivers
+            whatever is queued as soon as possible.
         **kwargs (optional): options to set with mpv_set_option().
 
     Raises:
@@ -53,6 +98,10 @@ class MpvTemplatePyQt(QObject, AbstractTemplate, mpv.Mpv):
             requirement.
 
     Attributes:
+        seek_scheduler (:obj:`SeekScheduler <mpv.seek.SeekScheduler>`): used
+            by :obj:`seek_absolute()
+            <mpv.templates.MpvTemplatePyQt.seek_absolute>` and
+            :obj:`seek_preview() <mpv.templates.MpvTemplatePyQt.seek_preview>`.
         shutdown (:obj:`pyqtSignal <PyQt5.QtCore.pyqtSignal>`): Emitted when
             mpv has finished shutting down after
             :obj:`quit() <mpv.templates.MpvTemplatePyQt.quit>` has been called.
@@ -62,39 +111,65 @@ class MpvTemplatePyQt(QObject, AbstractTemplate, mpv.Mpv):
     shutdown = pyqtSignal()
 
     def __init__(self, options=None, observe=None, log_level=mpv.LogLevel.INFO,
-                 log_handler=None, parent=None, **kwargs):
+                 log_handler=None, parent=None, log_pipeline=None,
+                 event_interval=16, **kwargs):
         QObject.__init__(self, parent)
         AbstractTemplate.__init__(self)
         mpv.Mpv.__init__(self, options=options, **kwargs)
 
-        if observe is not None:
-            for prop in observe:
-                self.observe_property(prop)
+        self._observe(observe)
 
-        if log_handler is not None:
+        if log_pipeline is not None:
+            self.set_log_pipeline(log_pipeline)
+        elif log_handler is not None:
             self.request_log_messages(log_level)
             self.log_handler = log_handler
 
+        self._property_timer = QTimer(self)
+        self._property_timer.setSingleShot(True)
+        self._property_timer.timeout.connect(self._schedule_properties)
+
+        self.event_interval = event_interval
+        self.seek_scheduler = mpv.seek.SeekScheduler(self)
+
+        self.before_initialize()
+        self.initialize()
+
+        # events are handled on the thread that owns this object.
+        self.event_thread = threading.current_thread()
+        self._start_events()
+
+    def _start_events(self):
         self._event_thread = QThread(self)
         self._event_worker = EventWorker()
         self._event_worker.moveToThread(self._event_thread)
-        self._event_worker.mpv_event.connect(self._handle_event)
+        self._event_worker.mpv_events.connect(self._handle_events)
         self._event_worker.finished.connect(self._event_worker.deleteLater)
         self._event_thread.finished.connect(self._event_thread.deleteLater)
         self._wakeup.connect(self._event_worker.wait_event)
 
-        self.before_initialize()
-        self.initialize()
-
         self._event_thread.start()
         self._wakeup.emit(self)
 
+    def _stop_events(self):
+        self.command('quit')  # trigger a SHUTDOWN event.
+        self._event_thread.quit()  # end the event thread
+        self._event_thread.wait()
+
+    def _handle_events(self, events):
+        for event in events:
+            self._handle_event(event)
+        self._schedule_properties()
+
+    def _schedule_properties(self):
+        timeout = self._flush_properties()
+        if timeout >= 0 and not self._property_timer.isActive():
+            self._property_timer.start(int(math.ceil(timeout * 1000)))
+
     def quit(self):
         """Make mpv quit. """
         if self.handle:
-            self.command('quit')  # trigger a SHUTDOWN event.
-            self._event_thread.quit()  # end the event thread
-            self._event_thread.wait()
+            self._stop_events()
             self.terminate_destroy()  # destroy mpv
         self.shutdown.emit()
 
@@ -107,7 +182,21 @@ class MpvTemplatePyQt(QObject, AbstractTemplate, mpv.Mpv):
         """
         if not self.handle:
             return
-        self.seek(ms / 1000.0, 'absolute+exact')
+        self.seek_scheduler.seek(ms / 1000.0, exact=True)
+
+    @pyqtSlot(int)
+    def seek_preview(self, ms):
+        """Seek to the nearest keyframe, e.g. while a slider is dragged.
+        Requests made while a seek is in flight are dropped in favour of the
+        newest.
+
+        Args:
+            ms (int): the absolute position in milliseconds.
+
+        """
+        if not self.handle:
+            return
+        self.seek_scheduler.seek(ms / 1000.0)
 
     @pyqtSlot(int)
     def seek_relative(self, ms):
@@ -132,3 +221,55 @@ class MpvTemplatePyQt(QObject, AbstractTemplate, mpv.Mpv):
         if val < 0 or val > 100:
             raise ValueError('Must be in range [0, 100]')
         self.volume = val
+
+
+class MpvTemplatePyQtNotifier(MpvTemplatePyQt):
+    """Bases: :obj:`MpvTemplatePyQt <mpv.templates.MpvTemplatePyQt>`.
+
+    A PyQt5 Template without an event thread. mpv's wakeup pipe is watched
+    by a :obj:`QSocketNotifier <PyQt5.QtCore.QSocketNotifier>` on the GUI
+    thread, and queued events are drained without blocking whenever it
+    becomes readable. Takes the same arguments as
+    :obj:`MpvTemplatePyQt <mpv.templates.MpvTemplatePyQt>`;
+    ``event_interval`` is ignored.
+
+    The wakeup pipe is not available on Windows.
+
+    Raises:
+        mpv.MpvError: if the wakeup pipe can't be created.
+
+    """
+
+    def _start_events(self):
+        self._wakeup_fd = self.get_wakeup_pipe()
+        self._notifier = QSocketNotifier(self._wakeup_fd,
+                                         QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._drain_events)
+        self._drain_events()  # events queued before the notifier existed.
+
+    def _stop_events(self):
+        self._notifier.setEnabled(False)
+
+    @pyqtSlot()
+    def _drain_events(self):
+        try:
+            while os.read(self._wakeup_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        batch = mpv.dispatch.EventBatch()
+        while self.handle and len(batch) < EventWorker.max_batch:
+            event = self.wait_event(0)
+            if event.event_id == mpv.EventID.NONE:
+                break
+            batch.add(event)
+            if event.event_id == mpv.EventID.SHUTDOWN:
+                log.debug('Event notifier: Shutdown event.')
+                self._notifier.setEnabled(False)
+                break
+        else:
+            if self.handle:
+                # more events are queued, continue after the GUI had a turn.
+                QTimer.singleShot(0, self._drain_events)
+        self._handle_events(batch.take())
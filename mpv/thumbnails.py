@@ -0,0 +1,344 @@
+import concurrent.futures
+import json
+import logging
+import math
+import os
+import struct
+import time
+import zlib
+
+from .api import Mpv
+from .exceptions import MpvError
+from .probe import load
+from .profiles import headless_options
+from .types import EventID
+
+
+log = logging.getLogger(__name__)
+
+
+#: options for grabbing frames at keyframes without output or audio, the
+#: ``probe`` profile of :obj:`HEADLESS_PROFILES
+#: <mpv.profiles.HEADLESS_PROFILES>` with video enabled.
+THUMBNAIL_OPTIONS = headless_options('probe', {
+    'vid': 'auto',
+    'keep-open': True,
+    'hr-seek': 'no',
+    'vd-lavc-skiploopfilter': 'all',
+    'vd-lavc-fast': True,
+})
+
+
+def write_png(f, width, height, rows):
+    """Write an 8 bit RGB PNG.
+
+    Args:
+        f: a file opened for binary writing.
+        width (int): the width in pixels.
+        height (int): the height in pixels.
+        rows (iterable): ``height`` rows of ``width * 3`` bytes.
+
+    """
+    def chunk(kind, data):
+        f.write(struct.pack('>I', len(data)) + kind + data)
+        f.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    f.write(b'\x89PNG\r\n\x1a\n')
+    chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    compressor = zlib.compressobj(6)
+    data = [compressor.compress(b'\x00' + bytes(row)) for row in rows]
+    data.append(compressor.flush())
+    chunk(b'IDAT', b''.join(data))
+    chunk(b'IEND', b'')
+
+
+def _rgb_rows(shot):
+    """Convert a ``screenshot-raw`` result to rows of RGB bytes."""
+    width, height, stride = shot['w'], shot['h'], shot['stride']
+    data = shot['data']
+    order = {'bgr0': (2, 1, 0), 'bgra': (2, 1, 0), 'rgb0': (0, 1, 2),
+             'rgba': (0, 1, 2)}.get(shot['format'])
+    if order is None:
+        raise ValueError('Unsupported screenshot format "{}".'.format(
+            shot['format']))
+    rows = []
+    for y in range(height):
+        src = data[y * stride:y * stride + width * 4]
+        row = bytearray(width * 3)
+        for channel, offset in enumerate(order):
+            row[channel::3] = src[offset::4]
+        rows.append(row)
+    return rows
+
+
+def _timestamp(seconds):
+    ms = int(round(seconds * 1000))
+    return '{:02d}:{:02d}:{:02d}.{:03d}'.format(
+        ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+
+def _write_vtt(filename, index):
+    sprite = os.path.basename(index['sprite'])
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('WEBVTT\n')
+        for thumb in index['thumbnails']:
+            f.write('\n{} --> {}\n{}#xywh={},{},{},{}\n'.format(
+                _timestamp(thumb['time']), _timestamp(thumb['end']), sprite,
+                thumb['x'], thumb['y'], index['width'], index['height']))
+
+
+class Thumbnailer(object):
+    """Grabs thumbnails of files with one reused headless player: each file
+    is loaded once, then every thumbnail is a keyframe seek and a
+    ``screenshot-raw``. Scaling happens in mpv's video filter chain.
+
+    Args:
+        size (tuple, optional): ``(width, height)`` of a thumbnail.
+            ``height`` can be ``None`` to keep the aspect ratio.
+        timeout (float, optional): seconds allowed for loading a file and for
+            each seek.
+        options (dict, optional): additional mpv options, these override
+            :obj:`THUMBNAIL_OPTIONS <mpv.thumbnails.THUMBNAIL_OPTIONS>`.
+
+    """
+
+    def __init__(self, size=(160, None), timeout=10.0, options=None):
+        self.size = size
+        self.timeout = timeout
+        self.options = dict(THUMBNAIL_OPTIONS)
+        self.options['vf'] = 'scale=w={}:h={}'.format(
+            size[0], size[1] if size[1] else -2)
+        self.options.update(options or {})
+        self.player = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Destroy the player."""
+        if self.player is not None:
+            self.player, player = None, self.player
+            player.terminate_destroy()
+
+    def _open(self):
+        player = Mpv(options=self.options)
+        try:
+            player.initialize()
+        except Exception:
+            player.terminate_destroy()
+            raise
+        self.player = player
+
+    def _seek(self, seconds):
+        self.player.command('seek', seconds, 'absolute+keyframes')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('Timed out seeking to {}.'.format(seconds))
+            event = self.player.wait_event(remaining)
+            if event.event_id == EventID.PLAYBACK_RESTART:
+                return
+            if event.event_id == EventID.END_FILE:
+                raise MpvError('seek', event.data.error,
+                               'the file ended while seeking', [seconds])
+
+    def load(self, path):
+        """Load a file and wait until its first frame is decoded.
+
+        Args:
+            path (str): the file or URL.
+
+        Raises:
+            TimeoutError
+            mpv.MpvError
+
+        """
+        if self.player is None:
+            self._open()
+        try:
+            load(self.player, path, self.timeout, decode=True)
+        except TimeoutError:
+            self.close()
+            raise
+
+    def capture(self, seconds):
+        """Seek the loaded file to the keyframe at ``seconds`` and capture
+        it.
+
+        Args:
+            seconds (float): the position.
+
+        Returns:
+            dict: the result of ``screenshot-raw``: ``w``, ``h``,
+            ``stride``, ``format`` and ``data``.
+
+        Raises:
+            TimeoutError
+            mpv.MpvError
+
+        """
+        try:
+            self._seek(seconds)
+        except TimeoutError:
+            self.close()
+            raise
+        return self.player.command_node('screenshot-raw', 'video')
+
+    def grab(self, path, times):
+        """
+        Args:
+            path (str): the file or URL.
+            times (iterable): positions in seconds.
+
+        Yields:
+            tuple: ``(seconds, shot)``, where ``shot`` is the dict returned
+            by ``screenshot-raw``.
+
+        Raises:
+            TimeoutError
+            mpv.MpvError
+
+        """
+        self.load(path)
+        for seconds in times:
+            yield seconds, self.capture(seconds)
+
+    def generate(self, path, sprite, count=None, interval=None,
+                 columns=None, formats=('vtt', 'json')):
+        """Write a sprite sheet of thumbnails and its index. See
+        :obj:`generate() <mpv.thumbnails.generate>`."""
+        if (count is None) == (interval is None):
+            raise ValueError('Give either count or interval.')
+        if (count if count is not None else interval) <= 0:
+            raise ValueError('count and interval must be positive.')
+        self.load(path)
+        duration = self.player.duration
+        if not duration:
+            raise ValueError('"{}" has no duration.'.format(path))
+        if count is not None:
+            times = [(i + 0.5) * duration / count for i in range(count)]
+        else:
+            times = [i * interval
+                     for i in range(int(math.ceil(duration / interval)))]
+        columns = columns or int(math.ceil(math.sqrt(len(times))))
+        rows = int(math.ceil(len(times) / columns))
+
+        sheet = None
+        thumbs = []
+        for i, seconds in enumerate(times):
+            shot = self.capture(seconds)
+            if sheet is None:
+                width, height = shot['w'], shot['h']
+                sheet = [bytearray(columns * width * 3)
+                         for _ in range(rows * height)]
+            x, y = i % columns * width, i // columns * height
+            for line, row in enumerate(_rgb_rows(shot)[:height]):
+                row = row[:width * 3]
+                sheet[y + line][x * 3:x * 3 + len(row)] = row
+            thumbs.append({'time': seconds, 'x': x, 'y': y})
+        for thumb, end in zip(thumbs, [t['time'] for t in thumbs[1:]] +
+                              [duration]):
+            thumb['end'] = end
+
+        with open(sprite, 'wb') as f:
+            write_png(f, columns * width, rows * height, sheet)
+        index = {'sprite': sprite, 'width': width, 'height': height,
+                 'columns': columns, 'duration': duration,
+                 'thumbnails': thumbs}
+        base = os.path.splitext(sprite)[0]
+        if 'vtt' in formats:
+            _write_vtt(base + '.vtt', index)
+        if 'json' in formats:
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+        return index
+
+
+def generate(path, sprite, count=None, interval=None, size=(160, None),
+             columns=None, formats=('vtt', 'json'), timeout=10.0,
+             options=None):
+    """Write a sprite sheet of evenly spaced thumbnails of a video, with a
+    WebVTT and/or JSON index next to it (``sprite`` with the extension
+    replaced).
+
+    Example:
+    ::
+
+        index = mpv.thumbnails.generate('video.mkv', 'sprite.png', count=25,
+                                        size=(160, 90))
+
+    Args:
+        path (str): the file or URL.
+        sprite (str): the PNG file to write.
+        count (int, optional): the number of thumbnails.
+        interval (float, optional): seconds between thumbnails, instead of
+            ``count``.
+        size (tuple, optional): ``(width, height)`` of a thumbnail.
+            ``height`` can be ``None`` to keep the aspect ratio.
+        columns (int, optional): thumbnails per row, defaults to a square
+            sheet.
+        formats (tuple, optional): the index files to write, ``'vtt'``
+            and/or ``'json'``.
+        timeout (float, optional): seconds allowed for loading the file and
+            for each seek.
+        options (dict, optional): additional mpv options.
+
+    Returns:
+        dict: the index, also written as JSON: the sprite, the
+        ``width`` and ``height`` of a thumbnail, ``columns``, ``duration``
+        and ``thumbnails``, a list of dicts with ``time``, ``end``, ``x``
+        and ``y``.
+
+    Raises:
+        ValueError: if neither or both of ``count`` and ``interval`` are
+            given.
+        TimeoutError
+        mpv.MpvError
+
+    """
+    with Thumbnailer(size, timeout, options) as thumbnailer:
+        return thumbnailer.generate(path, sprite, count, interval, columns,
+                                    formats)
+
+
+def _generate_job(args):
+    path, sprite, kwargs = args
+    try:
+        return path, generate(path, sprite, **kwargs), None
+    except (MpvError, TimeoutError, OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def generate_many(jobs, workers=None, processes=False, **kwargs):
+    """Run :obj:`generate() <mpv.thumbnails.generate>` for many files on a
+    pool of workers, each file on its own headless player.
+
+    Args:
+        jobs (iterable): ``(path, sprite)`` tuples.
+        workers (int, optional): number of workers, defaults to the number
+            of CPUs.
+        processes (bool, optional): use processes instead of threads.
+        **kwargs: arguments for :obj:`generate()
+            <mpv.thumbnails.generate>`.
+
+    Yields:
+        tuple: ``(path, index, error)`` as files finish, ``error`` is a
+        string or ``None``.
+
+    """
+    workers = workers or os.cpu_count() or 1
+    executor = (concurrent.futures.ProcessPoolExecutor if processes else
+                concurrent.futures.ThreadPoolExecutor)
+    with executor(workers) as pool:
+        futures = [pool.submit(_generate_job, (path, sprite, kwargs))
+                   for path, sprite in jobs]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -1,7 +1,7 @@
 import logging
 from ctypes import (c_void_p, c_int, c_longlong, c_ulonglong, addressof, cast,
                     c_char_p, c_size_t, c_double, Structure, Union, POINTER,
-                    CFUNCTYPE)
+                    CFUNCTYPE, string_at)
 from .events import Event, ClientMessage, EndFile, LogMessage, Property
 
 
@@ -16,6 +16,10 @@ class MpvOpenGLCbContext(c_void_p):
     pass
 
 
+class MpvRenderContext(c_void_p):
+    pass
+
+
 class Enum(c_int):
     def __eq__(self, other):
         if isinstance(other, self.__class__):
@@ -39,6 +43,34 @@ class SubApi(Enum):
     MPV_SUB_API_OPENGL_CB = 1  #:
 
 
+class RenderParamType(Enum):
+    """Parameter types for the render API. For documentation on these, see
+    ``libmpv/render.h``
+
+    """
+    INVALID = 0  #:
+    API_TYPE = 1  #:
+    OPENGL_INIT_PARAMS = 2  #:
+    OPENGL_FBO = 3  #:
+    FLIP_Y = 4  #:
+    DEPTH = 5  #:
+    ICC_PROFILE = 6  #:
+    AMBIENT_LIGHT = 7  #:
+    X11_DISPLAY = 8  #:
+    WL_DISPLAY = 9  #:
+    ADVANCED_CONTROL = 10  #:
+    NEXT_FRAME_INFO = 11  #:
+    BLOCK_FOR_TARGET_TIME = 12  #:
+    SKIP_RENDERING = 13  #:
+    DRM_DISPLAY = 14  #:
+    DRM_DRAW_SURFACE_SIZE = 15  #:
+    DRM_DISPLAY_V2 = 16  #:
+    SW_SIZE = 17  #:
+    SW_FORMAT = 18  #:
+    SW_STRIDE = 19  #:
+    SW_POINTER = 20  #:
+
+
 class ErrorCode(Enum):
     """ For documentation on these, see ``libmpv/client.h`` """
     SUCCESS = 0  #:
@@ -175,7 +207,7 @@ class MpvNode(Structure):
             return {key: node.get_value() for key, node in
                     self.list.contents.as_dict().items()}
         elif self.format.value == Format.BYTE_ARRAY:
-            raise NotImplementedError
+            return string_at(self.ba.contents.data, self.ba.contents.size)
         else:
             return None
 
@@ -253,6 +285,15 @@ class MpvEvent(Structure):
                 ('reply_userdata', c_ulonglong),
                 ('data', c_void_p)]
 
+    def log_message(self):
+        """
+        Returns:
+            :obj:`MpvEventLogMessage`: the raw, undecoded data of a
+            ``LOG_MESSAGE`` event.
+
+        """
+        return cast(self.data, POINTER(MpvEventLogMessage)).contents
+
     def as_object(self):
         dtype = self.event_id.ctype()
         return Event(
@@ -264,6 +305,11 @@ class MpvEvent(Structure):
         )
 
 
+class MpvRenderParam(Structure):
+    _fields_ = [('type', RenderParamType),
+                ('data', c_void_p)]
+
+
 class MpvEventProperty(Structure):
     _fields_ = [('name', c_char_p),
                 ('format', Format),
@@ -325,6 +371,7 @@ class MpvEventClientMessage(Structure):
 WakeupCallback = CFUNCTYPE(None, c_void_p)
 OpenGlCbUpdateFn = CFUNCTYPE(None, c_void_p)
 OpenGlCbGetProcAddrFn = CFUNCTYPE(c_void_p, c_void_p, c_char_p)
+RenderUpdateFn = CFUNCTYPE(None, c_void_p)
 
 
 class NodeBuilder(object):
@@ -0,0 +1,274 @@
+import collections
+import concurrent.futures
+import functools
+import logging
+import threading
+import time
+
+from .exceptions import MpvError
+from .types import ErrorCode, EventID
+
+
+log = logging.getLogger(__name__)
+
+
+class WriteQueue(object):
+    """Write-behind for property setters. While a queue is set with
+    :obj:`set_write_queue() <mpv.Mpv.set_write_queue>`, assigning a property
+    attribute, e.g. ``player.volume = 50``, only stores the value. Every
+    ``interval`` the latest value of each property is sent with
+    ``mpv_set_property_async``, so a control that sets a property hundreds
+    of times a second costs one write per tick. Reading the attribute
+    returns the queued value until mpv confirms the write, or until the
+    confirmation is ``reply_timeout`` overdue, then mpv is asked again.
+
+    Confirmations arrive as ``SET_PROPERTY_REPLY`` events, which have to be
+    passed to :obj:`route_event() <mpv.Mpv.route_event>`, so the player
+    needs an :obj:`event_thread <mpv.Mpv>`; the templates have one. A
+    ``SHUTDOWN`` event stops the queue, confirmations still outstanding
+    then fail.
+
+    Example:
+    ::
+
+        player.set_write_queue(mpv.writes.WriteQueue(interval=0.05))
+        player.volume = 50
+        done = player.write_queue.set('brightness', 10, confirm=True)
+
+    Args:
+        interval (float, optional): seconds between flushes. ``None`` starts
+            no thread, :obj:`flush() <mpv.writes.WriteQueue.flush>` has to be
+            called instead, e.g. from a GUI timer.
+        reply_timeout (float, optional): seconds after which an unconfirmed
+            write no longer shadows the property.
+
+    Attributes:
+        submitted (int): values passed to :obj:`set()
+            <mpv.writes.WriteQueue.set>`.
+        coalesced (int): values replaced by a later one before they were
+            sent.
+        sent (int): asynchronous writes sent to mpv.
+        failed (int): writes that mpv rejected.
+
+    """
+
+    def __init__(self, interval=0.05, reply_timeout=1.0):
+        self.interval = interval
+        self.reply_timeout = reply_timeout
+        self.player = None
+        # name -> [value, mpv_format, futures]
+        self._pending = collections.OrderedDict()
+        # name -> (reply future, value, time sent)
+        self._inflight = {}
+        # reply future -> futures waiting for its confirmation
+        self._unconfirmed = {}
+        self._listener = None
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self, player):
+        """Start flushing writes to ``player``. Called by
+        :obj:`set_write_queue() <mpv.Mpv.set_write_queue>`.
+
+        Raises:
+            ValueError: if ``player`` has no :obj:`event_thread <mpv.Mpv>`,
+                nothing would deliver the confirmations.
+
+        """
+        if player.event_thread is None:
+            raise ValueError('A write queue needs a player with an event '
+                             'loop.')
+        with self._lock:
+            if self._running:
+                return
+            self.player = player
+            self._running = True
+        self._listener = player.add_event_listener(EventID.SHUTDOWN,
+                                                   self._on_shutdown)
+        if self.interval is not None:
+            self._thread = threading.Thread(target=self._run,
+                                            name='MPVWriteQueueThread',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self, flush=True):
+        """Stop flushing.
+
+        Args:
+            flush (bool, optional): send the queued writes before returning.
+                Otherwise their futures are cancelled. Futures of writes
+                that mpv hasn't confirmed yet fail with
+                :obj:`mpv.MpvError`.
+
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        if self._listener is not None:
+            self.player.remove_event_listener(self._listener)
+            self._listener = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+        with self._lock:
+            pending, self._pending = self._pending, collections.OrderedDict()
+            unconfirmed, self._unconfirmed = self._unconfirmed, {}
+            self._inflight.clear()
+        for _, _, futures in pending.values():
+            for future in futures:
+                future.cancel()
+        for futures in unconfirmed.values():
+            for future in futures:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(MpvError(
+                        'mpv_set_property_async',
+                        ErrorCode(ErrorCode.UNINITIALIZED),
+                        'the write queue stopped before mpv confirmed the '
+                        'write', []))
+        self.player = None
+
+    def _on_shutdown(self, event):
+        self.stop(flush=False)
+
+    def set(self, name, value, mpv_format=None, confirm=False):
+        """Queue a write. A queued write of the same property is replaced.
+
+        Args:
+            name (str): the name of the property.
+            value: the new value.
+            mpv_format (:obj:`mpv.Format`, optional): the format of the
+                data. Defaults to :obj:`property_format()
+                <mpv.Mpv.property_format>`.
+            confirm (bool, optional): return a future.
+
+        Returns:
+            :obj:`concurrent.futures.Future`: with ``confirm``, resolved with
+            ``None`` once mpv has applied this value or a later one, or
+            failed with :obj:`mpv.MpvError`. ``None`` otherwise.
+
+        """
+        future = concurrent.futures.Future() if confirm else None
+        with self._condition:
+            self.submitted += 1
+            entry = self._pending.get(name)
+            if entry is None:
+                entry = self._pending[name] = [value, mpv_format, []]
+                if len(self._pending) == 1:
+                    self._condition.notify()
+            else:
+                self.coalesced += 1
+                entry[0] = value
+                entry[1] = mpv_format
+            if future is not None:
+                entry[2].append(future)
+        return future
+
+    def peek(self, name, default=None):
+        """
+        Args:
+            name (str): the name of the property.
+            default: returned if no write is queued or in flight.
+
+        Returns:
+            the value of the latest write of ``name`` that mpv hasn't
+            confirmed yet, unless the confirmation is overdue.
+
+        """
+        with self._lock:
+            entry = self._pending.get(name)
+            if entry is not None:
+                return entry[0]
+            inflight = self._inflight.get(name)
+            if inflight is not None:
+                if time.monotonic() - inflight[2] < self.reply_timeout:
+                    return inflight[1]
+                del self._inflight[name]
+        return default
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Send the queued writes on the calling thread."""
+        with self._lock:
+            pending, self._pending = self._pending, collections.OrderedDict()
+            player = self.player
+        for name, (value, mpv_format, futures) in pending.items():
+            try:
+                if player is None:
+                    raise MpvError('mpv_set_property_async',
+                                   ErrorCode(ErrorCode.UNINITIALIZED),
+                                   'the write queue is stopped',
+                                   [name, value])
+                reply = player.set_property_async(name, value, mpv_format)
+            except (MpvError, TypeError, ValueError) as e:
+                self._failed(name, e, futures)
+                continue
+            self.sent += 1
+            with self._lock:
+                self._inflight[name] = (reply, value, time.monotonic())
+                self._unconfirmed[reply] = futures
+            reply.add_done_callback(functools.partial(self._on_reply, name))
+
+    def _on_reply(self, name, reply):
+        with self._lock:
+            inflight = self._inflight.get(name)
+            if inflight is not None and inflight[0] is reply:
+                del self._inflight[name]
+            futures = self._unconfirmed.pop(reply, None)
+        if futures is None:
+            # already failed by stop().
+            return
+        error = reply.exception()
+        if error is not None:
+            self._failed(name, error, futures)
+            return
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_result(None)
+
+    def _failed(self, name, error, futures):
+        self.failed += 1
+        log.debug('Writing "{}" failed: {}'.format(name, error))
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def stats(self):
+        """
+        Returns:
+            dict: the queue counters and the number of queued and
+            unconfirmed writes.
+
+        """
+        with self._lock:
+            return {'submitted': self.submitted,
+                    'coalesced': self.coalesced,
+                    'sent': self.sent,
+                    'failed': self.failed,
+                    'queued': len(self._pending),
+                    'inflight': len(self._inflight)}
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                # let more writes arrive, stop() wakes this up early.
+                self._condition.wait(self.interval)
+                if not self._running:
+                    return
+            self.flush()
@@ -1,12 +1,44 @@
+import collections
+import concurrent.futures
+import ctypes
+import itertools
+import json
+import logging
+import os
 import random
+import struct
 import threading
+import time
+import zlib
 
 from unittest import mock
 
 import pytest
 
 import mpv
+import mpv.__main__
+import mpv.bench
+import mpv.buffering
+import mpv.cache
+import mpv.clock
+import mpv.decode
+import mpv.diff
+import mpv.dispatch
+import mpv.framering
+import mpv.gapless
+import mpv.logs
+import mpv.observe
+import mpv.paths
+import mpv.playlist
+import mpv.preview
+import mpv.probe
+import mpv.profiles
+import mpv.record
+import mpv.seek
+import mpv.render
 import mpv.templates
+import mpv.thumbnails
+import mpv.writes
 
 
 class TestLibraryLoading:
@@ -239,6 +271,35 @@ class TestTemplate:
         template.pause = False
         prop_mock.assert_not_called()
 
+    def test_subscribe(self, template):
+        prop_mock = mock.Mock()
+        template.on_property_change = mock.Mock()
+        cond = threading.Condition(template._lock)
+
+        def on_volume(event):
+            prop_mock(event)
+            with cond:
+                cond.notify_all()
+
+        with cond:
+            subscription = template.subscribe('volume', on_volume)
+            template.volume = 10
+            cond.wait(5)
+
+        assert subscription >= mpv.api.FIRST_REPLY_USERDATA
+        prop_mock.assert_called_with(mpv.events.Property('volume', 10))
+        assert template.on_property_change.call_count == 0
+
+        template.unsubscribe(subscription)
+        with template._event_condition:
+            template._event_condition.wait(1)
+        prop_mock.reset_mock()
+
+        template.volume = 20
+        with template._event_condition:
+            template._event_condition.wait(1)
+        prop_mock.assert_not_called()
+
     def test_log_handler(self, template):
         log_handler = mock.Mock()
         cond = threading.Condition()
@@ -372,3 +433,1783 @@ class TestEvents:
         assert a == b
         assert a != c
         assert a != d
+
+
+class TestLogPipeline:
+    def message(self, prefix, level, text):
+        return mpv.types.MpvEventLogMessage(prefix, level, text)
+
+    def test_prefix_levels(self):
+        pipeline = mpv.logs.LogPipeline(level=mpv.LogLevel.WARN,
+                                        levels={'ffmpeg': mpv.LogLevel.TRACE})
+        assert pipeline.request_level() == mpv.LogLevel.TRACE
+
+        assert pipeline.submit(self.message(b'ffmpeg', b'trace', b'a\n'))
+        assert pipeline.submit(self.message(b'cplayer', b'error', b'b\n'))
+        assert not pipeline.submit(self.message(b'cplayer', b'debug', b'c\n'))
+
+        stats = pipeline.stats()
+        assert stats['received'] == 3
+        assert stats['filtered'] == 1
+        assert stats['buffered'] == 2
+
+    def test_ring_buffer_drops_oldest(self):
+        logger = logging.getLogger('test_mpv.ring')
+        logger.setLevel(1)
+        handler = mock.Mock(level=0)
+        logger.addHandler(handler)
+        pipeline = mpv.logs.LogPipeline(logger=logger, capacity=3,
+                                        level=mpv.LogLevel.TRACE)
+        for i in range(5):
+            pipeline.submit(self.message(b'cplayer', b'info',
+                                         str(i).encode()))
+        pipeline.flush()
+
+        assert pipeline.dropped == 2
+        assert pipeline.forwarded == 3
+        messages = [c[0][0].getMessage() for c in handler.handle.call_args_list]
+        assert messages == ['2', '3', '4']
+        assert handler.handle.call_args[0][0].name == 'test_mpv.ring.cplayer'
+
+    def test_background_thread(self):
+        pipeline = mpv.logs.LogPipeline(batch_size=1, interval=0.01)
+        pipeline.start()
+        assert 'MPVLogPipelineThread' in [t.name for t in threading.enumerate()]
+        pipeline.submit(self.message(b'cplayer', b'info', b'x'))
+        pipeline.stop()
+        assert pipeline.forwarded == 1
+
+    def test_wait_event(self):
+        messages = [self.message(b'cplayer', b'error', b'a'),
+                    self.message(b'cplayer', b'debug', b'b')]
+        events = [mock.Mock(**{'contents.event_id': mpv.EventID.LOG_MESSAGE,
+                               'contents.log_message.return_value': m})
+                  for m in messages]
+        events.append(mock.Mock(**{'contents.event_id': mpv.EventID.NONE}))
+        player = mpv.Mpv.__new__(mpv.Mpv)
+        player.handle = 1
+        player.libmpv = mock.Mock()
+        player.libmpv.mpv_wait_event.side_effect = events
+        player.log_pipeline = mpv.logs.LogPipeline(level=mpv.LogLevel.WARN)
+        now = [10.0]
+
+        def monotonic():
+            now[0] += 0.4
+            return now[0]
+
+        with mock.patch('mpv.api.time.monotonic', monotonic):
+            event = player.wait_event(1.0)
+        # the filtered message is dropped too, never decoded.
+        assert event is events[2].contents.as_object.return_value
+        events[1].contents.as_object.assert_not_called()
+        assert player.log_pipeline.stats()['buffered'] == 1
+        assert player.log_pipeline.filtered == 1
+        timeouts = [c[0][1] for c in
+                    player.libmpv.mpv_wait_event.call_args_list]
+        assert timeouts == [1.0, pytest.approx(0.6), pytest.approx(0.2)]
+        assert 'MPVLogPipelineThread' not in [t.name for t in
+                                              threading.enumerate()]
+
+
+class TestPropertyDispatcher:
+    def event(self, name, value):
+        return mpv.events.Event(mpv.EventID(mpv.EventID.PROPERTY_CHANGE),
+                                mpv.ErrorCode(mpv.ErrorCode.SUCCESS), 0,
+                                mpv.events.Property(name, value))
+
+    def dispatcher(self, policies):
+        self.now = 0.0
+        return mpv.dispatch.PropertyDispatcher(policies,
+                                               clock=lambda: self.now)
+
+    def test_no_policy(self):
+        dispatcher = self.dispatcher({'time-pos': {'rate': 1}})
+        event = self.event('pause', True)
+        assert dispatcher.filter(event) is event
+        assert dispatcher.filter(event) is event
+        assert dispatcher.timeout() == -1
+
+    def test_rate_coalesces_latest(self):
+        dispatcher = self.dispatcher({'time-pos': {'rate': 10}})
+        assert dispatcher.filter(self.event('time-pos', 1.0)) is not None
+        self.now = 0.02
+        assert dispatcher.filter(self.event('time-pos', 1.02)) is None
+        self.now = 0.04
+        latest = self.event('time-pos', 1.04)
+        assert dispatcher.filter(latest) is None
+        assert dispatcher.timeout() == pytest.approx(0.06)
+        assert dispatcher.flush() == []
+
+        self.now = 0.1
+        assert dispatcher.flush() == [latest]
+        assert dispatcher.timeout() == -1
+
+    def test_rate_without_coalescing(self):
+        policy = mpv.dispatch.PropertyPolicy(rate=10, coalesce=False)
+        dispatcher = self.dispatcher({'time-pos': policy})
+        assert dispatcher.filter(self.event('time-pos', 1.0)) is not None
+        self.now = 0.05
+        assert dispatcher.filter(self.event('time-pos', 1.05)) is None
+        self.now = 1.0
+        assert dispatcher.flush() == []
+
+    def test_delta(self):
+        dispatcher = self.dispatcher({'volume': {'delta': 1}})
+        assert dispatcher.filter(self.event('volume', 50.0)) is not None
+        assert dispatcher.filter(self.event('volume', 50.5)) is None
+        assert dispatcher.filter(self.event('volume', 49.0)) is not None
+        assert dispatcher.filter(self.event('volume', None)) is not None
+
+
+    def test_diff(self):
+        dispatcher = self.dispatcher({
+            'track-list': {'diff': True, 'ignore': {'demux-bitrate'}}})
+        tracks = [{'id': 1, 'type': 'audio', 'selected': True,
+                   'demux-bitrate': 100}]
+        first = dispatcher.filter(self.event('track-list', tracks))
+        assert first.data == mpv.events.Property(
+            'track-list', mpv.diff.ListDelta({('audio', 1): tracks[0]}))
+
+        bitrate = [dict(tracks[0], **{'demux-bitrate': 200})]
+        assert dispatcher.filter(self.event('track-list', bitrate)) is None
+
+        changed = bitrate + [{'id': 2, 'type': 'sub', 'selected': False}]
+        changed[0] = dict(changed[0], selected=False)
+        delta = dispatcher.filter(self.event('track-list', changed)).data.data
+        assert delta.added == {('sub', 2): changed[1]}
+        assert delta.removed == {}
+        assert delta.modified == {('audio', 1): {'selected': False}}
+
+    def test_diff_track_types(self):
+        differ = mpv.diff.ListDiffer('track-list')
+        video = {'id': 1, 'type': 'video', 'selected': True}
+        audio = {'id': 1, 'type': 'audio', 'selected': True}
+        assert differ.update([video, audio]).added == {
+            ('video', 1): video, ('audio', 1): audio}
+        # the audio track with the same id is a different item.
+        delta = differ.update([video, dict(audio, selected=False)])
+        assert delta.added == {} and delta.removed == {}
+        assert delta.modified == {('audio', 1): {'selected': False}}
+        delta = differ.update([video])
+        assert delta.removed == {('audio', 1): dict(audio, selected=False)}
+        assert delta.modified == {}
+
+class TestEventBatch:
+    def event(self, event_id, data=None, reply_userdata=0):
+        return mpv.events.Event(mpv.EventID(event_id),
+                                mpv.ErrorCode(mpv.ErrorCode.SUCCESS),
+                                reply_userdata, data)
+
+    def test_coalesce_properties(self):
+        batch = mpv.dispatch.EventBatch()
+        first = self.event(mpv.EventID.PROPERTY_CHANGE,
+                           mpv.events.Property('time-pos', 1.0))
+        idle = self.event(mpv.EventID.IDLE)
+        pause = self.event(mpv.EventID.PROPERTY_CHANGE,
+                           mpv.events.Property('pause', True))
+        other = self.event(mpv.EventID.PROPERTY_CHANGE,
+                           mpv.events.Property('time-pos', 1.5), 7)
+        last = self.event(mpv.EventID.PROPERTY_CHANGE,
+                          mpv.events.Property('time-pos', 2.0))
+        for event in [first, idle, pause, other, last]:
+            batch.add(event)
+
+        assert len(batch) == 4
+        assert batch.take() == [idle, pause, other, last]
+        assert len(batch) == 0
+        batch.add(first)
+        assert batch.take() == [first]
+
+    def test_order_with_end_file(self):
+        batch = mpv.dispatch.EventBatch()
+        old_path = self.event(mpv.EventID.PROPERTY_CHANGE,
+                              mpv.events.Property('path', 'a.mkv'))
+        old_pos = self.event(mpv.EventID.PROPERTY_CHANGE,
+                             mpv.events.Property('time-pos', 9.5))
+        end = self.event(mpv.EventID.END_FILE, mpv.events.EndFile(
+            mpv.EndFileReason(mpv.EndFileReason.EOF), mpv.ErrorCode(0)))
+        start = self.event(mpv.EventID.START_FILE)
+        new_path = self.event(mpv.EventID.PROPERTY_CHANGE,
+                              mpv.events.Property('path', 'b.mkv'))
+        new_pos = self.event(mpv.EventID.PROPERTY_CHANGE,
+                             mpv.events.Property('time-pos', 0.0))
+        for event in [old_path, old_pos, end, start, new_path, new_pos]:
+            batch.add(event)
+
+        # the values of the next file come after the end of the previous.
+        assert batch.take() == [end, start, new_path, new_pos]
+
+
+class TestRender:
+    def test_writable_buffer(self):
+        buffer = bytearray(64)
+        target = mpv.render._writable_buffer(buffer, 64)
+        target[0] = b'x'
+        assert buffer[0] == ord('x')
+
+        with pytest.raises(TypeError):
+            mpv.render._writable_buffer(bytes(64), 64)
+        with pytest.raises(ValueError):
+            mpv.render._writable_buffer(bytearray(63), 64)
+        with pytest.raises(ValueError):
+            mpv.render._writable_buffer(memoryview(buffer)[::2], 16)
+
+    def test_render_params(self):
+        params = mpv.libmpv.LibMPV._render_params(None, [
+            (mpv.RenderParamType.API_TYPE, ctypes.c_char_p(b'sw')),
+        ])
+        assert len(params) == 2
+        assert params[0].type == mpv.RenderParamType.API_TYPE
+        assert params[1].type == mpv.RenderParamType.INVALID
+
+    def test_sw_version(self):
+        player = mock.Mock()
+        player.libmpv.client_api_version.return_value = (1, 101)
+        with pytest.raises(mpv.MpvError):
+            mpv.render.SoftwareRenderContext(player, size=(16, 16))
+        assert not player.libmpv.render_context_create.called
+
+        player.libmpv.client_api_version.return_value = (1, 107)
+        ctx = mpv.render.SoftwareRenderContext(player, size=(16, 16))
+        assert ctx.handle is player.libmpv.render_context_create.return_value
+
+
+class TestFrameRing:
+    @pytest.fixture(scope='function')
+    def ring(self, request):
+        ring = mpv.framering.FrameRing.create(slots=4, slot_size=16)
+        request.addfinalizer(ring.close)
+        return ring
+
+    def test_write_read(self, ring):
+        consumer = ring.consumer()
+        assert consumer.next(timeout=0) is None
+        for i in range(3):
+            ring.write(bytes([i]) * 12, pts=i / 10.0, width=1, height=3,
+                       stride=4, fmt='bgr0')
+
+        frames = [consumer.next(timeout=0) for _ in range(3)]
+        assert [f.seq for f in frames] == [1, 2, 3]
+        assert frames[1].pts == 0.1
+        assert frames[1].format == 'bgr0'
+        assert bytes(memoryview(frames[2].data).cast('B')) == b'\x02' * 12
+        assert all(f.valid() for f in frames)
+        del frames
+        consumer.close()
+
+    def test_grab_without_pts(self, ring):
+        player = mock.Mock()
+        player.time_pos = None
+        player.command_node.return_value = {
+            'data': b'x' * 8, 'w': 2, 'h': 1, 'stride': 8, 'format': 'bgr0'}
+        consumer = ring.consumer()
+        assert ring.grab(player) == 1
+        assert consumer.next(timeout=0).pts is None
+
+        with pytest.raises(ValueError):
+            ring.write(b'x', fmt='yuv420p10le')
+        assert ring.published == 1
+        consumer.close()
+
+    def test_drop_oldest(self, ring):
+        consumer = ring.consumer()
+        for i in range(7):
+            ring.write(b'x')
+        frame = consumer.next(timeout=0)
+        assert frame.seq == 4
+        assert consumer.skipped == 3
+        del frame
+        consumer.close()
+
+    def test_partition(self, ring):
+        consumers = [ring.consumer(partition=(i, 2)) for i in range(2)]
+        for i in range(4):
+            ring.write(b'x')
+        assert [consumers[0].next(timeout=0).seq for _ in range(2)] == [2, 4]
+        assert [consumers[1].next(timeout=0).seq for _ in range(2)] == [1, 3]
+        for consumer in consumers:
+            consumer.close()
+
+    def test_block(self, ring):
+        blocking = mpv.framering.FrameRing(ring.shm, policy='block',
+                                           timeout=0.01)
+        consumer = blocking.consumer()
+        assert [blocking.write(b'x') for _ in range(5)] == [1, 2, 3, 4, None]
+        assert blocking.dropped == 1
+        consumer.next(timeout=0)
+        consumer.release()
+        assert blocking.write(b'x') == 5
+        consumer.close()
+
+    def test_concurrent_registration(self, ring):
+        consumers = []
+        threads = [threading.Thread(
+            target=lambda: consumers.append(ring.consumer()))
+            for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(c._index for c in consumers) == list(range(16))
+        with pytest.raises(RuntimeError):
+            ring.consumer()
+        for consumer in consumers:
+            consumer.close()
+
+
+class TestPropertySchema:
+    @pytest.fixture(scope='function')
+    def player(self):
+        values = {
+            'mpv-version': 'mpv 0.0.0-test',
+            'property-list': ['pause', 'volume', 'track-list', 'new-flag',
+                              'new-list', 'broken'],
+            'option-info/pause/type': 'Flag',
+            'option-info/volume/type': 'Float',
+            'new-flag': True,
+            'new-list': [1, 2],
+        }
+
+        def get_property(handle, name, mpv_format):
+            if name not in values:
+                raise mpv.MpvError('mpv_get_property',
+                                   mpv.ErrorCode(mpv.ErrorCode.PROPERTY_ERROR),
+                                   'error', [name])
+            return values[name]
+
+        player = mock.Mock()
+        player.values = values
+        player.libmpv._get_property.side_effect = get_property
+        return player
+
+    def test_discover(self, player):
+        schema = mpv.properties.PropertySchema.discover(player)
+        assert schema.version == 'mpv 0.0.0-test'
+        assert schema.formats == {
+            'pause': mpv.Format.FLAG,
+            'volume': mpv.Format.DOUBLE,
+            'track-list': mpv.Format.NODE,
+            'new-flag': mpv.Format.FLAG,
+            'new-list': mpv.Format.NODE,
+        }
+        assert schema.unknown == {'broken'}
+        assert 'broken' in schema
+        assert 'new-flag' in schema
+        assert 'length' not in schema
+
+    def test_disk_cache(self, player, tmp_path):
+        schema = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        calls = player.libmpv._get_property.call_count
+
+        cached = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        assert cached.formats == schema.formats
+        # only mpv-version and the unknown property are read on a cache hit.
+        assert player.libmpv._get_property.call_count == calls + 2
+
+    def test_unknown_probed_again(self, player, tmp_path):
+        schema = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        assert schema.unknown == {'broken'}
+
+        # still without a value, the cache is kept.
+        cached = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        assert cached.unknown == {'broken'}
+
+        player.values['broken'] = 1.5
+        cached = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        assert cached.formats['broken'] == mpv.Format.DOUBLE
+        assert not cached.unknown
+
+        calls = player.libmpv._get_property.call_count
+        cached = mpv.properties.PropertySchema.load(player, str(tmp_path))
+        assert cached.formats['broken'] == mpv.Format.DOUBLE
+        assert player.libmpv._get_property.call_count == calls + 1
+
+    def test_property_format_tabled(self):
+        player = mpv.Mpv.__new__(mpv.Mpv)
+        player._schema = None
+        with mock.patch('mpv.api.PropertySchema.load') as load:
+            assert player.property_format('track-list') == mpv.Format.NODE
+            assert player.property_format('pause') == mpv.Format.FLAG
+            assert (player.property_format('track-list/0/lang') ==
+                    mpv.Format.STRING)
+            assert not load.called
+            load.return_value.formats = {'new-flag': mpv.Format.FLAG}
+            assert player.property_format('new-flag') == mpv.Format.FLAG
+            assert load.called
+
+
+class TestObservationManager:
+    @pytest.fixture(scope='function')
+    def player(self):
+        player = mock.Mock()
+        player._reply_userdata = iter(range(100, 200))
+        player.property_format.side_effect = lambda name: {
+            'time-pos': mpv.Format.DOUBLE,
+            'pause': mpv.Format.FLAG,
+        }[name]
+        return player
+
+    def change(self, reply_userdata, name, value):
+        return mpv.events.Event(mpv.EventID(mpv.EventID.PROPERTY_CHANGE),
+                                mpv.ErrorCode(0), reply_userdata,
+                                mpv.events.Property(name, value))
+
+    def test_shared(self, player):
+        manager = mpv.observe.ObservationManager(player)
+        a, b = mock.Mock(), mock.Mock()
+        first = manager.subscribe('time-pos', a)
+        second = manager.subscribe('time-pos', b)
+        player.observe_property.assert_called_once_with(
+            'time-pos', mpv.Format.DOUBLE, first)
+        assert len(manager) == 1
+
+        assert manager.route(self.change(first, 'time-pos', 1.5))
+        a.assert_called_once_with(mpv.events.Property('time-pos', 1.5))
+        b.assert_called_once_with(mpv.events.Property('time-pos', 1.5))
+        assert not manager.route(self.change(second, 'time-pos', 2.0))
+
+        manager.unsubscribe(first)
+        player.unobserve_property.assert_not_called()
+        manager.unsubscribe(second)
+        player.unobserve_property.assert_called_once_with(first)
+        assert len(manager) == 0
+
+    def test_late_subscriber(self, player):
+        manager = mpv.observe.ObservationManager(player)
+        first = manager.subscribe('pause', mock.Mock())
+        manager.route(self.change(first, 'pause', True))
+        late = mock.Mock()
+        manager.subscribe('pause', late)
+        late.assert_called_once_with(mpv.events.Property('pause', True))
+
+    def test_conversion(self, player):
+        manager = mpv.observe.ObservationManager(player)
+        native, as_int, as_str = mock.Mock(), mock.Mock(), mock.Mock()
+        token = manager.subscribe('time-pos', native)
+        manager.subscribe('time-pos', as_int, mpv.Format.INT64)
+        manager.subscribe('time-pos', as_str, mpv.Format.STRING)
+        assert player.observe_property.call_count == 1
+
+        manager.route(self.change(token, 'time-pos', 2.5))
+        native.assert_called_once_with(mpv.events.Property('time-pos', 2.5))
+        as_int.assert_called_once_with(mpv.events.Property('time-pos', 2))
+        as_str.assert_called_once_with(
+            mpv.events.Property('time-pos', '2.500000'))
+
+    def test_separate_format(self, player):
+        manager = mpv.observe.ObservationManager(player)
+        manager.subscribe('time-pos', mock.Mock())
+        token = manager.subscribe('time-pos', mock.Mock(),
+                                  mpv.Format.OSD_STRING)
+        player.observe_property.assert_called_with(
+            'time-pos', mpv.Format.OSD_STRING, token)
+        assert len(manager) == 2
+
+    def test_diff(self, player):
+        player.property_format.side_effect = lambda name: mpv.Format.NODE
+        manager = mpv.observe.ObservationManager(player)
+        callback = mock.Mock()
+        token = manager.subscribe('chapter-list', callback, diff=True)
+        chapters = [{'title': 'a', 'time': 0.0}]
+        manager.route(self.change(token, 'chapter-list', chapters))
+        manager.route(self.change(token, 'chapter-list', list(chapters)))
+        callback.assert_called_once_with(mpv.events.Property(
+            'chapter-list', mpv.diff.ListDelta({0: chapters[0]})))
+
+        manager.route(self.change(token, 'chapter-list', []))
+        callback.assert_called_with(mpv.events.Property(
+            'chapter-list', mpv.diff.ListDelta(removed={0: chapters[0]})))
+
+    def test_observe_error(self, player):
+        player.observe_property.side_effect = AttributeError
+        manager = mpv.observe.ObservationManager(player)
+        with pytest.raises(AttributeError):
+            manager.subscribe('pause', mock.Mock())
+        assert len(manager) == 0
+
+
+class TestRecord:
+    events = [
+        mpv.events.Event(mpv.EventID(mpv.EventID.START_FILE),
+                         mpv.ErrorCode(0), 0, None),
+        mpv.events.Event(mpv.EventID(mpv.EventID.PROPERTY_CHANGE),
+                         mpv.ErrorCode(0), 1 << 48,
+                         mpv.events.Property('track-list',
+                                             [{'id': 1, 'title': 'x'}])),
+        mpv.events.Event(mpv.EventID(mpv.EventID.LOG_MESSAGE),
+                         mpv.ErrorCode(0), 0,
+                         mpv.events.LogMessage('cplayer', 'info', 'hi')),
+        mpv.events.Event(mpv.EventID(mpv.EventID.CLIENT_MESSAGE),
+                         mpv.ErrorCode(0), 0,
+                         mpv.events.ClientMessage(['a', 'b'])),
+        mpv.events.Event(mpv.EventID(mpv.EventID.END_FILE),
+                         mpv.ErrorCode(0), 0,
+                         mpv.events.EndFile(
+                             mpv.EndFileReason(mpv.EndFileReason.ERROR),
+                             mpv.ErrorCode(mpv.ErrorCode.LOADING_FAILED))),
+    ]
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_roundtrip(self, tmp_path, compress):
+        none = mpv.events.Event(mpv.EventID(mpv.EventID.NONE),
+                                mpv.ErrorCode(0), 0, None)
+        player = mock.Mock()
+        player.wait_event.side_effect = self.events + [none]
+        path = str(tmp_path / 'events')
+
+        with mpv.record.EventRecorder(player, path, compress) as recorder:
+            # the templates' event loops read from the event source.
+            assert player.event_source is recorder
+            for _ in range(len(self.events) + 1):
+                recorder.wait_event(0)
+        assert recorder.count == len(self.events)
+        assert player.event_source is None
+        with open(path, 'rb') as f:
+            if not compress:
+                assert f.readline() == mpv.record.MAGIC
+                assert json.loads(f.readline())[1] == mpv.EventID.START_FILE
+
+        replayer = mpv.record.EventReplayer(path)
+        assert [event for _, event in replayer] == self.events
+
+        class Handler(mpv.templates.AbstractTemplate):
+            on_start_file = mock.Mock()
+            on_property_change = mock.Mock()
+            on_end_file = mock.Mock()
+
+        handler = Handler()
+        count, elapsed = replayer.replay(handler, speed=None)
+        assert count == len(self.events)
+        handler.on_start_file.assert_called_once_with()
+        handler.on_property_change.assert_called_once_with(
+            self.events[1].data)
+        handler.on_end_file.assert_called_once_with(self.events[4].data)
+
+    def test_not_a_recording(self, tmp_path):
+        path = tmp_path / 'events'
+        path.write_bytes(b'garbage!')
+        with pytest.raises(ValueError):
+            list(mpv.record.EventReplayer(str(path)))
+
+
+class TestPaths:
+    @pytest.mark.parametrize('path,fmt', [
+        ('track-list/count', mpv.Format.INT64),
+        ('track-list/3/lang', mpv.Format.STRING),
+        ('track-list/3/selected', mpv.Format.FLAG),
+        ('track-list/3', mpv.Format.NODE),
+        ('chapter-list/0/time', mpv.Format.DOUBLE),
+        ('metadata/by-key/title', mpv.Format.STRING),
+        ('vf-metadata/crop/list/1/value', mpv.Format.STRING),
+        ('video-params/w', mpv.Format.INT64),
+        ('filename/no-ext', mpv.Format.NODE),
+        ('option-info/pause/type', mpv.Format.NODE),
+        ('track-list/3/codec-profile', mpv.Format.NODE),
+        ('track-list/3/hls-bitrate', mpv.Format.NODE),
+        ('playlist/0/playlist-path', mpv.Format.NODE),
+    ])
+    def test_path_format(self, path, fmt):
+        assert mpv.paths.path_format(path) == fmt
+
+    @pytest.mark.parametrize('path', [
+        'track-list/x/lang', 'track-list/count/1', 'track-list/3/lang/x',
+        'metadata/by-key/a/b', 'playlist/-1/filename', 'trak-list/0/lang',
+        'unknown/anything',
+    ])
+    def test_invalid(self, path):
+        with pytest.raises(ValueError):
+            mpv.paths.path_format(path)
+
+    def test_schema_names(self):
+        assert mpv.paths.path_format('new-list/0', {'new-list'}) == \
+            mpv.Format.NODE
+        with pytest.raises(ValueError):
+            mpv.paths.path_format('new-list/0', {'other'})
+
+    def test_builders(self):
+        assert mpv.paths.track(3, 'lang') == 'track-list/3/lang'
+        assert mpv.paths.playlist_entry(0) == 'playlist/0'
+        assert mpv.paths.count('chapter-list') == 'chapter-list/count'
+        assert (mpv.paths.metadata_key('title', 'filtered-metadata') ==
+                'filtered-metadata/by-key/title')
+        for build, args in [(mpv.paths.track, (-1,)),
+                            (mpv.paths.edition, (0, 'title/x')),
+                            (mpv.paths.count, ('volume',)),
+                            (mpv.paths.metadata_key, ('a/b',))]:
+            with pytest.raises(ValueError):
+                build(*args)
+
+
+class TestPlaylistExtend:
+    def test_loadlist(self):
+        lists = []
+
+        def command(*args):
+            if args[0] == 'loadlist':
+                with open(args[1], encoding='utf-8') as f:
+                    lists.append(f.read().splitlines())
+            elif args[1] == 'bad':
+                raise mpv.MpvError('mpv_command', mpv.ErrorCode(-1), 'error',
+                                   list(args))
+
+        player = mock.Mock()
+        player.command.side_effect = command
+        progress = mock.Mock()
+        paths = ['http://a/1', '/b/2', 'c', 'http://a/3', 'bad', '#x']
+        loaded, failures = mpv.playlist.extend(player, paths,
+                                               progress=progress,
+                                               chunk_size=4)
+        assert lists == [['#EXTM3U', 'http://a/1', '/b/2',
+                          os.path.abspath('c'), 'http://a/3']]
+        # the second chunk can't be a list and is loaded entry by entry.
+        assert loaded == 5
+        assert [(i, p) for i, p, _ in failures] == [(4, 'bad')]
+        progress.assert_called_with(6, 6)
+
+    def test_cancel(self):
+        player = mock.Mock()
+        cancel = threading.Event()
+        player.command.side_effect = lambda *args: cancel.set()
+        loaded, failures = mpv.playlist.extend(player, ['a', 'b'],
+                                               cancel=cancel, chunk_size=1)
+        assert loaded == 1
+        assert player.command.call_count == 1
+
+    def test_options(self):
+        def command_async(*args):
+            future = concurrent.futures.Future()
+            if args[1] == 'bad':
+                future.set_exception(mpv.MpvError(
+                    'mpv_command_async', mpv.ErrorCode(-1), 'error', args))
+            else:
+                future.set_result(None)
+            return future
+
+        player = mock.Mock()
+        player.command_async.side_effect = command_async
+        loaded, failures = mpv.playlist.extend(
+            player, ['a', 'bad', 'c'], options={'start': 10, 'title': 'x,y'},
+            max_pending=2)
+        player.command_async.assert_any_call('loadfile', 'a', 'append',
+                                             'start=10,title=%3%x,y')
+        assert loaded == 2
+        assert [(i, p) for i, p, _ in failures] == [(1, 'bad')]
+
+    def test_options_without_event_loop(self):
+        futures = []
+
+        def command_async(*args):
+            futures.append(concurrent.futures.Future())
+            return futures[-1]
+
+        player = mock.Mock(event_thread=None)
+        player.command_async.side_effect = command_async
+        # each event read resolves the oldest reply.
+        player.route_event.side_effect = lambda event: next(
+            f for f in futures if not f.done()).set_result(None)
+        loaded, failures = mpv.playlist.extend(
+            player, ['a', 'b', 'c'], options={'start': 10}, max_pending=2)
+        assert loaded == 3
+        assert player.wait_event.call_count == 3
+
+        player.route_event.side_effect = None
+        with pytest.raises(TimeoutError):
+            mpv.playlist.extend(player, ['a'], options={'start': 10},
+                                timeout=0.01)
+
+    def test_options_on_event_thread(self):
+        player = mock.Mock(event_thread=threading.current_thread())
+        loaded, failures = mpv.playlist.extend(player, ['a', 'b'],
+                                               options={'start': 10})
+        assert loaded == 2
+        player.command.assert_called_with('loadfile', 'b', 'append',
+                                          'start=10')
+        player.command_async.assert_not_called()
+
+
+class TestPlaylistView:
+    @pytest.fixture(scope='function')
+    def player(self):
+        player = mock.Mock()
+        player.entries = ['file{}'.format(i) for i in range(120)]
+        player.playlist_count = 120
+        player.playlist_pos = 3
+        player.subscribe.side_effect = lambda name, callback, *args: callback
+        prefix, suffix = 'playlist/', '/filename'
+
+        def get_path(name):
+            index = int(name[len(prefix):-len(suffix)])
+            if index >= len(player.entries):
+                raise mpv.MpvError(
+                    'mpv_get_property',
+                    mpv.ErrorCode(mpv.ErrorCode.PROPERTY_UNAVAILABLE),
+                    'error', [name])
+            return player.entries[index]
+
+        player.get_path.side_effect = get_path
+        return player
+
+    def test_paging(self, player):
+        view = mpv.playlist.PlaylistView(player)
+        assert len(view) == 120
+        assert view.current == 3
+        assert view[-1] == 'file119'
+        assert view.page(2, size=50) == player.entries[100:]
+        assert view[10:13] == ['file10', 'file11', 'file12']
+        with pytest.raises(IndexError):
+            view[120]
+
+        calls = player.get_path.call_count
+        assert view[10:13] == ['file10', 'file11', 'file12']
+        assert player.get_path.call_count == calls
+
+    def test_invalidated_by_count(self, player):
+        callback = mock.Mock()
+        view = mpv.playlist.PlaylistView(player, callback)
+        assert view[0] == 'file0'
+        on_count = player.subscribe.call_args_list[0][0][1]
+        on_playlist = player.subscribe.call_args_list[2][0][1]
+        player.entries.insert(0, 'new')
+        on_count(mpv.events.Property('playlist-count', 121))
+        on_playlist(mpv.events.Property('playlist', None))
+        callback.assert_called_once_with()
+        assert len(view) == 121
+        assert view[0] == 'new'
+
+    def test_stale_after_change(self, player):
+        view = mpv.playlist.PlaylistView(player)
+        assert view[0:10] == player.entries[0:10]
+        on_playlist = player.subscribe.call_args_list[2][0][1]
+        assert player.subscribe.call_args_list[2][0][2] == mpv.Format.NONE
+
+        # a move keeps the count. The change itself reads nothing.
+        player.entries[4], player.entries[7] = (player.entries[7],
+                                                player.entries[4])
+        calls = player.get_path.call_count
+        on_playlist(mpv.events.Property('playlist', None))
+        assert player.get_path.call_count == calls
+
+        # only the rows that are read again are fetched.
+        assert view[3:6] == ['file3', 'file7', 'file5']
+        assert player.get_path.call_count == calls + 3
+        assert view[3:6] == ['file3', 'file7', 'file5']
+        assert player.get_path.call_count == calls + 3
+
+
+class FakeDecodePlayer:
+    """Plays scripted rounds of events for the frames() tests, a frame is
+    pending in each round."""
+    instances = []
+    script = []
+
+    def __init__(self, options=None):
+        self.options = options
+        self.rounds = [list(events) for events in self.script] or [[]]
+        self.handle = 1
+        self.time_pos = 0.0
+        self.dwidth, self.dheight = 2, 1
+        self.libmpv = mock.Mock()
+        self.libmpv.mpv_error_string.return_value = b'loading failed'
+        FakeDecodePlayer.instances.append(self)
+
+    @staticmethod
+    def event(event_id, data=None):
+        return mpv.events.Event(mpv.EventID(event_id), mpv.ErrorCode(0), 0,
+                                data)
+
+    def set_wakeup_callback(self, callback, data):
+        self.wakeup = callback
+
+    def initialize(self):
+        pass
+
+    def play(self, path):
+        self.path = path
+
+    def wait_event(self, timeout):
+        if self.rounds and self.rounds[0]:
+            return self.rounds[0].pop(0)
+        if len(self.rounds) > 1:
+            self.rounds.pop(0)
+        self.wakeup(None)
+        return self.event(mpv.EventID.NONE)
+
+    def terminate_destroy(self):
+        self.handle = None
+
+
+class FakeDecodeContext:
+    def __init__(self, player, size=None, fmt=None):
+        self.player = player
+        self.size = size
+        self.freed = False
+        self.rendered = 0
+
+    def set_update_callback(self, callback):
+        pass
+
+    def update(self):
+        return mpv.render.RENDER_UPDATE_FRAME
+
+    def render(self, frame):
+        frame.append(self.rendered)
+        self.rendered += 1
+        self.player.time_pos += 0.1
+
+    def free(self):
+        self.freed = True
+
+
+class TestFrames:
+    @pytest.fixture(scope='function')
+    def player(self):
+        FakeDecodePlayer.instances = []
+        FakeDecodePlayer.script = []
+        numpy = mock.Mock()
+        numpy.empty.side_effect = lambda shape, dtype: []
+        with mock.patch('mpv.decode.Mpv', FakeDecodePlayer), \
+                mock.patch('mpv.decode.SoftwareRenderContext',
+                           FakeDecodeContext), \
+                mock.patch('mpv.decode.numpy', numpy):
+            yield FakeDecodePlayer
+
+    def test_last_frame(self, player):
+        end = mpv.events.EndFile(mpv.EndFileReason(mpv.EndFileReason.EOF),
+                                 mpv.ErrorCode(0))
+        player.script = [[player.event(mpv.EventID.VIDEO_RECONFIG)], [],
+                         [player.event(mpv.EventID.END_FILE, end)]]
+        frames = list(mpv.decode.frames('video.mkv'))
+        # the frame pending with END_FILE is rendered too.
+        assert [frame for _, frame in frames] == [[0], [1], [2]]
+        assert [round(pts, 1) for pts, _ in frames] == [0.0, 0.1, 0.2]
+        assert player.instances[0].handle is None
+
+    def test_error(self, player):
+        error = mpv.events.EndFile(
+            mpv.EndFileReason(mpv.EndFileReason.ERROR),
+            mpv.ErrorCode(mpv.ErrorCode.LOADING_FAILED))
+        player.script = [[player.event(mpv.EventID.END_FILE, error)]]
+        with pytest.raises(mpv.MpvError) as e:
+            list(mpv.decode.frames('missing.mkv', size=(2, 1)))
+        assert 'loading failed' in str(e.value)
+        assert player.instances[0].handle is None
+
+    def test_stop(self, player):
+        iterator = mpv.decode.frames('video.mkv', size=(2, 1), prefetch=1)
+        assert next(iterator)[1] == [0]
+        assert next(iterator)[1] == [1]
+        iterator.close()
+        # leaving the loop stops the thread and frees the player.
+        assert not any(t.name == 'MPVDecodeThread'
+                       for t in threading.enumerate())
+        assert player.instances[0].handle is None
+
+
+class FakeProbePlayer:
+    """Plays the events of loadfile for the probe tests."""
+    mpv_version = 'mpv 0.0.0-test'
+
+    def __init__(self, options=None):
+        self.options = options
+        self.events = []
+        self.libmpv = mock.Mock()
+        self.libmpv.mpv_error_string.return_value = b'loading failed'
+
+    def event(self, event_id, data=None):
+        return mpv.events.Event(mpv.EventID(event_id), mpv.ErrorCode(0), 0,
+                                data)
+
+    def initialize(self):
+        pass
+
+    def terminate_destroy(self):
+        pass
+
+    def command(self, name, path, mode):
+        if name == 'seek':
+            self.position = path
+            self.events.append(self.event(mpv.EventID.PLAYBACK_RESTART))
+            return
+        self.path = path
+        # the end of the previous file comes first.
+        self.events.append(self.event(mpv.EventID.END_FILE, mpv.events.EndFile(
+            mpv.EndFileReason(mpv.EndFileReason.STOP), mpv.ErrorCode(0))))
+        if path == 'slow':
+            return
+        self.events.append(self.event(mpv.EventID.START_FILE))
+        if path == 'list.m3u':
+            # a playlist file redirects to its first entry.
+            self.path = 'entry.mkv'
+            self.events.append(self.event(
+                mpv.EventID.END_FILE, mpv.events.EndFile(
+                    mpv.EndFileReason(mpv.EndFileReason.REDIRECT),
+                    mpv.ErrorCode(0))))
+            self.events.append(self.event(mpv.EventID.START_FILE))
+        if path == 'bad':
+            self.events.append(self.event(
+                mpv.EventID.END_FILE, mpv.events.EndFile(
+                    mpv.EndFileReason(mpv.EndFileReason.ERROR),
+                    mpv.ErrorCode(mpv.ErrorCode.LOADING_FAILED))))
+        else:
+            self.events.append(self.event(mpv.EventID.FILE_LOADED))
+            self.events.append(self.event(mpv.EventID.PLAYBACK_RESTART))
+
+    def wait_event(self, timeout):
+        if self.events:
+            return self.events.pop(0)
+        time.sleep(min(timeout, 0.01))
+        return self.event(mpv.EventID.NONE)
+
+    def get_path(self, name):
+        if name == 'metadata':
+            raise mpv.MpvError('mpv_get_property', mpv.ErrorCode(-10), 'no',
+                               [name])
+        return '{}:{}'.format(self.path, name)
+
+
+class TestProbe:
+    @pytest.fixture(autouse=True)
+    def fake_player(self):
+        with mock.patch('mpv.probe.Mpv', FakeProbePlayer):
+            yield
+
+    def test_prober(self):
+        with mpv.probe.Prober(['duration', 'metadata'], timeout=0.1) as p:
+            assert not p.decode
+            result = p.probe('a.mkv')
+            assert result.ok
+            assert result.properties == {'duration': 'a.mkv:duration',
+                                         'metadata': None}
+            assert not p.probe('bad').ok
+            assert 'Timed out' in p.probe('slow').error
+            assert p.player is None
+            assert p.probe('b.mkv').ok
+
+    def test_redirect(self):
+        with mpv.probe.Prober(['duration'], timeout=0.1) as p:
+            result = p.probe('list.m3u')
+            assert result.ok
+            assert result.properties == {'duration': 'entry.mkv:duration'}
+
+    def test_decode_options(self):
+        prober = mpv.probe.Prober(['video-params/w'])
+        assert prober.decode
+        assert prober.options['vid'] == 'auto'
+
+    def test_probe_many(self):
+        paths = ['{}.mkv'.format(i) for i in range(20)] + ['bad']
+        results = list(mpv.probe.probe_many(paths, workers=3,
+                                            properties=['duration']))
+        assert sorted(r.index for r in results) == list(range(21))
+        failed = [r.path for r in results if not r.ok]
+        assert failed == ['bad']
+        for r in results:
+            if r.ok:
+                assert r.properties == {'duration': r.path + ':duration'}
+
+
+class TestProbeCache:
+    def test_roundtrip(self, tmp_path):
+        media = tmp_path / 'a.mkv'
+        media.write_bytes(b'x' * 100)
+        path = str(tmp_path / 'cache.sqlite')
+        with mpv.cache.ProbeCache(path, version='mpv 1') as cache:
+            cache.put(str(media), {'duration': 1.5, 'metadata': None})
+            assert cache.get(str(media), ['duration']) == {'duration': 1.5}
+            assert cache.get(str(media), ['track-list']) is None
+            assert cache.get('http://example.com/a.mkv', ['duration']) is None
+
+        with mpv.cache.ProbeCache(path) as cache:
+            assert cache.version == 'mpv 1'
+            assert len(cache) == 1
+            media.write_bytes(b'y' * 101)
+            assert cache.get(str(media), ['duration']) is None
+
+            cache.put(str(media), {'duration': 2.0})
+            cache.version = 'mpv 2'
+            assert len(cache) == 0
+            assert cache.get(str(media), ['duration']) is None
+
+    def test_eviction(self, tmp_path):
+        cache = mpv.cache.ProbeCache(str(tmp_path / 'cache.sqlite'),
+                                     version='mpv 1', max_entries=10)
+        for i in range(11):
+            media = tmp_path / '{}.mkv'.format(i)
+            media.write_bytes(b'')
+            cache.put(str(media), {'duration': i})
+        assert len(cache) == 9
+        assert cache.get(str(tmp_path / '0.mkv'), ['duration']) is None
+        assert cache.get(str(tmp_path / '10.mkv'), ['duration']) == {
+            'duration': 10}
+
+    def test_content_hash(self, tmp_path):
+        media = tmp_path / 'a.mkv'
+        media.write_bytes(b'a' * 200000)
+        cache = mpv.cache.ProbeCache(str(tmp_path / 'cache.sqlite'),
+                                     version='mpv 1', hash_content=True)
+        cache.put(str(media), {'duration': 1.0})
+        stat = os.stat(str(media))
+        media.write_bytes(b'b' * 200000)
+        os.utime(str(media), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert cache.get(str(media), ['duration']) is None
+
+    def test_probe_many(self, tmp_path):
+        paths = []
+        for i in range(5):
+            media = tmp_path / '{}.mkv'.format(i)
+            media.write_bytes(b'')
+            paths.append(str(media))
+        cache = mpv.cache.ProbeCache(str(tmp_path / 'cache.sqlite'))
+        with mock.patch('mpv.probe.Mpv', FakeProbePlayer), \
+                mock.patch('mpv.probe._version', None):
+            first = list(mpv.probe.probe_many(paths[:3], workers=2,
+                                              properties=['duration'],
+                                              cache=cache))
+            assert cache.version == FakeProbePlayer.mpv_version
+            # the version is read once per process.
+            assert mpv.probe._version == FakeProbePlayer.mpv_version
+            assert len(cache) == 3
+            second = list(mpv.probe.probe_many(paths, workers=2,
+                                               properties=['duration'],
+                                               cache=cache))
+        assert cache.hits == 3
+        assert sorted(r.index for r in second) == list(range(5))
+        assert ({r.path: r.properties for r in first}.items() <=
+                {r.path: r.properties for r in second}.items())
+
+    def test_prober_hit(self, tmp_path):
+        media = tmp_path / 'a.mkv'
+        media.write_bytes(b'')
+        cache = mpv.cache.ProbeCache(str(tmp_path / 'cache.sqlite'),
+                                     version='mpv 1')
+        cache.put(str(media), {'duration': 1.5})
+        with mock.patch('mpv.probe.Mpv') as Mpv, \
+                mock.patch('mpv.probe._version', 'mpv 1'):
+            with mpv.probe.Prober(['duration'], cache=cache) as prober:
+                result = prober.probe(str(media))
+        assert result.properties == {'duration': 1.5}
+        # a hit doesn't start a player.
+        assert not Mpv.called
+
+
+class FakeThumbnailPlayer(FakeProbePlayer):
+    duration = 10.0
+
+    def command_node(self, name, mode):
+        # a 3x2 bgr0 frame with a stride of 16, blue is the position.
+        pixel = bytes([int(self.position), 0, 255, 0])
+        row = pixel * 3 + bytes(4)
+        return {'w': 3, 'h': 2, 'stride': 16, 'format': 'bgr0',
+                'data': row * 2}
+
+
+class TestThumbnails:
+    def read_png(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        assert data[:8] == b'\x89PNG\r\n\x1a\n'
+        width, height = struct.unpack('>II', data[16:24])
+        length, = struct.unpack('>I', data[33:37])
+        assert data[37:41] == b'IDAT'
+        raw = zlib.decompress(data[41:41 + length])
+        stride = width * 3 + 1
+        return width, height, [raw[i * stride + 1:(i + 1) * stride]
+                               for i in range(height)]
+
+    def test_generate(self, tmp_path):
+        sprite = str(tmp_path / 'sprite.png')
+        with mock.patch('mpv.probe.Mpv', FakeThumbnailPlayer), \
+                mock.patch('mpv.thumbnails.Mpv', FakeThumbnailPlayer):
+            index = mpv.thumbnails.generate('a.mkv', sprite, interval=4,
+                                            size=(3, 2))
+        assert [t['time'] for t in index['thumbnails']] == [0, 4, 8]
+        assert [(t['x'], t['y']) for t in index['thumbnails']] == [
+            (0, 0), (3, 0), (0, 2)]
+        assert index['thumbnails'][-1]['end'] == 10.0
+
+        width, height, rows = self.read_png(sprite)
+        assert (width, height) == (6, 4)
+        assert rows[0] == bytes([255, 0, 0] * 3 + [255, 0, 4] * 3)
+        assert rows[2] == bytes([255, 0, 8] * 3 + [0, 0, 0] * 3)
+
+        with open(str(tmp_path / 'sprite.vtt')) as f:
+            vtt = f.read()
+        assert vtt.startswith('WEBVTT\n')
+        assert ('00:00:04.000 --> 00:00:08.000\nsprite.png#xywh=3,0,3,2'
+                in vtt)
+        with open(str(tmp_path / 'sprite.json')) as f:
+            assert json.load(f) == index
+
+    def test_arguments(self, tmp_path):
+        with pytest.raises(ValueError):
+            mpv.thumbnails.Thumbnailer().generate('a.mkv', 'b.png')
+        with pytest.raises(ValueError):
+            mpv.thumbnails.Thumbnailer().generate('a.mkv', 'b.png', count=0)
+
+
+class TestPreviewCache:
+    @pytest.fixture(autouse=True)
+    def fake_player(self):
+        with mock.patch('mpv.probe.Mpv', FakeThumbnailPlayer), \
+                mock.patch('mpv.thumbnails.Mpv', FakeThumbnailPlayer):
+            yield
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_request(self):
+        player = mock.Mock()
+        with mpv.preview.PreviewCache(player, quantum=2.0,
+                                      prefetch=1) as previews:
+            on_path = player.subscribe.call_args[0][1]
+            on_path(mpv.events.Property('path', 'a.mkv'))
+
+            done = threading.Event()
+            callback = mock.Mock(side_effect=lambda *args: done.set())
+            assert previews.request(4.3, callback) is None
+            assert done.wait(5)
+            seconds, shot = callback.call_args[0]
+            assert seconds == 4.0
+            assert shot['data'][0] == 4
+
+            assert previews.request(3.8) is shot
+            assert previews.hits == 1
+            self.wait_for(lambda: previews.get(6.0) is not None and
+                          previews.get(2.0) is not None)
+
+            on_path(mpv.events.Property('path', 'b.mkv'))
+            assert previews.get(4.0) is None
+        player.unsubscribe.assert_called_once_with(
+            player.subscribe.return_value)
+
+    def test_memory_bound(self):
+        player = mock.Mock()
+        # a thumbnail of the fake player has 32 bytes.
+        with mpv.preview.PreviewCache(player, max_bytes=64,
+                                      prefetch=3) as previews:
+            player.subscribe.call_args[0][1](
+                mpv.events.Property('path', 'a.mkv'))
+            previews.request(5)
+            self.wait_for(lambda: not previews._pending and
+                          len(previews._shots) == 2)
+            assert previews._bytes <= 64
+
+    def test_load_failure(self):
+        player = mock.Mock()
+        load = mpv.thumbnails.Thumbnailer.load
+        with mock.patch.object(mpv.thumbnails.Thumbnailer, 'load',
+                               autospec=True, side_effect=load) as spy, \
+                mpv.preview.PreviewCache(player, prefetch=3) as previews:
+            on_path = player.subscribe.call_args[0][1]
+            on_path(mpv.events.Property('path', 'bad'))
+            previews.request(5)
+            self.wait_for(lambda: not previews._pending)
+            # one failed load fails every pending thumbnail.
+            assert spy.call_count == 1
+            assert previews.request(6) is None
+            time.sleep(0.05)
+            assert spy.call_count == 1
+
+            on_path(mpv.events.Property('path', 'a.mkv'))
+            previews.request(5)
+            self.wait_for(lambda: previews.get(5) is not None)
+            assert spy.call_count == 2
+
+
+class TestSeekScheduler:
+    @pytest.fixture
+    def player(self):
+        player = mock.Mock()
+        player.futures = []
+
+        def command_async(*args):
+            player.futures.append(concurrent.futures.Future())
+            return player.futures[-1]
+
+        player.command_async.side_effect = command_async
+        return player
+
+    def restart(self, player):
+        on_restart = player.add_event_listener.call_args[0][1]
+        on_restart(mpv.events.Event(
+            mpv.EventID(mpv.EventID.PLAYBACK_RESTART), None, 0, None))
+
+    def test_supersede(self, player):
+        seeks = mpv.seek.SeekScheduler(player)
+        player.add_event_listener.assert_called_once_with(
+            mpv.EventID.PLAYBACK_RESTART, mock.ANY)
+        seeks.seek(1)
+        seeks.seek(2)
+        seeks.seek(3, exact=True)
+        assert seeks.busy
+        assert seeks.superseded == 1
+        player.command_async.assert_called_once_with(
+            'seek', 1, 'absolute+keyframes')
+
+        # a restart before the reply isn't the seek's.
+        self.restart(player)
+        assert player.command_async.call_count == 1
+        player.futures[0].set_result(None)
+        self.restart(player)
+        player.command_async.assert_called_with('seek', 3, 'absolute+exact')
+        assert seeks.busy
+        player.futures[1].set_result(None)
+        self.restart(player)
+        assert not seeks.busy
+        # a restart without a seek, e.g. of loadfile, isn't counted.
+        self.restart(player)
+        assert player.command_async.call_count == 2
+
+        stats = seeks.stats()
+        assert stats['count'] == 2
+        assert stats['superseded'] == 1
+        assert stats['p50'] <= stats['max']
+        seeks.close()
+        player.remove_event_listener.assert_called_once_with(
+            player.add_event_listener.return_value)
+
+    def test_failed_seek(self, player):
+        futures = player.futures
+        seeks = mpv.seek.SeekScheduler(player)
+        seeks.seek(1)
+        seeks.seek(2)
+        futures[0].set_exception(mpv.MpvError('seek', None, 'error', []))
+        player.command_async.assert_called_with(
+            'seek', 2, 'absolute+keyframes')
+        futures[1].set_result(None)
+        assert seeks.busy
+        assert not seeks.latencies
+
+    def test_timeout(self, player):
+        seeks = mpv.seek.SeekScheduler(player, timeout=0)
+        seeks.seek(1)
+        seeks.seek(2)
+        assert player.command_async.call_count == 2
+        assert seeks.superseded == 0
+        assert seeks.stats() == {'count': 0, 'superseded': 0}
+
+    def test_lost_restart(self, player):
+        seeks = mpv.seek.SeekScheduler(player, timeout=0.05)
+        seeks.seek(1)
+        player.futures[0].set_result(None)
+        seeks.seek(5, exact=True)
+        # the first seek never restarts, the exact one is sent anyway.
+        deadline = time.monotonic() + 5
+        while player.command_async.call_count < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        player.command_async.assert_called_with('seek', 5, 'absolute+exact')
+        assert not seeks.latencies
+        seeks.close()
+
+
+class TestWriteQueue:
+    @pytest.fixture
+    def player(self):
+        player = mock.Mock()
+        player.replies = []
+
+        def set_property_async(name, value, mpv_format):
+            player.replies.append(concurrent.futures.Future())
+            return player.replies[-1]
+
+        player.set_property_async.side_effect = set_property_async
+        return player
+
+    def test_coalesce(self, player):
+        writes = mpv.writes.WriteQueue(interval=None)
+        writes.start(player)
+        for volume in range(10):
+            writes.set('volume', volume)
+        first = writes.set('brightness', 1, confirm=True)
+        second = writes.set('brightness', 2, confirm=True)
+        assert len(writes) == 2
+        assert writes.peek('volume') == 9
+        assert writes.peek('speed', 'x') == 'x'
+
+        writes.flush()
+        assert player.set_property_async.call_args_list == [
+            mock.call('volume', 9, None), mock.call('brightness', 2, None)]
+        assert writes.peek('brightness') == 2
+        player.replies[1].set_result(None)
+        assert first.result(0) is None and second.result(0) is None
+        assert writes.peek('brightness') is None
+
+        stats = writes.stats()
+        assert stats['submitted'] == 12
+        assert stats['coalesced'] == 10
+        assert stats['sent'] == 2
+        assert stats['inflight'] == 1
+
+    def test_reply_timeout(self, player):
+        writes = mpv.writes.WriteQueue(interval=None, reply_timeout=0.05)
+        writes.start(player)
+        writes.set('volume', 1)
+        writes.flush()
+        assert writes.peek('volume') == 1
+        time.sleep(0.06)
+        # the reply is overdue, the property is read from mpv again.
+        assert writes.peek('volume') is None
+        assert writes.stats()['inflight'] == 0
+        player.replies[0].set_result(None)
+
+    def test_failure(self, player):
+        writes = mpv.writes.WriteQueue(interval=None)
+        writes.start(player)
+        done = writes.set('volume', 500, confirm=True)
+        writes.flush()
+        error = mpv.MpvError('mpv_set_property_async',
+                             mpv.ErrorCode(mpv.ErrorCode.PROPERTY_ERROR),
+                             'error', [])
+        player.replies[0].set_exception(error)
+        assert done.exception(0) is error
+        assert writes.failed == 1
+        assert writes.peek('volume') is None
+
+    def test_stop(self, player):
+        writes = mpv.writes.WriteQueue(interval=None)
+        writes.start(player)
+        writes.set('volume', 1)
+        writes.stop()
+        player.set_property_async.assert_called_once_with('volume', 1, None)
+
+        writes.start(player)
+        done = writes.set('volume', 2, confirm=True)
+        writes.stop(flush=False)
+        assert done.cancelled()
+        assert player.set_property_async.call_count == 1
+
+    def test_shutdown(self, player):
+        writes = mpv.writes.WriteQueue(interval=None)
+        writes.start(player)
+        player.add_event_listener.assert_called_once_with(
+            mpv.EventID.SHUTDOWN, writes._on_shutdown)
+        sent = writes.set('volume', 1, confirm=True)
+        writes.flush()
+        queued = writes.set('speed', 2, confirm=True)
+        writes._on_shutdown(mock.Mock(event_id=mpv.EventID.SHUTDOWN))
+        assert isinstance(sent.exception(0), mpv.MpvError)
+        assert queued.cancelled()
+        player.remove_event_listener.assert_called_once_with(
+            player.add_event_listener.return_value)
+        # a late reply is ignored.
+        player.replies[0].set_result(None)
+        assert writes.stats()['inflight'] == 0
+
+    def test_thread(self, player):
+        writes = mpv.writes.WriteQueue(interval=0.01)
+        writes.start(player)
+        assert 'MPVWriteQueueThread' in [t.name
+                                         for t in threading.enumerate()]
+        writes.set('volume', 1)
+        deadline = time.monotonic() + 5
+        while not player.set_property_async.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        writes.stop()
+        player.set_property_async.assert_called_once_with('volume', 1, None)
+
+    def test_attributes(self):
+        player = mpv.Mpv.__new__(mpv.Mpv)
+        player.libmpv = mock.Mock()
+        player.handle = 1
+        player.write_queue = None
+        player.event_thread = None
+        with pytest.raises(ValueError):
+            player.set_write_queue(mpv.writes.WriteQueue(interval=None))
+        player.event_thread = threading.current_thread()
+        player._replies = {}
+        player._reply_userdata = itertools.count(1)
+        player._event_listeners = {}
+        player.set_write_queue(mpv.writes.WriteQueue(interval=None))
+
+        player.volume = 10
+        player.volume = 20
+        assert player.volume == 20
+        player.libmpv._set_property.assert_not_called()
+        player.write_queue.flush()
+        player.libmpv.set_property_async.assert_called_once_with(
+            1, mock.ANY, 'volume', mpv.Format.DOUBLE, 20)
+
+        player.set_write_queue(None)
+        player.volume = 30
+        player.libmpv._set_property.assert_called_once_with(
+            1, 'volume', mpv.Format.DOUBLE, 30)
+
+
+class TestPlaybackClock:
+    @pytest.fixture
+    def clock(self):
+        self.now = 100.0
+        player = mock.Mock()
+        player.get_time_us.side_effect = lambda: int((self.now + 5) * 1e6)
+        self.callbacks = {}
+
+        def subscribe(name, callback, fmt=None):
+            self.callbacks[name] = callback
+            return name
+
+        player.subscribe.side_effect = subscribe
+        with mock.patch('mpv.clock.time.monotonic', lambda: self.now):
+            clock = mpv.clock.PlaybackClock(player, max_extrapolation=0.5,
+                                            slew_rate=0.1, max_error=0.25)
+            yield clock
+        clock.close()
+        assert player.unsubscribe.call_count == 4
+
+    def change(self, name, value):
+        self.callbacks[name](mpv.events.Property(name, value))
+
+    def test_extrapolate(self, clock):
+        assert clock.position is None
+        self.change('time-pos', 10.0)
+        assert clock.position == 10.0
+        self.now += 0.2
+        assert clock.position == pytest.approx(10.2)
+        assert clock.position_at(int((self.now + 5 + 0.1) * 1e6)) == \
+            pytest.approx(10.3)
+        # extrapolation is bounded.
+        self.now += 10
+        assert clock.position == pytest.approx(10.5)
+        assert clock.player.get_time_us.call_count == 1
+
+    def test_pause_and_speed(self, clock):
+        self.change('time-pos', 10.0)
+        self.now += 0.2
+        self.change('pause', True)
+        assert not clock.running
+        self.now += 0.2
+        assert clock.position == pytest.approx(10.2)
+        self.change('pause', False)
+        self.change('speed', 2.0)
+        self.now += 0.1
+        assert clock.position == pytest.approx(10.4)
+
+    def test_slew(self, clock):
+        self.change('time-pos', 10.0)
+        self.now += 0.2
+        # the clock is 0.1s ahead, the error is slewed away.
+        self.change('time-pos', 10.1)
+        assert clock.drift == pytest.approx(-0.1)
+        assert clock.position == pytest.approx(10.2)
+        self.now += 0.1
+        assert clock.position == pytest.approx(10.29)
+        self.now += 0.1
+        assert clock.position == pytest.approx(10.38)
+
+        # large errors resync.
+        self.change('time-pos', 20.0)
+        assert clock.position == 20.0
+
+    def test_seek(self, clock):
+        self.change('time-pos', 10.0)
+        self.change('seeking', True)
+        self.now += 0.3
+        assert clock.position == 10.0
+        self.change('time-pos', 10.1)
+        assert clock.position == 10.1
+        on_restart = clock.player.add_event_listener.call_args[0][1]
+        on_restart(None)
+        assert clock.running
+        self.now += 0.1
+        assert clock.position == pytest.approx(10.2)
+
+
+class TestCacheController:
+    @pytest.fixture
+    def player(self):
+        self.now = 1000.0
+        player = mock.Mock()
+        player.get_path.side_effect = {
+            'demuxer-readahead-secs': 10.0,
+            'demuxer-max-bytes': 100 << 20}.get
+        self.callbacks = {}
+
+        def subscribe(name, callback, fmt=None):
+            self.callbacks[name] = callback
+            return name
+
+        player.subscribe.side_effect = subscribe
+        with mock.patch('mpv.buffering.time.monotonic', lambda: self.now):
+            yield player
+
+    def change(self, name, value):
+        self.callbacks[name](mpv.events.Property(name, value))
+
+    def stall(self, seconds=1.0):
+        self.change('paused-for-cache', True)
+        self.now += seconds
+        self.change('paused-for-cache', False)
+
+    def test_grow_and_shrink(self, player):
+        cache = mpv.buffering.CacheController(
+            player, max_readahead=20.0, target_stalls=1, window=600,
+            cooldown=60)
+        player.set_option.assert_any_call('demuxer-readahead-secs', 10.0)
+        player.set_option.assert_any_call('demuxer-max-bytes',
+                                          str(100 << 20))
+        self.stall()
+        assert cache.readahead == 10.0
+        self.stall(2.0)
+        assert cache.stalls == 2
+        assert cache.stalled == 3.0
+        assert cache.readahead == 15.0
+        assert cache.max_bytes == 150 << 20
+        self.stall()
+        self.stall()
+        assert cache.readahead == 20.0
+        assert [d[1] for d in cache.decisions] == ['start', 'stalls',
+                                                   'stalls', 'stalls']
+
+        # no shrinking while stalls are within the window. mpv sends the
+        # idle flag once, the duration updates recheck it.
+        self.change('demuxer-cache-idle', True)
+        assert cache.readahead == 20.0
+        self.now += 601
+        self.change('demuxer-cache-duration', 19.5)
+        assert cache.readahead == 16.0
+        self.now += 1
+        self.change('demuxer-cache-duration', 19.0)
+        assert cache.readahead == 16.0
+        self.now += 60
+        self.change('demuxer-cache-duration', 18.5)
+        assert cache.readahead == 12.8
+        self.change('demuxer-cache-idle', False)
+        self.now += 60
+        self.change('demuxer-cache-duration', 12.0)
+        assert cache.readahead == 12.8
+        assert cache.stats()['stall_rate'] == 0
+
+        cache.close()
+        assert player.unsubscribe.call_count == 4
+
+    def test_budget(self, player):
+        budget = mpv.buffering.CacheBudget(250 << 20)
+        first = mpv.buffering.CacheController(player, budget,
+                                              target_stalls=0)
+        first_callbacks = dict(self.callbacks)
+        second = mpv.buffering.CacheController(player, budget,
+                                               target_stalls=0)
+        assert budget.used == 200 << 20
+        self.stall()
+        assert second.max_bytes == 150 << 20
+        self.callbacks = first_callbacks
+        self.stall()
+        # only what is left of the budget is granted.
+        assert first.max_bytes == 100 << 20
+        assert first.readahead == 15.0
+        assert budget.available == 0
+        second.close()
+        assert budget.available == 150 << 20
+
+    def test_budget_exhausted(self, player):
+        budget = mpv.buffering.CacheBudget(110 << 20)
+        first = mpv.buffering.CacheController(player, budget)
+        # only 10 MiB are left, less than min_bytes.
+        second = mpv.buffering.CacheController(player, budget)
+        assert budget.used == 100 << 20
+        assert str(10 << 20) not in [c[0][1] for c in
+                                     player.set_option.call_args_list]
+        assert second.decisions == collections.deque()
+
+        player.set_option.side_effect = mpv.MpvError(
+            'mpv_set_option', mpv.ErrorCode(mpv.ErrorCode.OPTION_ERROR),
+            'error', [])
+        first._grow()
+        # the failed resize gives the share back.
+        assert budget.used == 100 << 20
+        assert first.max_bytes == 100 << 20
+
+
+class TestGaplessController:
+    def player(self):
+        player = mock.Mock()
+        player.listeners = {}
+
+        def add_event_listener(event_id, callback):
+            player.listeners[event_id] = callback
+            return event_id
+
+        player.add_event_listener.side_effect = add_event_listener
+        return player
+
+    def event(self, player, event_id, reason=None):
+        data = None
+        if reason is not None:
+            data = mpv.events.EndFile(mpv.EndFileReason(reason), None)
+        player.listeners[event_id](mpv.events.Event(
+            mpv.EventID(event_id), None, 0, data))
+
+    def test_playlist(self):
+        player = self.player()
+        gapless = mpv.gapless.GaplessController(player, readahead=20)
+        player.set_option.assert_any_call('prefetch-playlist', True)
+        player.set_option.assert_any_call('demuxer-readahead-secs', 20)
+
+        gapless.enqueue('a.mkv', 'b.mkv')
+        player.playlist_pos = 0
+        player.playlist_count = 3
+        gapless.play_next('c.mkv')
+        player.command.assert_called_with('playlist-move', 2, 1)
+
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.STOP)
+        self.event(player, mpv.EventID.PLAYBACK_RESTART)
+        assert not gapless.transitions
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.EOF)
+        self.event(player, mpv.EventID.START_FILE)
+        self.event(player, mpv.EventID.PLAYBACK_RESTART)
+        assert [kind for kind, _ in gapless.transitions] == ['playlist']
+        assert gapless.stats()['count'] == 1
+
+        # the end of the playlist, a later file or seek is no transition.
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.EOF)
+        self.event(player, mpv.EventID.IDLE)
+        self.event(player, mpv.EventID.START_FILE)
+        self.event(player, mpv.EventID.PLAYBACK_RESTART)
+        # a seek in a file kept open at its end.
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.EOF)
+        self.event(player, mpv.EventID.PLAYBACK_RESTART)
+        self.event(player, mpv.EventID.START_FILE)
+        self.event(player, mpv.EventID.PLAYBACK_RESTART)
+        assert gapless.stats()['count'] == 1
+
+        gapless.close()
+        assert player.remove_event_listener.call_count == 5
+
+    def test_swap(self):
+        player, standby = self.player(), self.player()
+        on_swap = mock.Mock()
+        gapless = mpv.gapless.GaplessController(
+            player, factory=lambda: standby, on_swap=on_swap)
+        with pytest.raises(ValueError):
+            mpv.gapless.GaplessController(self.player()).preload('b.mkv')
+
+        gapless.preload('b.mkv')
+        assert standby.pause is True
+        standby.command.assert_called_once_with('loadfile', 'b.mkv',
+                                                'replace')
+        # a failed earlier file doesn't cancel the preload.
+        self.event(standby, mpv.EventID.END_FILE, mpv.EndFileReason.ERROR)
+        for event_id in (mpv.EventID.START_FILE, mpv.EventID.FILE_LOADED,
+                         mpv.EventID.PLAYBACK_RESTART):
+            self.event(standby, event_id)
+        assert gapless.ready
+
+        standby.time_pos = 0.0
+
+        def subscribe(name, callback):
+            # the cached value of an earlier file is no new frame.
+            callback(mpv.events.Property('time-pos', 12.5))
+            return 7
+
+        standby.subscribe.side_effect = subscribe
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.EOF)
+        assert standby.pause is False
+        assert gapless.player is standby and gapless.standby is player
+        on_swap.assert_called_once_with(standby, player)
+        # measured until the first new frame.
+        assert not gapless.transitions
+        name, on_position = standby.subscribe.call_args[0]
+        assert name == 'time-pos'
+        self.event(standby, mpv.EventID.PLAYBACK_RESTART)
+        on_position(mpv.events.Property('time-pos', 0.0))
+        assert not gapless.transitions
+        on_position(mpv.events.Property('time-pos', 0.04))
+        assert [kind for kind, _ in gapless.transitions] == ['swap']
+        standby.unsubscribe.assert_called_once_with(7)
+        on_position(mpv.events.Property('time-pos', 0.08))
+        assert len(gapless.transitions) == 1
+
+        gapless.preload('c.mkv')
+        self.event(player, mpv.EventID.START_FILE)
+        self.event(player, mpv.EventID.END_FILE, mpv.EndFileReason.ERROR)
+        assert gapless.preloaded is None and not gapless.ready
+
+
+class TestHeadless:
+    def test_options(self):
+        options = mpv.profiles.headless_options(
+            'decode-bench', {'hwdec': 'auto'}, vd_lavc_threads=4)
+        assert options['vo'] == 'null'
+        assert options['untimed'] is True
+        assert options['hwdec'] == 'auto'
+        assert options['vd-lavc-threads'] == 4
+        assert 'vd-lavc-threads' not in mpv.profiles.HEADLESS_PROFILES[
+            'probe']
+        with pytest.raises(ValueError):
+            mpv.profiles.headless_options('realtime')
+
+        assert mpv.probe.PROBE_OPTIONS == \
+            mpv.profiles.HEADLESS_PROFILES['probe']
+        assert mpv.thumbnails.THUMBNAIL_OPTIONS['vid'] == 'auto'
+        assert mpv.thumbnails.THUMBNAIL_OPTIONS['config'] is False
+
+    def test_bench_decode(self):
+        player = mock.Mock()
+        player.get_time_us.side_effect = [1000000, 3000000]
+        # estimated-frame-number, then the results.
+        player.get_path.side_effect = [0, 100, 2, 0, 10.0]
+        player.wait_event.side_effect = [
+            mpv.events.Event(mpv.EventID(mpv.EventID.PROPERTY_CHANGE),
+                             mpv.ErrorCode(0), 1,
+                             mpv.events.Property('eof-reached', False)),
+            mpv.events.Event(mpv.EventID(mpv.EventID.PROPERTY_CHANGE),
+                             mpv.ErrorCode(0), 1,
+                             mpv.events.Property('eof-reached', True))]
+        with mock.patch('mpv.bench.Mpv') as Mpv, \
+                mock.patch('mpv.bench.load') as load:
+            Mpv.headless.return_value = player
+            result = mpv.bench.bench_decode('a.mkv', end=10, hwdec='auto')
+        Mpv.headless.assert_called_once_with('decode-bench', {'end': '10'},
+                                             hwdec='auto')
+        load.assert_called_once_with(player, 'a.mkv', mock.ANY, decode=True)
+        assert player.pause is False
+        assert result['frames'] == 100
+        assert result['seconds'] == 2.0
+        assert result['fps'] == 50.0
+        assert result['drops'] == 2
+        assert result['position'] == 10.0
+        player.terminate_destroy.assert_called_once_with()
+        assert 'decode fps      50.0' in mpv.bench.format_result(result)
+
+    def test_bench_profiles(self):
+        assert mpv.bench.BENCH_PROFILES == ('decode-bench',)
+        for profile, options in (('probe', {}), ('analysis', {}),
+                                 ('decode-bench', {'keep-open': 'no'})):
+            with pytest.raises(ValueError):
+                mpv.bench.bench_decode('a.mkv', profile, options)
+        with pytest.raises(SystemExit):
+            mpv.__main__.main(['bench-decode', 'a.mkv', '--profile',
+                               'probe'])
+
+    def test_old_drop_properties(self):
+        player = mock.Mock()
+        values = {'vo-drop-frame-count': 3, 'drop-frame-count': 5}
+
+        def get_path(name, mpv_format):
+            if name not in values:
+                raise mpv.MpvError(
+                    'mpv_get_property',
+                    mpv.ErrorCode(mpv.ErrorCode.PROPERTY_UNAVAILABLE),
+                    'error', [name])
+            return values[name]
+
+        player.get_path.side_effect = get_path
+        assert mpv.bench._read(player, mpv.bench._DROP_PROPERTIES) == 3
+        assert mpv.bench._read(
+            player, mpv.bench._DECODER_DROP_PROPERTIES) == 5
+
+    def test_main(self, capsys):
+        result = {'path': 'a.mkv', 'frames': 1}
+        with mock.patch('mpv.__main__.bench_decode',
+                        return_value=result) as bench:
+            assert mpv.__main__.main(['bench-decode', 'a.mkv', '--threads',
+                                      '2', '-o', 'vd-lavc-fast=yes',
+                                      '--json']) == 0
+        bench.assert_called_once_with(
+            'a.mkv', 'decode-bench',
+            {'vd-lavc-fast': 'yes', 'vd-lavc-threads': 2}, None, None)
+        assert json.loads(capsys.readouterr().out) == result